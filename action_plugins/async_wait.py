@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common._collections_compat import Mapping
+from ansible.module_utils.six import string_types
+from ansible.plugins.action import ActionBase
+from ansible.utils.vars import merge_hash
+
+
+def job_ids(value):
+    ''' flattens job ids, registered async results and registered loop results into a list of ids '''
+    if isinstance(value, Mapping):
+        if 'results' in value:
+            return job_ids(value['results'])
+        if value.get('skipped'):
+            return []
+        if 'ansible_job_id' not in value:
+            raise AnsibleActionFail('async_wait got a result without an ansible_job_id, was the task run with poll: 0?')
+        return [value['ansible_job_id']]
+    if isinstance(value, (list, tuple)):
+        return [jid for item in value for jid in job_ids(item)]
+    if isinstance(value, (string_types, int)):
+        return [str(value)]
+    raise AnsibleActionFail('async_wait cannot get a job id from {0!r}'.format(value))
+
+
+class ActionModule(ActionBase):
+
+    _VALID_ARGS = frozenset(('jids', 'timeout', 'async_dir'))
+
+    def _get_async_dir(self):
+        # the same place async_wrapper writes to: the shell option, or ANSIBLE_ASYNC_DIR in the task env
+        for env in self._task.environment or []:
+            if isinstance(env, Mapping) and 'ANSIBLE_ASYNC_DIR' in env:
+                return env['ANSIBLE_ASYNC_DIR']
+        try:
+            return self._connection._shell.get_option('async_dir')
+        except (AttributeError, KeyError):
+            return '~/.ansible_async'
+
+    def run(self, tmp=None, task_vars=None):
+        results = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+
+        module_args = self._task.args.copy()
+        if 'jids' not in module_args:
+            raise AnsibleActionFail('async_wait requires jids')
+        module_args['jids'] = job_ids(module_args['jids'])
+        module_args.setdefault('async_dir', self._get_async_dir())
+
+        return merge_hash(results, self._execute_module(module_name='async_wait', module_args=module_args,
+                                                        task_vars=task_vars))
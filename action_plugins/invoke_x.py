@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import re
+from collections import OrderedDict
+
+from ansible.errors import AnsibleActionFail, AnsibleError
+from ansible.module_utils._text import to_native, to_text
+from ansible.module_utils.common._collections_compat import Mapping
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils.six import string_types
+from ansible.playbook.task import Task
+from ansible.plugins.action import ActionBase
+
+SENTINEL = u'__invoke_x_value_{0}__'
+SENTINEL_RE = re.compile(r'__invoke_x_value_(\d+)__')
+# the only task keywords of the template's tasks that are applied, the rest would need the task executor
+HONOURED = frozenset(('name', 'action', 'args', 'check_mode'))
+# task keywords, fattributes since ansible 2.12
+KEYWORDS = frozenset(getattr(Task, 'fattributes', None) or Task._valid_attrs)
+
+
+class LRUCache(object):
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+templates = LRUCache(32)
+skeletons = LRUCache(int(os.environ.get('INVOKE_X_CACHE_SIZE', 256)))
+
+
+class NotCacheable(Exception):
+    pass
+
+
+class Slot(object):
+    ''' where the index-th value of an invocation goes in a cached task skeleton '''
+
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
+
+
+def items(value):
+    return sorted(value.items(), key=lambda item: to_text(item[0]))
+
+
+def shape(value):
+    ''' the structure of value without its scalars, which is all a rendered skeleton depends on '''
+    if isinstance(value, Mapping):
+        return ('dict',) + tuple((to_text(k), shape(v)) for k, v in items(value))
+    if isinstance(value, (list, tuple)):
+        return ('list',) + tuple(shape(v) for v in value)
+    return None
+
+
+def flatten(value, values):
+    ''' value with every scalar replaced by a sentinel string, appending the scalars to values '''
+    if isinstance(value, Mapping):
+        return dict((k, flatten(v, values)) for k, v in items(value))
+    if isinstance(value, (list, tuple)):
+        return [flatten(v, values) for v in value]
+    values.append(value)
+    return SENTINEL.format(len(values) - 1)
+
+
+def to_skeleton(data):
+    ''' rendered and parsed data with the sentinels turned into Slots '''
+    if isinstance(data, Mapping):
+        if any(isinstance(k, string_types) and SENTINEL_RE.search(k) for k in data):
+            raise NotCacheable()
+        return dict((k, to_skeleton(v)) for k, v in data.items())
+    if isinstance(data, list):
+        return [to_skeleton(v) for v in data]
+    if isinstance(data, string_types) and SENTINEL_RE.search(data):
+        match = SENTINEL_RE.match(data)
+        if not match or match.end() != len(data):
+            raise NotCacheable()
+        return Slot(int(match.group(1)))
+    return data
+
+
+def fill(skeleton, values):
+    if isinstance(skeleton, Slot):
+        return values[skeleton.index]
+    if isinstance(skeleton, dict):
+        return dict((k, fill(v, values)) for k, v in skeleton.items())
+    if isinstance(skeleton, list):
+        return [fill(v, values) for v in skeleton]
+    return skeleton
+
+
+class ActionModule(ActionBase):
+
+    _VALID_ARGS = frozenset(('module_name', 'module_args', 'check_mode', 'template'))
+
+    def _compiled(self, path):
+        st = os.stat(path)
+        key = (path, st.st_mtime, st.st_size)
+        template = templates.get(key)
+        if template is None:
+            with open(path, 'rb') as f:
+                source = to_text(f.read(), errors='surrogate_or_strict')
+            # the template action's defaults
+            environment = self._templar.environment.overlay(trim_blocks=True)
+            # ansible 2.9 adds the filter and test plugins to its templar's environment itself,
+            # later versions load them into the environment on lookup
+            if hasattr(self._templar, '_get_filters'):
+                environment.filters.update(self._templar._get_filters())
+                environment.tests.update(self._templar._get_tests())
+            template = environment.from_string(source)
+            templates.put(key, template)
+        return template
+
+    def _render(self, path, module_name, module_args, check_mode):
+        try:
+            rendered = self._compiled(path).render(module_name=module_name, module_args=module_args,
+                                                   check_mode=check_mode)
+        except Exception as e:
+            raise AnsibleActionFail('invoke_x could not render {0}: {1}'.format(path, to_native(e)))
+        data = self._loader.load(rendered)
+        if not isinstance(data, list):
+            raise AnsibleActionFail('invoke_x template {0} must render a list of tasks'.format(path))
+        return data
+
+    def _task_data(self, path, module_name, module_args, check_mode):
+        '''
+        Renders the template once per template, module name and shape of the arguments, with
+        sentinels in place of the values, and fills the values of later calls into that.
+        '''
+        values = []
+        flat_args = flatten(module_args, values)
+        flat_check_mode = flatten(check_mode, values)
+        key = (path, os.stat(path).st_mtime, module_name, shape(module_args))
+        skeleton = skeletons.get(key)
+        if skeleton is None:
+            try:
+                skeleton = to_skeleton(self._render(path, module_name, flat_args, flat_check_mode))
+            except NotCacheable:
+                skeleton = False
+            skeletons.put(key, skeleton)
+        if skeleton is False:
+            # the template does more with the values than place them, render them for real
+            return self._render(path, module_name, module_args, check_mode)
+        return fill(skeleton, values)
+
+    def _run_task(self, data, task_vars):
+        if isinstance(data, Mapping):
+            ignored = sorted(key for key in data if key not in HONOURED and (
+                key in KEYWORDS or key == 'local_action' or key.startswith('with_')))
+            if ignored:
+                raise AnsibleActionFail('invoke_x cannot run template tasks with {0}'.format(', '.join(ignored)))
+        try:
+            task = Task.load(data, block=self._task._parent, role=self._task._role,
+                             variable_manager=self._task._variable_manager, loader=self._loader)
+        except AnsibleError as e:
+            return dict(failed=True, msg=to_native(e))
+
+        collections = self._task.collections
+        if self._shared_loader_obj.action_loader.has_plugin(task.action, collection_list=collections):
+            handler_name = task.action
+        else:
+            handler_name, collections = 'normal', None
+        play_context = self._play_context.set_task_and_variable_override(task=task, variables=task_vars,
+                                                                         templar=self._templar)
+        handler = self._shared_loader_obj.action_loader.get(
+            handler_name, task=task, connection=self._connection, play_context=play_context, loader=self._loader,
+            templar=self._templar, shared_loader_obj=self._shared_loader_obj, collection_list=collections)
+        return handler.run(task_vars=task_vars)
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+
+        module_name = self._task.args.get('module_name')
+        if not module_name or not isinstance(module_name, string_types):
+            raise AnsibleActionFail('invoke_x requires module_name')
+        module_args = self._task.args.get('module_args') or {}
+        if not isinstance(module_args, Mapping):
+            raise AnsibleActionFail('invoke_x module_args must be a dictionary')
+        check_mode = boolean(self._task.args.get('check_mode', False), strict=False)
+        path = self._find_needle('templates', self._task.args.get('template', 'invoke_x_template.j2'))
+
+        results = [self._run_task(data, task_vars) for data in self._task_data(path, module_name, module_args,
+                                                                                check_mode)]
+        if len(results) == 1:
+            result.update(results[0])
+        else:
+            result.update(results=results, changed=any(r.get('changed') for r in results),
+                          failed=any(r.get('failed') for r in results))
+        return result
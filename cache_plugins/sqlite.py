@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    cache: sqlite
+    short_description: one SQLite row per host, facts decoded a top level key at a time
+    description:
+        - Keeps the fact cache in a single local SQLite file with one row per host. Each row holds
+          the host's facts as a JSON object plus the offsets of every top level key, so a key is
+          only parsed when it is used and unchanged keys are written back without re-encoding.
+        - Writes are collected and committed together, one transaction per 500 hosts or per second
+          and at exit. The database runs in WAL mode so readers in other processes are not blocked
+          by a commit.
+        - Rows older than the timeout are ignored and purged when the cache is opened.
+    options:
+      _uri:
+        required: True
+        description:
+          - Path of the SQLite file, or of a directory to create C(facts.sqlite) in.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_CONNECTION
+        ini:
+          - key: fact_caching_connection
+            section: defaults
+      _prefix:
+        description: User defined prefix for the host keys.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_PREFIX
+        ini:
+          - key: fact_caching_prefix
+            section: defaults
+      _timeout:
+        default: 86400
+        description: Expiration timeout in seconds for the cached facts, 0 never expires them.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_TIMEOUT
+        ini:
+          - key: fact_caching_timeout
+            section: defaults
+        type: integer
+'''
+
+import atexit
+import json
+import os
+import sqlite3
+import time
+
+from ansible.errors import AnsibleError
+from ansible.module_utils._text import to_native, to_text
+from ansible.module_utils.common._collections_compat import Mapping, MutableMapping
+from ansible.parsing.ajson import AnsibleJSONDecoder, AnsibleJSONEncoder
+from ansible.plugins.cache import BaseCacheModule
+
+BATCH_SIZE = 500
+BATCH_SECONDS = 1.0
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS facts (
+    host TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    offsets TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS facts_updated ON facts (updated);
+'''
+
+_UNDECODED = object()
+
+
+def _decode(text):
+    return json.loads(text, cls=AnsibleJSONDecoder)
+
+
+def _encode(value):
+    return json.dumps(value, cls=AnsibleJSONEncoder, sort_keys=True, separators=(',', ':'))
+
+
+class LazyFacts(MutableMapping):
+    ''' a host's facts, each top level value is parsed from its JSON text on first access '''
+
+    def __init__(self, raw=None):
+        self._raw = raw or {}
+        self._values = dict((key, _UNDECODED) for key in self._raw)
+
+    @classmethod
+    def from_row(cls, offsets, data):
+        raw = {}
+        for key, start, end in _decode(offsets):
+            raw[key] = data[start:end]
+        return cls(raw)
+
+    def __getitem__(self, key):
+        value = self._values[key]
+        if value is _UNDECODED:
+            value = self._values[key] = _decode(self._raw.pop(key))
+        return value
+
+    def __setitem__(self, key, value):
+        self._raw.pop(key, None)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        del self._values[key]
+        self._raw.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    # the dict merge operators, newer ansible updates cached facts with |=
+    def __or__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        facts = self.copy()
+        facts.update(other)
+        return facts
+
+    def __ror__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        merged = dict(other)
+        merged.update(self)
+        return merged
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self):
+        facts = LazyFacts(dict(self._raw))
+        facts._values.update(self._values)
+        return facts
+
+    def encoded(self):
+        ''' returns the offsets and data of the row, reusing the text of keys never decoded '''
+        parts = []
+        offsets = []
+        position = 1
+        for key in sorted(self._values):
+            raw = self._raw.get(key)
+            if raw is None:
+                raw = _encode(self._values[key])
+            prefix = _encode(key) + ':'
+            start = position + len(prefix)
+            offsets.append((key, start, start + len(raw)))
+            parts.append(prefix + raw)
+            position = start + len(raw) + 1
+        return _encode(offsets), '{' + ','.join(parts) + '}'
+
+
+class CacheModule(BaseCacheModule):
+    '''
+    A caching module backed by a local SQLite file.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(CacheModule, self).__init__(*args, **kwargs)
+        path = os.path.expanduser(self.get_option('_uri'))
+        if os.path.isdir(path):
+            path = os.path.join(path, 'facts.sqlite')
+        elif not os.path.isdir(os.path.dirname(path) or '.'):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except (OSError, IOError) as e:
+                raise AnsibleError('error in sqlite cache plugin while trying to create cache dir %s: %s'
+                                   % (os.path.dirname(path), to_native(e)))
+        self._path = path
+        self._prefix = self.get_option('_prefix') or ''
+        self._timeout = float(self.get_option('_timeout'))
+        self._cache = {}
+        self._pending = {}
+        self._pending_since = None
+        self._conn = None
+        self._pid = os.getpid()
+        atexit.register(self._commit)
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            # a connection must not be shared across fork, forked workers open their own and
+            # leave the parent's pending writes to the parent
+            self._pid = os.getpid()
+            self._conn = None
+            self._pending = {}
+            self._pending_since = None
+        if self._conn is None:
+            try:
+                self._conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=NORMAL')
+                self._conn.executescript(SCHEMA)
+                if self._timeout > 0:
+                    self._conn.execute('DELETE FROM facts WHERE updated < ?', (time.time() - self._timeout,))
+            except sqlite3.Error as e:
+                raise AnsibleError('error in sqlite cache plugin while opening %s: %s' % (self._path, to_native(e)))
+        return self._conn
+
+    def _oldest(self):
+        return time.time() - self._timeout if self._timeout > 0 else 0
+
+    def _commit(self):
+        if not self._pending or self._pid != os.getpid():
+            return
+        rows = [(host,) + row for host, row in self._pending.items()]
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany('INSERT OR REPLACE INTO facts (host, updated, offsets, data) VALUES (?, ?, ?, ?)',
+                                 rows)
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            raise AnsibleError('error in sqlite cache plugin while writing %d hosts to %s: %s'
+                               % (len(rows), self._path, to_native(e)))
+        self._pending = {}
+        self._pending_since = None
+
+    def _expired(self, updated):
+        return self._timeout > 0 and updated < self._oldest()
+
+    def get(self, key):
+        if key in self._cache:
+            return self._cache[key]
+        host = self._prefix + key
+        row = self._pending.get(host)
+        if row is None:
+            row = self._connection().execute('SELECT updated, offsets, data FROM facts WHERE host = ?',
+                                              (host,)).fetchone()
+        if row is None or self._expired(row[0]):
+            raise KeyError(key)
+        facts = self._cache[key] = LazyFacts.from_row(row[1], to_text(row[2]))
+        return facts
+
+    def set(self, key, value):
+        facts = value if isinstance(value, LazyFacts) else LazyFacts()
+        if facts is not value:
+            facts.update(value)
+        self._cache[key] = facts
+        self._pending[self._prefix + key] = (time.time(),) + facts.encoded()
+        if self._pending_since is None:
+            self._pending_since = time.time()
+        if len(self._pending) >= BATCH_SIZE or time.time() - self._pending_since >= BATCH_SECONDS:
+            self._commit()
+
+    def keys(self):
+        self._commit()
+        prefix = self._prefix
+        rows = self._connection().execute('SELECT host FROM facts WHERE updated >= ? AND substr(host, 1, ?) = ?',
+                                          (self._oldest(), len(prefix), prefix))
+        return [to_text(row[0])[len(prefix):] for row in rows]
+
+    def contains(self, key):
+        if key in self._cache or self._prefix + key in self._pending:
+            return True
+        row = self._connection().execute('SELECT updated FROM facts WHERE host = ?', (self._prefix + key,)).fetchone()
+        return row is not None and not self._expired(row[0])
+
+    def delete(self, key):
+        self._cache.pop(key, None)
+        self._pending.pop(self._prefix + key, None)
+        self._connection().execute('DELETE FROM facts WHERE host = ?', (self._prefix + key,))
+
+    def flush(self):
+        self._cache = {}
+        self._pending = {}
+        self._pending_since = None
+        if self._prefix:
+            self._connection().execute('DELETE FROM facts WHERE substr(host, 1, ?) = ?',
+                                       (len(self._prefix), self._prefix))
+        else:
+            self._connection().execute('DELETE FROM facts')
+
+    def copy(self):
+        return dict((key, self.get(key)) for key in self.keys())
+
+    def __getstate__(self):
+        self._commit()
+        state = self.__dict__.copy()
+        state.update(_conn=None, _pid=None, _pending={}, _pending_since=None)
+        return state
+
+    def __setstate__(self, data):
+        self.__dict__.update(data)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    callback: coalesce
+    type: stdout
+    short_description: one summary per task, identical messages counted instead of repeated
+    version_added: "2.8"
+    description:
+        - Instead of a line per host and loop item, prints one summary per task once it is done,
+          with status counts and each distinct message once with the number of hosts/items that
+          returned it.
+        - Failed and unreachable results are printed in full as they arrive, under the task's header.
+          Module warnings and deprecations are shown like the default callback does.
+        - Output goes through a bounded buffer and at most I(max_messages) distinct messages are
+          kept per task. Hosts and items are only counted, so memory stays flat however many
+          hosts and items a task has.
+        - Set with C(stdout_callback = coalesce).
+    options:
+      max_messages:
+        description: Distinct messages kept and shown per task, the rest are only counted.
+        default: 20
+        type: int
+        env:
+          - name: COALESCE_MAX_MESSAGES
+        ini:
+          - section: callback_coalesce
+            key: max_messages
+      message_length:
+        description: Messages are cut to this many characters before being compared.
+        default: 200
+        type: int
+        env:
+          - name: COALESCE_MESSAGE_LENGTH
+        ini:
+          - section: callback_coalesce
+            key: message_length
+'''
+
+from ansible import constants as C
+from ansible.module_utils._text import to_text
+from ansible.plugins.callback import CallbackBase
+
+STATUSES = ('ok', 'changed', 'failed', 'skipped', 'unreachable', 'ignored')
+# Display calls are batched; lines are held until this many characters are waiting.
+BUFFER_CHARS = 64 * 1024
+
+
+class TaskSummary(object):
+
+    def __init__(self, name, max_messages):
+        self.name = name
+        self.max_messages = max_messages
+        self.counts = dict((status, 0) for status in STATUSES)
+        self.items = 0
+        self.hosts = 0
+        self.messages = {}
+        self.other_messages = 0
+
+    def add(self, status, message, item=False):
+        # every host has one result per task besides its items, so counting results counts hosts
+        if item:
+            self.items += 1
+        else:
+            self.hosts += 1
+            self.counts[status] += 1
+        if message is None:
+            return
+        if message in self.messages:
+            self.messages[message] += 1
+        elif len(self.messages) < self.max_messages:
+            self.messages[message] = 1
+        else:
+            self.other_messages += 1
+
+
+class CallbackModule(CallbackBase):
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'stdout'
+    CALLBACK_NAME = 'coalesce'
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.task = None
+        self.buffer = []
+        self.buffered = 0
+        self.max_messages = 20
+        self.message_length = 200
+
+    def set_options(self, task_keys=None, var_options=None, direct=None):
+        super(CallbackModule, self).set_options(task_keys=task_keys, var_options=var_options, direct=direct)
+        self.max_messages = self.get_option('max_messages')
+        self.message_length = self.get_option('message_length')
+
+    def _emit(self, line, color=None):
+        if color:
+            self._flush()
+            self._display.display(line, color=color)
+            return
+        self.buffer.append(line)
+        self.buffered += len(line) + 1
+        if self.buffered >= BUFFER_CHARS:
+            self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self._display.display(u'\n'.join(self.buffer))
+        self.buffer = []
+        self.buffered = 0
+
+    def _message(self, result):
+        res = result._result
+        if 'results' in res:
+            # the 'All items completed' of a loop, its items were counted already
+            return None
+        for key in ('msg', 'stdout'):
+            if res.get(key):
+                return to_text(res[key])[:self.message_length]
+        return None
+
+    def _close_task(self):
+        task, self.task = self.task, None
+        if task is None:
+            return
+        counts = ' '.join('{0}={1}'.format(status, task.counts[status]) for status in STATUSES if task.counts[status])
+        items = ' items={0}'.format(task.items) if task.items else ''
+        self._emit(u'  hosts={0} {1}{2}'.format(task.hosts, counts or 'no results', items))
+        for message, count in sorted(task.messages.items(), key=lambda item: -item[1]):
+            self._emit(u'  {0:>6}x {1}'.format(count, message))
+        if task.other_messages:
+            self._emit(u'  {0:>6}x (more distinct messages, not kept)'.format(task.other_messages))
+
+    def _start_task(self, name):
+        self._close_task()
+        self.task = TaskSummary(name, self.max_messages)
+        self._emit(u'TASK [{0}]'.format(name))
+
+    def v2_playbook_on_play_start(self, play):
+        self._close_task()
+        name = play.get_name().strip()
+        self._emit(u'PLAY [{0}]'.format(name) if name else u'PLAY')
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._start_task(task.get_name().strip())
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self._start_task(u'RUNNING HANDLER {0}'.format(task.get_name().strip()))
+
+    def v2_playbook_on_cleanup_task_start(self, task):
+        self._start_task(u'CLEANUP TASK {0}'.format(task.get_name().strip()))
+
+    def _warn(self, result):
+        if result._result.get('warnings') or result._result.get('deprecations'):
+            # warnings go to stderr right away, what is buffered for stdout comes before them
+            self._flush()
+            self._handle_warnings(result._result)
+
+    def _add(self, result, status, item=False):
+        if self.task is None:
+            self._start_task(result._task.get_name().strip())
+        self.task.add(status, None if status == 'skipped' else self._message(result), item)
+
+    def _detail(self, result, status, color):
+        res = result._result
+        if 'results' in res:
+            # a loop's aggregate result, its failed items were printed as they arrived
+            res = dict(res)
+            res['results'] = u'{0} items, failures shown above'.format(len(res['results']))
+        self._emit(u'{0}: [{1}]{2} => {3}'.format(
+            status.upper(), result._host.get_name(),
+            u' (item={0})'.format(self._get_item_label(res)) if 'item' in res else u'',
+            self._dump_results(res, indent=4)), color=color)
+
+    def v2_runner_on_ok(self, result):
+        self._warn(result)
+        self._add(result, 'changed' if result._result.get('changed') else 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._handle_exception(result._result)
+        self._warn(result)
+        self._add(result, 'ignored' if ignore_errors else 'failed')
+        self._detail(result, 'ignored' if ignore_errors else 'failed', C.COLOR_SKIP if ignore_errors else C.COLOR_ERROR)
+
+    def v2_runner_on_skipped(self, result):
+        self._add(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self._add(result, 'unreachable')
+        self._detail(result, 'unreachable', C.COLOR_UNREACHABLE)
+
+    def v2_runner_item_on_ok(self, result):
+        self._warn(result)
+        self._add(result, 'changed' if result._result.get('changed') else 'ok', item=True)
+
+    def v2_runner_item_on_failed(self, result):
+        self._warn(result)
+        if result._task.ignore_errors:
+            self._add(result, 'ignored', item=True)
+            self._detail(result, 'ignored', C.COLOR_SKIP)
+        else:
+            self._add(result, 'failed', item=True)
+            self._detail(result, 'failed', C.COLOR_ERROR)
+
+    def v2_runner_item_on_skipped(self, result):
+        self._add(result, 'skipped', item=True)
+
+    def v2_playbook_on_stats(self, stats):
+        self._close_task()
+        self._emit(u'PLAY RECAP')
+        for host in sorted(stats.processed.keys()):
+            s = stats.summarize(host)
+            self._emit(u'{0:<30} : ok={1} changed={2} unreachable={3} failed={4} skipped={5} rescued={6} ignored={7}'.format(
+                host, s['ok'], s['changed'], s['unreachable'], s['failures'], s['skipped'],
+                s.get('rescued', 0), s.get('ignored', 0)))
+        self._flush()
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    callback: task_profile
+    type: aggregate
+    short_description: per task/host timing records and latency histograms
+    version_added: "2.8"
+    description:
+        - Records, for every task/host pair, where its time went. C(queue) is from the task
+          starting until a worker is forked for the host, which covers the controller gathering
+          the host's variables and waiting for a free fork. C(run) is everything from the fork on.
+        - With I(phases) C(run) is split further. C(dispatch) is from the fork until the
+          worker starts running the task. C(template) is the rest of the worker's time outside
+          the action, mostly templating loop items, conditionals and arguments, and setting up
+          the connection and action plugin. C(module) is the action plugin's run, including
+          transferring and executing the module. C(result) is from the worker finishing until
+          the controller processes the result.
+        - Some time cannot be split further. C(module) does not separate the action plugin's own
+          work from the module's, and C(result) does not separate sending the result back from
+          the strategy handling it. Results that ansible makes up in the controller have only
+          C(queue) and C(run).
+        - Writes one compact JSON line per pair to a size-rotated, optionally gzip compressed file,
+          and keeps streaming log-scale latency histograms per task and per host.
+        - At the end of the playbook prints the slowest tasks and hosts with their percentiles.
+    requirements:
+        - whitelist in configuration, e.g. C(callback_whitelist = task_profile)
+    options:
+      output_dir:
+        description: Directory for the JSONL files.
+        default: ~/.ansible/task_profile
+        env:
+          - name: TASK_PROFILE_OUTPUT_DIR
+        ini:
+          - section: callback_task_profile
+            key: output_dir
+      max_bytes:
+        description:
+          - Rotate the file once this many (uncompressed) bytes were written to it.
+          - A compressed file cannot tell how much was written to it, so with I(compress) every
+            run starts a new file and rotates the one it finds.
+        default: 52428800
+        type: int
+        env:
+          - name: TASK_PROFILE_MAX_BYTES
+        ini:
+          - section: callback_task_profile
+            key: max_bytes
+      backups:
+        description: Number of rotated files to keep.
+        default: 5
+        type: int
+        env:
+          - name: TASK_PROFILE_BACKUPS
+        ini:
+          - section: callback_task_profile
+            key: backups
+      compress:
+        description: Write gzip compressed files.
+        default: False
+        type: bool
+        env:
+          - name: TASK_PROFILE_COMPRESS
+        ini:
+          - section: callback_task_profile
+            key: compress
+      phases:
+        description:
+          - Split C(run) into C(dispatch), C(template), C(module) and C(result).
+          - This wraps ansible's C(TaskExecutor) and C(TaskResult) so that workers send their
+            timestamps back with each result, which ties the callback to ansible internals.
+        default: False
+        type: bool
+        env:
+          - name: TASK_PROFILE_PHASES
+        ini:
+          - section: callback_task_profile
+            key: phases
+      top:
+        description: Number of slowest tasks and hosts in the summary.
+        default: 10
+        type: int
+        env:
+          - name: TASK_PROFILE_TOP
+        ini:
+          - section: callback_task_profile
+            key: top
+'''
+
+import gzip
+import json
+import math
+import os
+import time
+
+from ansible.executor.task_executor import TaskExecutor
+from ansible.executor.task_result import TaskResult
+from ansible.module_utils._text import to_bytes
+from ansible.plugins.callback import CallbackBase
+
+# Records are written in batches, so the callback only touches the file every FLUSH_EVERY results.
+FLUSH_EVERY = 500
+# Histogram buckets are SUB_BUCKETS per power of two milliseconds, about 19% wide each.
+SUB_BUCKETS = 4
+PHASES = ('queue', 'dispatch', 'template', 'module', 'result')
+# the worker's timestamps travel in the result under this key, which is internal and left out of results
+# handed to callbacks, and are kept in WORKER_TIMES by host and task as the controller hands them out,
+# until the result is recorded or the play ends
+RESULT_KEY = '_ansible_task_profile'
+WORKER_TIMES = {}
+# ansible 2.10 and later make the action handler in _get_action_handler_with_module_context
+HANDLER_FACTORY = next(name for name in ('_get_action_handler_with_module_context', '_get_action_handler')
+                       if hasattr(TaskExecutor, name))
+
+
+def install():
+    ''' makes workers, which are forked from the controller after this, time their tasks '''
+    if getattr(TaskExecutor, '_task_profile', False):
+        return
+    original_run = TaskExecutor.run
+    original_factory = getattr(TaskExecutor, HANDLER_FACTORY)
+    original_clean_copy = TaskResult.clean_copy
+
+    def run(self):
+        self._task_profile_module = 0.0
+        start = time.time()
+        result = original_run(self)
+        if isinstance(result, dict):
+            result[RESULT_KEY] = dict(start=start, end=time.time(), module=self._task_profile_module)
+        return result
+
+    def factory(self, *args, **kwargs):
+        made = original_factory(self, *args, **kwargs)
+        handler = made[0] if isinstance(made, tuple) else made
+        handler_run = handler.run
+
+        def timed_run(*run_args, **run_kwargs):
+            start = time.time()
+            try:
+                return handler_run(*run_args, **run_kwargs)
+            finally:
+                self._task_profile_module = getattr(self, '_task_profile_module', 0.0) + time.time() - start
+        handler.run = timed_run
+        return made
+
+    def clean_copy(self):
+        worker = self._result.pop(RESULT_KEY, None)
+        if worker is not None:
+            WORKER_TIMES[(getattr(self._host, 'name', self._host), self._task._uuid)] = worker
+        return original_clean_copy(self)
+
+    TaskExecutor.run = run
+    setattr(TaskExecutor, HANDLER_FACTORY, factory)
+    TaskResult.clean_copy = clean_copy
+    TaskExecutor._task_profile = True
+
+
+class LatencyHistogram(object):
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        mantissa, exponent = math.frexp(ms + 1.0)
+        index = exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    @staticmethod
+    def upper_bound(index):
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2.0 * SUB_BUCKETS), exponent) - 1.0
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= wanted:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        return dict(count=self.count, total_ms=round(self.total, 3), max_ms=round(self.max, 3),
+                    p50_ms=round(self.percentile(0.5), 3), p95_ms=round(self.percentile(0.95), 3),
+                    p99_ms=round(self.percentile(0.99), 3),
+                    buckets=dict((str(round(self.upper_bound(i), 3)), n) for i, n in sorted(self.buckets.items())))
+
+
+class RotatingJsonl(object):
+
+    def __init__(self, directory, max_bytes, backups, compress):
+        self.path = os.path.join(directory, 'task_profile.jsonl' + ('.gz' if compress else ''))
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.written = 0
+        if os.path.exists(self.path):
+            if compress:
+                self._shift()
+            else:
+                self.written = os.path.getsize(self.path)
+        self.handle = self._open()
+
+    def _open(self):
+        return gzip.open(self.path, 'ab') if self.compress else open(self.path, 'ab')
+
+    def write(self, lines):
+        data = to_bytes(''.join(lines))
+        if self.written and self.written + len(data) > self.max_bytes:
+            self.rotate()
+        self.handle.write(data)
+        self.written += len(data)
+
+    def rotate(self):
+        self.handle.close()
+        self._shift()
+        self.handle = self._open()
+        self.written = 0
+
+    def _shift(self):
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists('{0}.{1}'.format(self.path, n)):
+                os.rename('{0}.{1}'.format(self.path, n), '{0}.{1}'.format(self.path, n + 1))
+        if self.backups:
+            os.rename(self.path, self.path + '.1')
+        else:
+            os.unlink(self.path)
+
+    def close(self):
+        self.handle.close()
+
+
+class CallbackModule(CallbackBase):
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'task_profile'
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.output = None
+        self.pending = []
+        self.task_started = {}
+        self.host_started = {}
+        self.task_names = {}
+        self.by_task = {}
+        self.by_host = {}
+        self.phases = {}
+        self.phase_totals = [0.0] * len(PHASES)
+        self.playbook_start = time.time()
+
+    def set_options(self, task_keys=None, var_options=None, direct=None):
+        super(CallbackModule, self).set_options(task_keys=task_keys, var_options=var_options, direct=direct)
+        self.top = self.get_option('top')
+        if self.get_option('phases'):
+            install()
+        if self.output:
+            self.output.close()
+        self.output = RotatingJsonl(os.path.expanduser(self.get_option('output_dir')), self.get_option('max_bytes'),
+                                    self.get_option('backups'), self.get_option('compress'))
+
+    def _forget_hosts(self):
+        ''' drops what was kept for results that never reached the callback '''
+        WORKER_TIMES.clear()
+        self.host_started.clear()
+
+    def v2_playbook_on_play_start(self, play):
+        self._forget_hosts()
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self.task_started[task._uuid] = time.time()
+        self.task_names[task._uuid] = task.get_name()
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.v2_playbook_on_task_start(task, False)
+
+    def v2_runner_on_start(self, host, task):
+        self.host_started[(host.get_name(), task._uuid)] = time.time()
+
+    def _record(self, result, status):
+        now = time.time()
+        host = result._host.get_name()
+        uuid = result._task._uuid
+        task_start = self.task_started.get(uuid, now)
+        host_start = self.host_started.pop((host, uuid), task_start)
+        run_ms = (now - host_start) * 1000.0
+        phases = [(host_start - task_start) * 1000.0, None, None, None, None]
+        worker = WORKER_TIMES.pop((host, uuid), None)
+        if isinstance(worker, dict) and host_start <= worker['start'] <= worker['end'] <= now:
+            phases[1:] = [(worker['start'] - host_start) * 1000.0,
+                          (worker['end'] - worker['start'] - worker['module']) * 1000.0,
+                          worker['module'] * 1000.0, (now - worker['end']) * 1000.0]
+        name = self.task_names.get(uuid) or result._task.get_name()
+        totals = self.phases.get(uuid)
+        if totals is None:
+            totals = self.phases[uuid] = [0.0] * len(PHASES)
+        for i, ms in enumerate(phases):
+            if ms is not None:
+                totals[i] += ms
+                self.phase_totals[i] += ms
+
+        histogram = self.by_task.get((uuid, name))
+        if histogram is None:
+            histogram = self.by_task[(uuid, name)] = LatencyHistogram()
+        histogram.add(run_ms)
+        histogram = self.by_host.get(host)
+        if histogram is None:
+            histogram = self.by_host[host] = LatencyHistogram()
+        histogram.add(run_ms)
+
+        record = {'ts': round(now, 3), 'task': name, 'uuid': uuid, 'host': host, 'status': status,
+                  'run_ms': round(run_ms, 3)}
+        for phase, ms in zip(PHASES, phases):
+            record[phase + '_ms'] = None if ms is None else round(ms, 3)
+        self.pending.append(json.dumps(record, separators=(',', ':')) + '\n')
+        if len(self.pending) >= FLUSH_EVERY:
+            self._flush()
+
+    def _flush(self):
+        if self.pending and self.output:
+            self.output.write(self.pending)
+        self.pending = []
+
+    def v2_runner_on_ok(self, result):
+        self._record(result, 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, 'ignored' if ignore_errors else 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        self._record(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self._record(result, 'unreachable')
+
+    def _summary_lines(self, title, histograms, label):
+        slowest = sorted(histograms.items(), key=lambda item: -item[1].total)[:self.top]
+        if not slowest:
+            return
+        self._display.display('{0} {1}'.format(title, '*' * max(3, 77 - len(title))))
+        for key, histogram in slowest:
+            self._display.display('{0:<50} {1:>10.2f}s total {2:>6} runs  p50 {3:>9.1f}ms  p95 {4:>9.1f}ms  '
+                                  'max {5:>9.1f}ms'.format(label(key)[:50], histogram.total / 1000.0, histogram.count,
+                                                           histogram.percentile(0.5), histogram.percentile(0.95),
+                                                           histogram.max))
+
+    def v2_playbook_on_stats(self, stats):
+        summary = {'summary': True, 'ts': round(time.time(), 3),
+                   'elapsed_ms': round((time.time() - self.playbook_start) * 1000.0, 3),
+                   'phases_ms': dict((phase, round(ms, 3)) for phase, ms in zip(PHASES, self.phase_totals)),
+                   'tasks': [dict(task=name, uuid=uuid, phases_ms=dict(
+                       (phase, round(ms, 3)) for phase, ms in zip(PHASES, self.phases.get(uuid, ()))), **h.to_dict())
+                       for (uuid, name), h in self.by_task.items()],
+                   'hosts': [dict(host=host, **h.to_dict()) for host, h in self.by_host.items()]}
+        self.pending.append(json.dumps(summary, separators=(',', ':')) + '\n')
+        self._flush()
+        self._forget_hosts()
+        if self.output:
+            self.output.close()
+            self.output = None
+        self._summary_lines('SLOWEST TASKS', self.by_task, lambda key: key[1])
+        self._summary_lines('SLOWEST HOSTS', self.by_host, lambda key: key)
+        total = sum(self.phase_totals)
+        if total:
+            self._display.display('TIME BY PHASE {0}'.format('*' * 64))
+            for phase, ms in zip(PHASES, self.phase_totals):
+                self._display.display('{0:<50} {1:>10.2f}s total {2:>6.1%}'.format(phase, ms / 1000.0, ms / total))
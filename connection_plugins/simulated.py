@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    connection: simulated
+    short_description: local stand-in for remote hosts with injected latency, failures and unreachables
+    description:
+        - Runs on the controller like the local connection, but every command first waits for a
+          latency drawn from the host's distribution, and module runs fail or make the host
+          unreachable at the host's rates.
+        - With C(ansible_sim_execute=false) modules are not run at all, a module run returns
+          C(changed=false) (and C(ping=pong) for ping) right away, so thousands of hosts can be
+          simulated on one machine. Files are then not fetched, and not copied but created empty. Other commands, like
+          creating the temporary directory, still run locally; turn on pipelining to skip them.
+        - Draws are made from a random generator seeded with C(ansible_sim_seed), the host name,
+          the module name and arguments, and how many times the host made that same call before
+          in the run. So a run with the same inventory and playbook gives the same outcome for
+          every host, and a call repeated on a host, like C(ping) twenty times, fails at the
+          configured rate. The counts are kept in the run's local temporary directory, which
+          ansible removes when the run ends.
+    options:
+      latency:
+        description: Mean seconds every command takes.
+        default: 0.0
+        type: float
+        vars:
+          - name: ansible_sim_latency
+      latency_distribution:
+        description: Shape of the latency, C(fixed), C(uniform) (0 to twice the mean),
+          C(exponential) or C(lognormal) (with I(latency_sigma)).
+        default: fixed
+        choices: [fixed, uniform, exponential, lognormal]
+        vars:
+          - name: ansible_sim_latency_distribution
+      latency_sigma:
+        description: Sigma of the lognormal latency distribution.
+        default: 0.5
+        type: float
+        vars:
+          - name: ansible_sim_latency_sigma
+      failure_rate:
+        description: Fraction of module runs that fail.
+        default: 0.0
+        type: float
+        vars:
+          - name: ansible_sim_failure_rate
+      unreachable_rate:
+        description: Fraction of module runs where the host is unreachable.
+        default: 0.0
+        type: float
+        vars:
+          - name: ansible_sim_unreachable_rate
+      output_size:
+        description: Characters of padding added to every module result, in C(simulated_output).
+        default: 0
+        type: int
+        vars:
+          - name: ansible_sim_output_size
+      execute:
+        description: Run modules for real through the local connection.
+        default: True
+        type: bool
+        vars:
+          - name: ansible_sim_execute
+      seed:
+        description: Seed for the latency, failure and unreachable draws.
+        default: 0
+        vars:
+          - name: ansible_sim_seed
+      host:
+        description: Host name the draws are made for.
+        vars:
+          - name: inventory_hostname
+'''
+
+import ast
+import fcntl
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+
+from ansible import constants as C
+from ansible.errors import AnsibleConnectionFailure
+from ansible.module_utils._text import to_bytes, to_text
+from ansible.plugins.connection.local import Connection as LocalConnection
+from ansible.utils.path import makedirs_safe
+
+MODULE_NAME = re.compile(br"mod_name='([\w.]+)'")
+MODULE_PARAMS = re.compile(br"^\s*ANSIBALLZ_PARAMS = (.*)$", re.M)
+# an interpreter running a staged module, not chmod or rm on it
+STAGED_MODULE_RUN = re.compile(br"-c '(?:[\w=]+ )*\S*python\S* \S+/AnsiballZ_")
+
+
+def module_call(wrapper):
+    ''' module name and arguments of an AnsiballZ wrapper, leaving out what changes every run '''
+    name = MODULE_NAME.search(wrapper)
+    params = MODULE_PARAMS.search(wrapper)
+    try:
+        args = json.loads(ast.literal_eval(to_text(params.group(1))))['ANSIBLE_MODULE_ARGS']
+    except (AttributeError, KeyError, SyntaxError, TypeError, ValueError):
+        args = {}
+    args = dict((k, v) for k, v in args.items() if not k.startswith('_ansible_'))
+    return to_text(name.group(1)).rpartition('.')[2] if name else u'', json.dumps(args, sort_keys=True)
+
+
+class Connection(LocalConnection):
+    ''' Local connection with simulated latency and failures '''
+
+    transport = 'simulated'
+
+    def __init__(self, *args, **kwargs):
+        super(Connection, self).__init__(*args, **kwargs)
+        self._commands = 0
+        self._staged_call = None
+
+    def _host(self):
+        return self.get_option('host') or self._play_context.remote_addr
+
+    def _rng(self, *parts):
+        digest = hashlib.sha1(to_bytes(u'{0}\0{1}'.format(self.get_option('seed'), self._host())))
+        for part in parts:
+            digest.update(b'\0' + to_bytes(part))
+        return random.Random(digest.hexdigest())
+
+    def _call_count(self, call):
+        '''
+        how many times this host made the same call before in this run. Workers are forked per task,
+        so each call appends a byte to a file in the local temporary directory they share.
+        '''
+        directory = os.path.join(C.DEFAULT_LOCAL_TMP, 'simulated_calls')
+        makedirs_safe(directory)
+        name = hashlib.sha1(to_bytes(u'\0'.join((self._host(),) + tuple(call)))).hexdigest()
+        with open(os.path.join(directory, name), 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            count = os.fstat(f.fileno()).st_size
+            f.write(b'.')
+        return count
+
+    def _next_rng(self):
+        self._commands += 1
+        return self._rng(self._commands)
+
+    def _wait(self, rng):
+        mean = self.get_option('latency')
+        if mean <= 0:
+            return
+        distribution = self.get_option('latency_distribution')
+        if distribution == 'uniform':
+            delay = rng.uniform(0, 2 * mean)
+        elif distribution == 'exponential':
+            delay = rng.expovariate(1.0 / mean)
+        elif distribution == 'lognormal':
+            sigma = self.get_option('latency_sigma')
+            # mu is chosen so the distribution's mean is the configured latency
+            delay = rng.lognormvariate(0, sigma) * mean / math.exp(sigma * sigma / 2)
+        else:
+            delay = mean
+        time.sleep(delay)
+
+    def _result(self, result):
+        if self.get_option('output_size'):
+            result['simulated_output'] = u'x' * self.get_option('output_size')
+        return to_bytes(json.dumps(result))
+
+    def exec_command(self, cmd, in_data=None, sudoable=True):
+        b_cmd = to_bytes(cmd)
+        if in_data is not None:
+            call = module_call(in_data)
+        elif STAGED_MODULE_RUN.search(b_cmd):
+            call = self._staged_call or (u'', u'')
+        else:
+            # temporary directory handling and the like, cheap and its output is parsed
+            self._wait(self._next_rng())
+            return super(Connection, self).exec_command(cmd, in_data=in_data, sudoable=sudoable)
+
+        rng = self._rng(*(tuple(call) + (self._call_count(call),)))
+        if rng.random() < self.get_option('unreachable_rate'):
+            self._wait(rng)
+            raise AnsibleConnectionFailure('simulated unreachable host {0}'.format(self._host()))
+        failed = rng.random() < self.get_option('failure_rate')
+        self._wait(rng)
+        if failed:
+            return 1, self._result(dict(failed=True, msg='simulated failure')), b''
+
+        if self.get_option('execute'):
+            rc, stdout, stderr = super(Connection, self).exec_command(cmd, in_data=in_data, sudoable=sudoable)
+            if rc == 0 and self.get_option('output_size'):
+                try:
+                    stdout = self._result(json.loads(to_text(stdout)))
+                except ValueError:
+                    pass
+            return rc, stdout, stderr
+
+        result = dict(changed=False)
+        if call[0] in ('ping', 'ansible_module_ping'):
+            result['ping'] = 'pong'
+        return 0, self._result(result), b''
+
+    def put_file(self, in_path, out_path):
+        if 'AnsiballZ_' in to_text(out_path):
+            with open(in_path, 'rb') as f:
+                self._staged_call = module_call(f.read())
+        self._wait(self._next_rng())
+        if self.get_option('execute'):
+            super(Connection, self).put_file(in_path, out_path)
+        else:
+            # an empty stand-in, so chmod and cleanup of the file still work
+            open(to_bytes(out_path), 'ab').close()
+
+    def fetch_file(self, in_path, out_path):
+        self._wait(self._next_rng())
+        if self.get_option('execute'):
+            super(Connection, self).fetch_file(in_path, out_path)
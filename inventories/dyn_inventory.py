@@ -1,6 +1,14 @@
 #!/usr/bin/env python
-from argparse import ArgumentParser
-from pprint import pprint
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'utils'))
+try:
+    from inventory_backend import run  # noqa: E402
+except ImportError:
+    # copied without utils/, so there is no inventory server to ask
+    def run(source, render):
+        render(sys.argv[1:], os.environ, sys.stdout)
 
 inventory = {'group_one': {'hosts': ['group_one_host_0{}'.format(i) for i in range(1, 6)]
                                     + ['group_one_and_two_host_0{}'.format(i) for i in range(1, 6)]
@@ -25,19 +33,134 @@ inventory = {'group_one': {'hosts': ['group_one_host_0{}'.format(i) for i in ran
                                     'group_two_host_01': {'group_two_host_01_has_this_var': True},
                                     'group_three_host_01': {'group_three_host_01_has_this_var': True}}}}
 
-def parse_args():
+# Scale mode: when a host count is given (--hosts or DYN_INVENTORY_HOSTS) a synthetic
+# inventory is streamed to stdout as JSON instead of printing the fixed one above.
+#
+#   scale_host_<n>          host n, member of scale_group_<n % groups>
+#   scale_group_<k>         also holds an --overlap fraction of scale_group_<k - 1>'s hosts
+#   scale_level_<d>_<k>     --depth levels of parent groups, NESTING_FANOUT children each
+NESTING_FANOUT = 4
+WRITE_BATCH = 1000
+
+
+def env_default(environ, name, default, cast):
+    value = environ.get('DYN_INVENTORY_{}'.format(name))
+    return default if value in (None, '') else cast(value)
+
+
+def parse_args(argv, environ):
+    from argparse import ArgumentParser
     parser = ArgumentParser()
     parser.add_argument('--list', dest='list_instances', action='store_true', default=True,
                         help='List instances (default: True)')
     parser.add_argument('--host', dest='requested_host', help='Get all the variables about a specific instance')
-    return parser.parse_args()
+    parser.add_argument('--hosts', type=int, default=env_default(environ, 'HOSTS', 0, int),
+                        help='Number of synthetic hosts, enables scale mode (env: DYN_INVENTORY_HOSTS)')
+    parser.add_argument('--groups', type=int, default=env_default(environ, 'GROUPS', 10, int),
+                        help='Number of leaf groups in scale mode (env: DYN_INVENTORY_GROUPS)')
+    parser.add_argument('--overlap', type=float, default=env_default(environ, 'OVERLAP', 0.0, float),
+                        help='Fraction of hosts also placed in a neighbouring group (env: DYN_INVENTORY_OVERLAP)')
+    parser.add_argument('--depth', type=int, default=env_default(environ, 'DEPTH', 0, int),
+                        help='Levels of parent groups above the leaf groups (env: DYN_INVENTORY_DEPTH)')
+    parser.add_argument('--hostvars-size', dest='hostvars_size', type=int,
+                        default=env_default(environ, 'HOSTVARS_SIZE', 0, int),
+                        help='Bytes of padding in each host\'s vars (env: DYN_INVENTORY_HOSTVARS_SIZE)')
+    args = parser.parse_args(argv)
+    if args.hosts < 0 or args.groups < 1 or args.depth < 0 or args.hostvars_size < 0:
+        parser.error('--hosts, --depth and --hostvars-size must be >= 0 and --groups >= 1')
+    if not 0.0 <= args.overlap <= 1.0:
+        parser.error('--overlap must be between 0.0 and 1.0')
+    return args
+
+
+def overlaps(index, ratio):
+    # Knuth multiplicative hash, so membership is stable across runs without an RNG.
+    return (index * 2654435761) % 4294967296 < ratio * 4294967296
+
+
+def scale_group_hosts(group, args):
+    for index in range(group, args.hosts, args.groups):
+        yield 'scale_host_{}'.format(index)
+    if args.overlap and args.groups > 1:
+        for index in range((group - 1) % args.groups, args.hosts, args.groups):
+            if overlaps(index, args.overlap):
+                yield 'scale_host_{}'.format(index)
+
+
+def scale_hostvars(index, args):
+    hostvars = {'scale_host_index': index}
+    if args.hostvars_size:
+        hostvars['scale_payload'] = 'x' * args.hostvars_size
+    return hostvars
+
+
+def write_json_list(out, items):
+    # Writes a JSON array of generated (plain ASCII) names in batches so no group ever
+    # holds all its names at once.
+    out.write('[')
+    batch = []
+    first = True
+    for item in items:
+        batch.append('"{}"'.format(item))
+        if len(batch) == WRITE_BATCH:
+            out.write(('' if first else ', ') + ', '.join(batch))
+            first = False
+            batch = []
+    if batch:
+        out.write(('' if first else ', ') + ', '.join(batch))
+    out.write(']')
+
+
+def stream_scale_inventory(args, out):
+    import json
+    out.write('{"all": {"vars": {"ansible_connection": "local", "inventories_var": true}}')
+    for group in range(args.groups):
+        out.write(', "scale_group_{0}": {{"vars": {{"scale_group_index": {0}}}, "hosts": '.format(group))
+        write_json_list(out, scale_group_hosts(group, args))
+        out.write('}')
+
+    children = args.groups
+    for level in range(1, args.depth + 1):
+        child_name = 'scale_group_{}' if level == 1 else 'scale_level_{}_{{}}'.format(level - 1)
+        parents = (children + NESTING_FANOUT - 1) // NESTING_FANOUT
+        for parent in range(parents):
+            out.write(', "scale_level_{}_{}": {{"children": '.format(level, parent))
+            write_json_list(out, (child_name.format(child) for child in
+                                  range(parent * NESTING_FANOUT, min((parent + 1) * NESTING_FANOUT, children))))
+            out.write('}')
+        children = parents
+
+    # Every host's vars share one shape, so serialize the payload once and splice in the index.
+    payload = ''
+    if args.hostvars_size:
+        payload = ', "scale_payload": {}'.format(json.dumps('x' * args.hostvars_size))
+    out.write(', "_meta": {"hostvars": {')
+    for start in range(0, args.hosts, WRITE_BATCH):
+        out.write(('' if start == 0 else ', ') + ', '.join(
+            '"scale_host_{0}": {{"scale_host_index": {0}{1}}}'.format(index, payload)
+            for index in range(start, min(start + WRITE_BATCH, args.hosts))))
+    out.write('}}}\n')
+    out.flush()
 
 
-def load_inventory():
-    args = parse_args()
-    if args.list_instances:
-        pprint(inventory)
+def render(argv, environ, out):
+    args = parse_args(argv, environ)
+    if args.hosts:
+        if args.requested_host:
+            import json
+            prefix, _, index = args.requested_host.rpartition('_')
+            hostvars = {}
+            # only the generated spelling, scale_host_01 is an unknown host like any other
+            if prefix == 'scale_host' and index.isdigit() and index == str(int(index)) and int(index) < args.hosts:
+                hostvars = scale_hostvars(int(index), args)
+            out.write(json.dumps(hostvars) + '\n')
+        else:
+            stream_scale_inventory(args, out)
+    elif args.list_instances:
+        import json
+        json.dump(inventory, out)
+        out.write('\n')
 
 
 if __name__ == '__main__':
-    load_inventory()
+    run(__file__, render)
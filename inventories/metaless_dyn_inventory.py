@@ -1,29 +1,49 @@
 #!/usr/bin/env python
 from argparse import ArgumentParser
-from pprint import pprint
+import hashlib
 import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
 
-inventory = {'group_one': {'hosts': ['group_one_host_0{}'.format(i) for i in range(1, 6)]
-                                    + ['group_one_and_two_host_0{}'.format(i) for i in range(1, 6)]
-                                    + ['group_one_two_and_three_host_0{}'.format(i) for i in range(1, 6)],
-                           'vars': {'is_in_group_one': True,
-                                    'complex_var': [{"dir": "/opt/gwaf/logs",
-                                                     "sourcetype": "gwaf",
-                                                     "something_else": [1, 2, 3]}]}},
-             'group_two': {'hosts': ['group_two_host_0{}'.format(i) for i in range(1, 6)]
-                                    + ['group_one_and_two_host_0{}'.format(i) for i in range(1, 6)]
-                                    + ['group_two_and_three_host_0{}'.format(i) for i in range(1, 6)]
-                                    + ['group_one_two_and_three_host_0{}'.format(i) for i in range(1, 6)],
-                           'vars': {'is_in_group_two': True}},
-             'group_three': {'hosts': ['group_three_host_0{}'.format(i) for i in range(1, 6)]
-                                    + ['group_two_and_three_host_0{}'.format(i) for i in range(1, 6)]
-                                    + ['group_one_two_and_three_host_0{}'.format(i) for i in range(1, 6)],
-                             'vars': {'is_in_group_three': True}},
-             'all': {'vars': {'ansible_connection': 'local',
-                              'inventories_var': True}},
-             'ungrouped': {'hosts': ['ungrouped_host_0{}'.format(i) for i in range(1, 6)]}}
-
-hostvars = {'group_one_host_01': {'group_one_host_01_has_this_var': True},
+# Without _meta the controller calls this script once per host with --host, so the
+# rendered output is kept in an indexed cache file and each call only seeks to its answer.
+# The cache is rebuilt whenever this file changes.  Set METALESS_DYN_INVENTORY_CACHE to
+# choose its path, or to an empty string to always render in-process; by default it lives
+# in the per-user ~/.ansible/tmp directory, and a cache file not owned by us is ignored.
+#
+# Layout: header | hash table of (key hash, offset, length) slots | rendered --list | host entries
+CACHE_MAGIC = b'MDINV001'
+CACHE_HEADER = struct.Struct('<8s32sQQQQ')
+CACHE_SLOT = struct.Struct('<QQQ')
+
+
+def build_inventory():
+    return {'group_one': {'hosts': ['group_one_host_0{}'.format(i) for i in range(1, 6)]
+                                   + ['group_one_and_two_host_0{}'.format(i) for i in range(1, 6)]
+                                   + ['group_one_two_and_three_host_0{}'.format(i) for i in range(1, 6)],
+                          'vars': {'is_in_group_one': True,
+                                   'complex_var': [{"dir": "/opt/gwaf/logs",
+                                                    "sourcetype": "gwaf",
+                                                    "something_else": [1, 2, 3]}]}},
+            'group_two': {'hosts': ['group_two_host_0{}'.format(i) for i in range(1, 6)]
+                                   + ['group_one_and_two_host_0{}'.format(i) for i in range(1, 6)]
+                                   + ['group_two_and_three_host_0{}'.format(i) for i in range(1, 6)]
+                                   + ['group_one_two_and_three_host_0{}'.format(i) for i in range(1, 6)],
+                          'vars': {'is_in_group_two': True}},
+            'group_three': {'hosts': ['group_three_host_0{}'.format(i) for i in range(1, 6)]
+                                   + ['group_two_and_three_host_0{}'.format(i) for i in range(1, 6)]
+                                   + ['group_one_two_and_three_host_0{}'.format(i) for i in range(1, 6)],
+                            'vars': {'is_in_group_three': True}},
+            'all': {'vars': {'ansible_connection': 'local',
+                             'inventories_var': True}},
+            'ungrouped': {'hosts': ['ungrouped_host_0{}'.format(i) for i in range(1, 6)]}}
+
+
+def build_hostvars():
+    return {'group_one_host_01': {'group_one_host_01_has_this_var': True},
             'group_two_host_01': {'group_two_host_01_has_this_var': True},
             'group_three_host_01': {'group_three_host_01_has_this_var': True}}
 
@@ -40,14 +60,138 @@ def parse_args():
     return parser.parse_args()
 
 
+def cache_path():
+    path = os.environ.get('METALESS_DYN_INVENTORY_CACHE')
+    if path is not None:
+        return path
+    directory = os.path.join(os.path.expanduser('~'), '.ansible', 'tmp')
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    return os.path.join(directory, 'metaless_dyn_inventory.cache')
+
+
+def source_digest():
+    source = os.path.abspath(__file__)
+    stat = os.stat(source)
+    key = '{}:{}:{}'.format(source, stat.st_mtime, stat.st_size).encode('utf-8')
+    return hashlib.sha256(CACHE_MAGIC + key).digest()
+
+
+def key_hash(name):
+    # Zero marks an empty slot, so real keys are forced non-zero.
+    return struct.unpack('<Q', hashlib.sha1(name.encode('utf-8')).digest()[:8])[0] or 1
+
+
+def write_cache(path, digest):
+    hostvars = build_hostvars()
+    rendered = dumps(build_inventory()).encode('utf-8')
+    entries = [(name.encode('utf-8') + b'\0' + dumps(hostvars[name]).encode('utf-8'), key_hash(name))
+               for name in sorted(hostvars)]
+    slot_count = max(8, len(entries) * 2)
+
+    offset = CACHE_HEADER.size + slot_count * CACHE_SLOT.size
+    list_offset = offset
+    offset += len(rendered)
+    slots = [(0, 0, 0)] * slot_count
+    for blob, hashed in entries:
+        slot = hashed % slot_count
+        while slots[slot][0]:
+            slot = (slot + 1) % slot_count
+        slots[slot] = (hashed, offset, len(blob))
+        offset += len(blob)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metaless_dyn_inventory')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC, digest, list_offset, len(rendered),
+                                      CACHE_HEADER.size, slot_count))
+            for slot in slots:
+                f.write(CACHE_SLOT.pack(*slot))
+            f.write(rendered)
+            for blob, _ in entries:
+                f.write(blob)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def open_cache(path, digest):
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+    with os.fdopen(fd, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_uid != os.getuid() or stat.st_size < CACHE_HEADER.size:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, cached_digest = CACHE_HEADER.unpack_from(data)[:2]
+    if magic != CACHE_MAGIC or cached_digest != digest:
+        data.close()
+        return None
+    return data
+
+
+def lookup(data, requested_host):
+    magic, digest, list_offset, list_length, table_offset, slot_count = CACHE_HEADER.unpack_from(data)
+    size = len(data)
+    if (not slot_count or table_offset != CACHE_HEADER.size
+            or table_offset + slot_count * CACHE_SLOT.size > size or list_offset + list_length > size):
+        raise ValueError('corrupt inventory cache header')
+    if requested_host is None:
+        return data[list_offset:list_offset + list_length]
+
+    name = requested_host.encode('utf-8') + b'\0'
+    hashed = key_hash(requested_host)
+    slot = hashed % slot_count
+    for _ in range(slot_count):
+        slot_hash, offset, length = CACHE_SLOT.unpack_from(data, table_offset + slot * CACHE_SLOT.size)
+        if not slot_hash:
+            break
+        if slot_hash == hashed and data[offset:offset + len(name)] == name:
+            if offset + length > size:
+                raise ValueError('corrupt inventory cache entry')
+            return data[offset + len(name):offset + length]
+        slot = (slot + 1) % slot_count
+    return b'{}'
+
+
+def cached_output(requested_host):
+    try:
+        path = cache_path()
+        if not path:
+            return None
+        digest = source_digest()
+        data = open_cache(path, digest) if os.path.exists(path) else None
+        if data is None:
+            write_cache(path, digest)
+            data = open_cache(path, digest)
+            if data is None:
+                return None
+        try:
+            return lookup(data, requested_host)
+        finally:
+            data.close()
+    except (EnvironmentError, ValueError, struct.error):
+        return None
+
+
+def render(requested_host):
+    if requested_host:
+        return dumps(build_hostvars().get(requested_host, {})).encode('utf-8')
+    return dumps(build_inventory()).encode('utf-8')
+
+
 def load_inventory():
     args = parse_args()
-    if args.requested_host:
-        print(dumps(hostvars.get(args.requested_host, {})))
-    elif args.list_instances:
-        print(dumps(inventory))
-    else:
+    if not (args.requested_host or args.list_instances):
         print({})
+        return
+    output = cached_output(args.requested_host or None)
+    if output is None:
+        output = render(args.requested_host)
+    out = getattr(sys.stdout, 'buffer', sys.stdout)
+    out.write(output + b'\n')
+    out.flush()
 
 
 if __name__ == '__main__':
@@ -1,6 +1,14 @@
 #!/usr/bin/env python
-from argparse import ArgumentParser
-from pprint import pprint
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', '..', 'utils'))
+try:
+    from inventory_backend import run  # noqa: E402
+except ImportError:
+    # copied without utils/, so there is no inventory server to ask
+    def run(source, render):
+        render(sys.argv[1:], os.environ, sys.stdout)
 
 inventory = {'group_seven': {'hosts': ['group_seven_host_0{}'.format(i) for i in range(1, 6)]
                                     + ['group_seven_and_eight_host_0{}'.format(i) for i in range(1, 6)]
@@ -22,19 +30,22 @@ inventory = {'group_seven': {'hosts': ['group_seven_host_0{}'.format(i) for i in
                                     'group_eight_host_01': {'group_eight_host_01_has_this_var': True},
                                     'group_nine_host_01': {'group_nine_host_01_has_this_var': True}}}}
 
-def parse_args():
+def parse_args(argv):
+    from argparse import ArgumentParser
     parser = ArgumentParser()
     parser.add_argument('--list', dest='list_instances', action='store_true', default=True,
                         help='List instances (default: True)')
     parser.add_argument('--host', dest='requested_host', help='Get all the variables about a specific instance')
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
-def load_inventory():
-    args = parse_args()
+def render(argv, environ, out):
+    args = parse_args(argv)
     if args.list_instances:
-        pprint(inventory)
+        import json
+        json.dump(inventory, out)
+        out.write('\n')
 
 
 if __name__ == '__main__':
-    load_inventory()
+    run(__file__, render)
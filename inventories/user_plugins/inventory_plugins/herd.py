@@ -0,0 +1,117 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+    inventory: herd
+    version_added: "2.8"
+    short_description: A whole herd of cows, generated once and then served from the inventory cache
+    description:
+        - Generates I(host_count) hosts spread over I(group_count) groups.
+        - With C(cache) enabled the generated inventory is stored in the inventory cache and
+          later runs inside I(cache_timeout) are populated from it without regenerating.
+        - The cache is only written after the inventory was fully populated, so a run that
+          fails part way through (see I(fail_after_hosts)) never leaves a half-built cache entry.
+    extends_documentation_fragment:
+        - inventory_cache
+    options:
+        plugin:
+            description: Token that ensures this is a source file for the 'herd' plugin.
+            required: True
+            choices: ['herd']
+        host_count:
+            description: Number of hosts to generate.
+            type: int
+            default: 1000
+        group_count:
+            description: Number of groups the hosts are spread over.
+            type: int
+            default: 10
+        hostvars_size:
+            description: Length of the C(moo) string var set on every host.
+            type: int
+            default: 7
+        fail_after_hosts:
+            description:
+                - Like the fox plugin, raise an error after this many hosts were added.
+                - C(0) never fails.
+            type: int
+            default: 0
+'''
+
+EXAMPLES = r'''
+    # herd.yaml
+    plugin: herd
+    host_count: 100000
+    cache: true
+    cache_plugin: jsonfile
+    cache_connection: /tmp/herd_inventory_cache
+    cache_timeout: 300
+'''
+
+import time
+
+from ansible.errors import AnsibleParserError
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable
+
+
+class InventoryModule(BaseInventoryPlugin, Cacheable):
+
+    NAME = 'herd'
+
+    def verify_file(self, path):
+        return super(InventoryModule, self).verify_file(path) and path.endswith(('herd.yaml', 'herd.yml'))
+
+    def generate(self):
+        ''' returns the inventory as plain data, the form it is stored in the cache '''
+        group_count = self.get_option('group_count')
+        moo = 'm' + 'o' * (self.get_option('hostvars_size') - 1)
+        groups = dict(('herd_{}'.format(i), []) for i in range(group_count))
+        hostvars = {}
+        for i in range(self.get_option('host_count')):
+            host = 'cow_{}'.format(i)
+            groups['herd_{}'.format(i % group_count)].append(host)
+            hostvars[host] = {'moo': moo, 'cow_number': i}
+        return {'groups': groups, 'hostvars': hostvars}
+
+    def populate(self, results):
+        fail_after_hosts = self.get_option('fail_after_hosts')
+        added = 0
+        for group, hosts in results['groups'].items():
+            self.inventory.add_group(group)
+            for host in hosts:
+                self.inventory.add_host(host, group=group)
+                for k, v in results['hostvars'][host].items():
+                    self.inventory.set_variable(host, k, v)
+                added += 1
+                if added == fail_after_hosts:
+                    raise AnsibleParserError('Gering-ding-ding-ding-dingeringeding after {} cows'.format(added))
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path)
+        self._read_config_data(path)
+        if self.get_option('group_count') < 1 or self.get_option('host_count') < 0:
+            raise AnsibleParserError('herd needs group_count >= 1 and host_count >= 0')
+
+        cache_key = self.get_cache_key(path)
+        user_cache_setting = self.get_option('cache')
+        attempt_to_read_cache = user_cache_setting and cache
+        cache_needs_update = user_cache_setting and not cache
+
+        results = None
+        start = time.time()
+        if attempt_to_read_cache:
+            try:
+                results = self._cache[cache_key]
+            except KeyError:
+                cache_needs_update = True
+        source = 'cache'
+        if results is None:
+            results = self.generate()
+            source = 'generated'
+
+        self.populate(results)
+        self.display.vvv('herd: {} {} hosts in {:.3f}s'.format(source, len(results['hostvars']), time.time() - start))
+
+        # only reached once every host made it into the inventory
+        if cache_needs_update:
+            self._cache[cache_key] = results
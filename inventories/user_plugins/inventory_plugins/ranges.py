@@ -0,0 +1,196 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+    inventory: ranges
+    version_added: "2.8"
+    short_description: Groups described by host range patterns, like inventory.ini
+    description:
+        - Each group lists host patterns such as C(group_one_host_[01:05]), using the same
+          C([start:end]) and C([start:end:step]) numeric and alphabetic ranges as INI inventories.
+        - Patterns are kept as compact range descriptors and only expanded while they are
+          added to the inventory. Host names are interned, so a host listed in several groups
+          is one string and one host object.
+        - Every host is added once. Each group's members are collected first and attached in one
+          step per group, so group ancestry is walked and host caches are cleared once per group
+          instead of once per host and group pair. That step repeats what C(Group.add_host) does,
+          so it is only taken on the ansible releases it was checked against; on others each host
+          is added to its groups with C(add_host).
+    options:
+        plugin:
+            description: Token that ensures this is a source file for the 'ranges' plugin.
+            required: True
+            choices: ['ranges']
+        groups:
+            description:
+                - Mapping of group name to C(hosts), a list of host patterns, C(vars) and C(children).
+            type: dict
+            default: {}
+'''
+
+EXAMPLES = r'''
+    # ranges.yaml
+    plugin: ranges
+    groups:
+      group_one:
+        hosts:
+          - group_one_host_[01:05]
+          - group_one_and_two_host_[01:05]
+        vars:
+          is_in_group_one: true
+      big:
+        hosts:
+          - big_host_[000000:299999]
+'''
+
+import re
+import string
+import sys
+
+from ansible import __version__ as ansible_version
+from ansible.errors import AnsibleParserError
+from ansible.module_utils.six import string_types
+from ansible.module_utils.six.moves import range as xrange
+from ansible.plugins.inventory import BaseInventoryPlugin
+
+try:
+    intern = sys.intern
+except AttributeError:
+    pass
+
+RANGE_RE = re.compile(r'\[([^\[\]:]+):([^\[\]:]+)(?::([0-9]+))?\]')
+# Group.add_host and Host.add_group are the same from 2.9 through 2.18, which attach_members relies on
+BULK_ADD = (2, 9) <= tuple(int(part) for part in re.findall(r'[0-9]+', ansible_version)[:2]) <= (2, 18)
+
+
+class RangeSegment(object):
+    ''' one [start:end:step] range, stored as its bounds rather than its values '''
+
+    __slots__ = ('start', 'end', 'step', 'width', 'alpha')
+
+    def __init__(self, start, end, step):
+        self.step = int(step or 1)
+        self.alpha = start.isalpha() and end.isalpha()
+        if self.alpha:
+            if len(start) != 1 or len(end) != 1:
+                raise ValueError('alphabetic ranges take single letters, not [{}:{}]'.format(start, end))
+            self.start, self.end, self.width = string.ascii_letters.index(start), string.ascii_letters.index(end), 1
+        elif start.isdigit() and end.isdigit():
+            self.start, self.end = int(start), int(end)
+            self.width = len(start) if start.startswith('0') else 0
+        else:
+            raise ValueError('cannot mix letters and numbers in [{}:{}]'.format(start, end))
+        if self.start > self.end or self.step < 1:
+            raise ValueError('empty range [{}:{}]'.format(start, end))
+
+    def __len__(self):
+        return (self.end - self.start) // self.step + 1
+
+    def __iter__(self):
+        for value in xrange(self.start, self.end + 1, self.step):
+            yield string.ascii_letters[value] if self.alpha else str(value).zfill(self.width)
+
+
+class HostPattern(object):
+    ''' a host pattern kept as literal text pieces and range segments, expanded on iteration '''
+
+    __slots__ = ('pattern', 'pieces', 'segments')
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.pieces = RANGE_RE.split(pattern)[::4]
+        self.segments = [RangeSegment(*match) for match in RANGE_RE.findall(pattern)]
+
+    def __len__(self):
+        count = 1
+        for segment in self.segments:
+            count *= len(segment)
+        return count
+
+    def __iter__(self):
+        return self._expand(0, self.pieces[0])
+
+    def _expand(self, index, prefix):
+        if index == len(self.segments):
+            yield prefix
+            return
+        suffix = self.pieces[index + 1]
+        for value in self.segments[index]:
+            for name in self._expand(index + 1, prefix + value + suffix):
+                yield name
+
+
+def attach_members(inventory, group, members):
+    '''
+    adds the hosts to the group like inventory.add_host(host.name, group) does for each of them, with
+    the ancestry walk and cache clearing done once. This is the only place that touches the
+    inventory's private fields, and only where BULK_ADD says they are what it expects.
+    '''
+    group = inventory.groups[group]
+    names = group.host_names
+    groups = list(group.get_ancestors()) + [group]
+    for host in members:
+        if host.name in names:
+            continue
+        group.hosts.append(host)
+        names.add(host.name)
+        host.groups.extend(g for g in groups if g not in host.groups)
+    group.clear_hosts_cache()
+    inventory._groups_dict_cache = {}
+
+
+class InventoryModule(BaseInventoryPlugin):
+
+    NAME = 'ranges'
+
+    def verify_file(self, path):
+        return super(InventoryModule, self).verify_file(path) and path.endswith(('ranges.yaml', 'ranges.yml'))
+
+    def compile_groups(self, groups):
+        compiled = {}
+        for group, spec in groups.items():
+            spec = spec or {}
+            if not isinstance(spec, dict):
+                raise AnsibleParserError('ranges group {} must be a mapping, got {!r}'.format(group, spec))
+            patterns = spec.get('hosts') or []
+            if isinstance(patterns, string_types):
+                patterns = [patterns]
+            try:
+                compiled[group] = [HostPattern(pattern) for pattern in patterns]
+            except ValueError as e:
+                raise AnsibleParserError('ranges group {}: {}'.format(group, e))
+        return compiled
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path)
+        self._read_config_data(path)
+        groups = self.get_option('groups')
+        compiled = self.compile_groups(groups)
+
+        for group in compiled:
+            self.inventory.add_group(group)
+        for group, spec in groups.items():
+            for child in (spec or {}).get('children') or []:
+                self.inventory.add_group(child)
+                self.inventory.add_child(group, child)
+            for k, v in ((spec or {}).get('vars') or {}).items():
+                self.inventory.set_variable(group, k, v)
+
+        hosts = {}
+        for group, patterns in compiled.items():
+            members = []
+            for pattern in patterns:
+                for name in pattern:
+                    host = hosts.get(name)
+                    if host is None:
+                        name = intern(name)
+                        self.inventory.add_host(name)
+                        host = hosts[name] = self.inventory.get_host(name)
+                    members.append(host)
+            if BULK_ADD:
+                attach_members(self.inventory, group, members)
+            else:
+                for host in members:
+                    self.inventory.add_host(host.name, group=group)
+        self.display.vvv('ranges: {} hosts from {} group entries'.format(
+            len(hosts), sum(len(pattern) for patterns in compiled.values() for pattern in patterns)))
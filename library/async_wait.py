@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import select
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+DOCUMENTATION = '''
+---
+module: async_wait
+short_description: Wait for many async jobs from one module run.
+description:
+    - Waits until every job in C(jids) has finished or C(timeout) runs out, then returns all of
+      their results at once. This replaces one M(async_status) poll per job per retry.
+    - Job files are watched with inotify where available, otherwise polled with a backoff that
+      grows while nothing finishes and resets when a job does.
+    - Use it through the C(async_wait) action plugin, which finds the async directory and
+      accepts registered loop results as well as plain job ids.
+version_added: "2.7"
+options:
+    jids:
+        description:
+            - Async job ids to wait for.
+        required: true
+    timeout:
+        description:
+            - Seconds to wait for all jobs before giving up.
+        default: 300
+    async_dir:
+        description:
+            - Directory async job results are written to.
+        default: ~/.ansible_async
+requirements: []
+'''
+
+EXAMPLES = '''
+- shell: sleep {{ item }}
+  async: 60
+  poll: 0
+  loop: [1, 2, 3]
+  register: sleepers
+
+- async_wait:
+    jids: "{{ sleepers }}"
+    timeout: 30
+'''
+
+RETURN = '''
+results:
+    description: The async_status style result of each job, in the order of C(jids).
+    returned: always
+    type: list
+pending:
+    description: Jobs that had not finished when the timeout ran out.
+    returned: always
+    type: list
+watcher:
+    description: C(inotify) or C(poll).
+    returned: always
+    type: str
+'''
+
+MIN_DELAY = 0.05
+MAX_DELAY = 2.0
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+
+def inotify_watch(path):
+    ''' returns an inotify fd watching path for finished writes, or None if unavailable '''
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, ctypes.c_char_p(path.encode('utf-8')), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def wait_for_change(fd, delay):
+    if fd is None:
+        time.sleep(delay)
+        return
+    if select.select([fd], [], [], delay)[0]:
+        try:
+            while os.read(fd, 65536):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+
+class JobWatcher(object):
+
+    def __init__(self, async_dir):
+        self.async_dir = async_dir
+        self.stamps = {}
+
+    def check(self, jid):
+        ''' returns the finished job's result, or None while it is still running '''
+        path = os.path.join(self.async_dir, jid)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return dict(ansible_job_id=jid, finished=1, failed=True, msg='could not find job')
+        stamp = (st.st_mtime, st.st_size)
+        if self.stamps.get(jid) == stamp:
+            return None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except ValueError:
+            # not fully written yet, look again on the next change
+            return None
+        self.stamps[jid] = stamp
+        if 'started' in data and not data.get('finished'):
+            return None
+        data['ansible_job_id'] = jid
+        data['finished'] = 1
+        return data
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            jids=dict(type='list', required=True),
+            timeout=dict(type='int', default=300),
+            async_dir=dict(type='path', default='~/.ansible_async')),
+        supports_check_mode=True)
+
+    jids = [str(jid) for jid in module.params['jids']]
+    async_dir = module.params['async_dir']
+    if not os.path.isdir(async_dir):
+        module.fail_json(msg='async directory {0} does not exist'.format(async_dir))
+
+    fd = inotify_watch(async_dir)
+    watcher = JobWatcher(async_dir)
+    start = time.time()
+    deadline = start + module.params['timeout']
+    finished = {}
+    pending = list(jids)
+    delay = MIN_DELAY
+    try:
+        while True:
+            still_pending = []
+            for jid in pending:
+                result = watcher.check(jid)
+                if result is None:
+                    still_pending.append(jid)
+                else:
+                    finished[jid] = result
+            progressed = len(still_pending) < len(pending)
+            pending = still_pending
+            remaining = deadline - time.time()
+            if not pending or remaining <= 0:
+                break
+            delay = MIN_DELAY if progressed else min(delay * 2, MAX_DELAY)
+            wait_for_change(fd, min(delay, remaining))
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+    results = [finished.get(jid, dict(ansible_job_id=jid, started=1, finished=0)) for jid in jids]
+    summary = dict(changed=any(result.get('changed') for result in results), results=results, pending=pending,
+                   elapsed=round(time.time() - start, 3), watcher='poll' if fd is None else 'inotify')
+    if pending:
+        module.fail_json(msg='timed out waiting for {0} of {1} jobs'.format(len(pending), len(jids)), **summary)
+    failed = [result['ansible_job_id'] for result in results if result.get('failed')]
+    if failed:
+        module.fail_json(msg='{0} of {1} jobs failed: {2}'.format(len(failed), len(jids), ', '.join(failed)),
+                         **summary)
+    module.exit_json(**summary)
+
+
+if __name__ == '__main__':
+    main()
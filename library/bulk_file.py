@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import errno
+import os
+import shutil
+import stat
+from multiprocessing.pool import ThreadPool
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible.module_utils.six import integer_types
+
+DOCUMENTATION = '''
+---
+module: bulk_file
+short_description: Apply one file state to many paths in a single module run.
+description:
+    - Creates, touches or removes every path in C(paths) from one module invocation, using a
+      thread pool, instead of one M(file) round trip per path.
+    - Reports changed/failed for each path. Running it again with the same arguments changes nothing.
+    - Only numeric modes are supported, owner and group are left alone.
+version_added: "2.7"
+options:
+    paths:
+        description:
+            - Paths to manage.
+        required: true
+    state:
+        description:
+            - C(directory) creates missing directories and their parents, giving the ones it creates C(mode).
+            - C(touch) creates missing empty files, existing files keep their timestamps.
+            - C(absent) removes files and whole directory trees.
+        choices: [directory, touch, absent]
+        default: directory
+    mode:
+        description:
+            - Octal mode for every created or existing path, e.g. C(0700) or C('0o700').
+    threads:
+        description:
+            - Number of paths worked on at once.
+        default: 8
+requirements: []
+'''
+
+EXAMPLES = '''
+- bulk_file:
+    paths:
+      - /opt/test/one
+      - /opt/test/two
+    state: directory
+    mode: 0o0700
+'''
+
+RETURN = '''
+results:
+    description: One entry per path, in the order given.
+    returned: always
+    type: list
+    sample: [{"path": "/opt/test/one", "changed": true, "failed": false}]
+changed_count:
+    description: Number of paths that were changed.
+    returned: always
+    type: int
+failed_count:
+    description: Number of paths that could not be changed.
+    returned: always
+    type: int
+'''
+
+
+def parse_mode(mode):
+    if mode is None or isinstance(mode, integer_types):
+        return mode
+    mode = str(mode)
+    if mode.startswith('0o'):
+        mode = mode[2:]
+    return int(mode, 8)
+
+
+def makedirs(path, mode):
+    ''' creates path and its missing parents, giving each one it creates mode as the file module does '''
+    parent = os.path.dirname(path)
+    if parent and parent != path and not os.path.isdir(parent):
+        makedirs(parent, mode)
+    try:
+        os.mkdir(path)
+    except OSError as e:
+        # another worker may have made the same directory or one of its parents
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+        return
+    if mode is not None:
+        os.chmod(path, mode)
+
+
+def ensure_mode(path, mode, check_mode):
+    if mode is None or stat.S_IMODE(os.lstat(path).st_mode) == mode:
+        return False
+    if not check_mode:
+        os.chmod(path, mode)
+    return True
+
+
+def apply_state(path, state, mode, check_mode):
+    ''' returns whether path was changed, raises on failure '''
+    exists = os.path.lexists(path)
+    if state == 'absent':
+        if exists and not check_mode:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+        return exists
+
+    if state == 'directory':
+        if exists and not os.path.isdir(path):
+            raise OSError(errno.EEXIST, 'path exists and is not a directory')
+        if not exists and not check_mode:
+            makedirs(path, mode)
+    elif state == 'touch':
+        if exists and os.path.isdir(path):
+            raise OSError(errno.EISDIR, 'path is a directory')
+        if not exists and not check_mode:
+            open(path, 'ab').close()
+    if not exists and check_mode:
+        return True
+    # makedirs() and open() are subject to the umask, so the mode is always checked
+    return ensure_mode(path, mode, check_mode) or not exists
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            paths=dict(type='list', required=True),
+            state=dict(default='directory', choices=['directory', 'touch', 'absent']),
+            mode=dict(type='raw'),
+            threads=dict(type='int', default=8)),
+        supports_check_mode=True)
+
+    try:
+        mode = parse_mode(module.params['mode'])
+    except ValueError:
+        module.fail_json(msg='mode must be an octal number, got {0}'.format(module.params['mode']))
+    state = module.params['state']
+    paths = [os.path.expanduser(path) for path in module.params['paths']]
+
+    def run(path):
+        try:
+            return dict(path=path, changed=apply_state(path, state, mode, module.check_mode), failed=False)
+        except (IOError, OSError) as e:
+            return dict(path=path, changed=False, failed=True, msg=to_native(e))
+
+    pool = ThreadPool(max(1, min(module.params['threads'], len(paths))))
+    try:
+        results = pool.map(run, paths)
+    finally:
+        pool.close()
+        pool.join()
+
+    changed_count = sum(1 for result in results if result['changed'])
+    failed_count = sum(1 for result in results if result['failed'])
+    summary = dict(changed=changed_count > 0, results=results,
+                   changed_count=changed_count, failed_count=failed_count)
+    if failed_count:
+        module.fail_json(msg='{0} of {1} paths failed'.format(failed_count, len(paths)), **summary)
+    module.exit_json(**summary)
+
+
+if __name__ == '__main__':
+    main()
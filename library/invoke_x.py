@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+DOCUMENTATION = '''
+---
+module: invoke_x
+short_description: Run a module given by name and arguments through a task template, in memory.
+description:
+    - Renders C(template) with C(module_name), C(module_args) and C(check_mode), loads the rendered
+      tasks and runs them in place, without writing a playbook to disk and including it.
+    - The compiled template is kept, and so is the rendered task structure per module name and
+      shape of C(module_args), with the argument values filled in on later calls. The caches last
+      as long as the worker running the task, so a C(loop) renders the template once.
+      C(INVOKE_X_CACHE_SIZE) sets how many task structures are kept, 256 by default.
+    - Templates that do more with the values than place them, such as filtering or using them as
+      keys, are rendered for every call instead.
+    - The template sees only C(module_name), C(module_args) and C(check_mode), and the argument
+      values are not templated a second time. Its tasks may set C(name), C(check_mode) and the
+      module with its arguments. Any other task keyword, such as C(become), C(no_log) or C(when),
+      fails the task rather than being ignored.
+    - This module has a corresponding action plugin and runs on the controller.
+version_added: "2.7"
+options:
+    module_name:
+        description:
+            - Module to run.
+        required: true
+    module_args:
+        description:
+            - Arguments of the module.
+        default: {}
+    check_mode:
+        description:
+            - Run the module in check mode.
+        type: bool
+        default: false
+    template:
+        description:
+            - Template rendering the tasks, looked up like the C(template) module's C(src).
+        default: invoke_x_template.j2
+requirements: []
+'''
+
+EXAMPLES = '''
+- invoke_x:
+    module_name: tower_organization
+    module_args:
+      name: gigitty
+'''
+
+RETURN = '''
+results:
+    description: The result of each task, when the template renders more than one.
+    returned: when the template renders more than one task
+    type: list
+'''
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import mmap
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native, to_text
+
+DOCUMENTATION = '''
+---
+module: read_file
+short_description: Read a file in fixed-size chunks, returning a bounded byte range of it.
+description:
+    - Reads C(path) through a memory map, or plain reads where it cannot be mapped, one
+      C(chunk_size) chunk at a time. Counts its lines and checksums it as the chunks go by, and
+      keeps only the requested byte range, so the module's memory does not grow with the file.
+    - Returns the range in C(stdout) and C(stdout_lines) like M(command) with C(cat) does, trailing
+      newline stripped, so it can replace it in playbooks that register the output.
+    - Set C(return_lines=false) to return C(stdout_lines) empty instead of holding the content a
+      second time in every result copy. Leaving it out would not do, as the controller then splits
+      C(stdout) into C(stdout_lines) itself.
+version_added: "2.7"
+options:
+    path:
+        description:
+            - File to read.
+        required: true
+        aliases: [src]
+    offset:
+        description:
+            - First byte of the returned range. Negative values count from the end of the file,
+              C(-65536) returns the last 64 KiB.
+        default: 0
+    length:
+        description:
+            - Most bytes returned from C(offset), 0 returns everything from there on.
+        default: 0
+    chunk_size:
+        description:
+            - Bytes read at a time.
+        default: 1048576
+    return_content:
+        description:
+            - Return the range in C(stdout). Without it only sizes, line counts and the checksum come back.
+        type: bool
+        default: true
+    return_lines:
+        description:
+            - Also return the range split into C(stdout_lines).
+        type: bool
+        default: true
+    get_checksum:
+        description:
+            - Checksum the whole file.
+        type: bool
+        default: true
+    checksum_algorithm:
+        description:
+            - Algorithm of the checksum.
+        choices: [md5, sha1, sha224, sha256, sha384, sha512]
+        default: sha1
+        aliases: [checksum, checksum_algo]
+requirements: []
+'''
+
+EXAMPLES = '''
+- read_file:
+    path: /var/log/messages
+    offset: -1048576
+    return_lines: false
+  register: messages
+'''
+
+RETURN = '''
+stdout:
+    description: The requested range, decoded as UTF-8, trailing newline stripped.
+    returned: when return_content is true
+    type: str
+stdout_lines:
+    description: C(stdout) split into lines, empty when return_lines is false.
+    returned: when return_content is true
+    type: list
+size:
+    description: Bytes in the file.
+    returned: always
+    type: int
+lines:
+    description: Lines in the file, a last line without a newline counted too.
+    returned: always
+    type: int
+offset:
+    description: File offset of the first byte returned.
+    returned: always
+    type: int
+length:
+    description: Bytes in the returned range.
+    returned: always
+    type: int
+truncated:
+    description: Whether the range left out part of the file.
+    returned: always
+    type: bool
+checksum:
+    description: Checksum of the whole file.
+    returned: when get_checksum is true
+    type: str
+'''
+
+
+def chunks(f, chunk_size):
+    ''' yields the file in chunk_size pieces, from a memory map when the file can be mapped '''
+    try:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, EnvironmentError):
+        # empty files, pipes and most of /proc cannot be mapped
+        data = None
+    if data is None:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    try:
+        if hasattr(data, 'madvise'):
+            data.madvise(mmap.MADV_SEQUENTIAL)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+    finally:
+        data.close()
+
+
+def read_range(path, offset, length, chunk_size, digest=None, keep=True):
+    '''
+    Streams path once, returns (size, lines, first byte offset, range bytes). A negative offset
+    keeps only a rolling tail of that many bytes, so the size need not be known up front.
+    '''
+    size = newlines = 0
+    last = b''
+    kept = bytearray()
+    with open(path, 'rb') as f:
+        for chunk in chunks(f, chunk_size):
+            if digest is not None:
+                digest.update(chunk)
+            newlines += chunk.count(b'\n')
+            last = chunk[-1:]
+            if keep and offset < 0:
+                kept += chunk
+                del kept[:max(0, len(kept) + offset)]
+            elif keep:
+                end = offset + length if length else None
+                start = max(0, offset - size)
+                if (end is None or size < end) and start < len(chunk):
+                    kept += chunk[start:None if end is None else end - size]
+            size += len(chunk)
+    first = size - len(kept) if offset < 0 else min(offset, size)
+    if offset < 0 and length:
+        del kept[length:]
+    lines = newlines + (1 if last and last != b'\n' else 0)
+    return size, lines, first, bytes(kept)
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            path=dict(type='path', required=True, aliases=['src']),
+            offset=dict(type='int', default=0),
+            length=dict(type='int', default=0),
+            chunk_size=dict(type='int', default=1024 * 1024),
+            return_content=dict(type='bool', default=True),
+            return_lines=dict(type='bool', default=True),
+            get_checksum=dict(type='bool', default=True),
+            checksum_algorithm=dict(default='sha1', aliases=['checksum', 'checksum_algo'],
+                                    choices=['md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512'])),
+        supports_check_mode=True)
+
+    params = module.params
+    if params['length'] < 0 or params['chunk_size'] < 1:
+        module.fail_json(msg='length must be at least 0 and chunk_size at least 1')
+    digest = hashlib.new(params['checksum_algorithm']) if params['get_checksum'] else None
+
+    try:
+        size, lines, first, data = read_range(params['path'], params['offset'], params['length'],
+                                              params['chunk_size'], digest, keep=params['return_content'])
+    except (IOError, OSError) as e:
+        module.fail_json(msg='Unable to read {0}: {1}'.format(params['path'], to_native(e)), rc=1)
+
+    result = dict(changed=False, rc=0, path=params['path'], size=size, lines=lines, offset=first,
+                  length=len(data), truncated=first > 0 or first + len(data) < size)
+    if digest is not None:
+        result['checksum'] = digest.hexdigest()
+    if params['return_content']:
+        result['stdout'] = to_text(data, errors='surrogate_then_replace').rstrip(u'\r\n')
+        result['stdout_lines'] = result['stdout'].splitlines() if params['return_lines'] else []
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import json
 import os
+import random
+import sys
 
 from ansible.module_utils.basic import * # noqa
 
@@ -11,13 +14,46 @@ module: scan_facts
 short_description: Return sample facts into facts namespace.
 description:
     - Return sample facts into facts namespace.
+    - Optionally adds generated facts of a chosen size, to load test fact caching and job events.
 version_added: "2.3"
 options:
+    num_keys:
+        description:
+            - Number of generated top level facts, named scan_fact_0, scan_fact_1, ...
+        default: 0
+    depth:
+        description:
+            - How many levels of nested dicts and lists each generated fact has.
+        default: 0
+    list_width:
+        description:
+            - Number of entries in every generated nested dict or list.
+        default: 10
+    string_size:
+        description:
+            - Length of generated string values.
+        default: 16
+    unicode_ratio:
+        description:
+            - Fraction of generated strings that use non-ASCII characters.
+        default: 0.0
+    seed:
+        description:
+            - Seed for the generated facts, the same seed gives the same output.
 requirements: []
 author: Chris Meyers, Christopher Wang
 '''
 
 EXAMPLES = '''
+# Roughly 10 MB of facts, the same on every run:
+- test_scan_facts:
+    num_keys: 100
+    depth: 2
+    list_width: 10
+    string_size: 1000
+    unicode_ratio: 0.1
+    seed: 1
+
 # Example fact output:
 {
     "ansible_facts": {
@@ -44,9 +80,89 @@ EXAMPLES = '''
 }
 '''
 
+# Generated facts pick their strings from small pools, so a large payload is mostly
+# references to the same few strings instead of millions of distinct ones.
+STRING_POOL_SIZE = 64
+ASCII_CHARS = u'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+UNICODE_CHARS = u'鵟犭酜귃ꔀꈛ竳䙭韽ࠔεﾌ・䉪ቒ칸ⱷꯔ噂폄蔆㪗輥'
+
+
+def string_pool(rng, chars, size):
+    return [u''.join(rng.choice(chars) for i in range(size)) for j in range(STRING_POOL_SIZE)]
+
+
+def generate_value(rng, pools, depth, params):
+    if depth > 0:
+        if rng.random() < 0.5:
+            return [generate_value(rng, pools, depth - 1, params) for i in range(params['list_width'])]
+        return dict(('key_{}'.format(i), generate_value(rng, pools, depth - 1, params))
+                    for i in range(params['list_width']))
+    kind = rng.random()
+    if kind < 0.7:
+        pool = pools[1] if rng.random() < params['unicode_ratio'] else pools[0]
+        return rng.choice(pool)
+    if kind < 0.8:
+        return rng.randint(-2 ** 31, 2 ** 31)
+    if kind < 0.9:
+        return rng.random()
+    return rng.choice((True, False, None))
+
+
+def generate_facts(params):
+    rng = random.Random(params['seed'])
+    pools = (string_pool(rng, ASCII_CHARS, params['string_size']),
+             string_pool(rng, UNICODE_CHARS, params['string_size']))
+    return dict(('scan_fact_{}'.format(i), generate_value(rng, pools, params['depth'], params))
+                for i in range(params['num_keys']))
+
+
+def pending_messages(module):
+    # ansible 2.10 and later keep warnings and deprecations in module_utils.common.warnings
+    try:
+        from ansible.module_utils.common.warnings import get_deprecation_messages, get_warning_messages
+    except ImportError:
+        return getattr(module, '_warnings', None) or getattr(module, '_deprecations', None)
+    return get_warning_messages() or get_deprecation_messages()
+
+
+def exit_streaming(module, results):
+    # exit_json() copies the result in remove_values() and again into one big string in
+    # jsonify(); for generated payloads write it to stdout one top level fact at a time.
+    # That filtering only changes the result when there are values to hide, warnings or
+    # deprecations, so then exit_json() is used as it is.
+    if module.no_log_values or pending_messages(module):
+        module.exit_json(**results)
+    module.do_cleanup_files()
+    module.add_path_info(results)
+    results['invocation'] = dict(module_args=module.params)
+    facts = results.pop('ansible_facts')
+    write = sys.stdout.write
+    write('\n{"ansible_facts": {')
+    for i, key in enumerate(facts):
+        write('%s%s: %s' % (', ' if i else '', json.dumps(key), json.dumps(facts[key])))
+    write('}')
+    for key, value in results.items():
+        write(', %s: %s' % (json.dumps(key), json.dumps(value)))
+    write('}')
+    sys.stdout.flush()
+    sys.exit(0)
+
+
 def main():
     module = AnsibleModule(
-        argument_spec = dict())
+        argument_spec = dict(
+            num_keys=dict(type='int', default=0),
+            depth=dict(type='int', default=0),
+            list_width=dict(type='int', default=10),
+            string_size=dict(type='int', default=16),
+            unicode_ratio=dict(type='float', default=0.0),
+            seed=dict(type='int')))
+
+    params = module.params
+    if min(params['num_keys'], params['depth'], params['list_width'], params['string_size']) < 0:
+        module.fail_json(msg='num_keys, depth, list_width and string_size must not be negative')
+    if not 0.0 <= params['unicode_ratio'] <= 1.0:
+        module.fail_json(msg='unicode_ratio must be between 0.0 and 1.0')
 
     string="abc"
     unicode_string="鵟犭酜귃ꔀꈛ竳䙭韽ࠔ"
@@ -67,6 +183,10 @@ def main():
 
     results = dict(ansible_facts=dict(string=string, unicode_string=unicode_string, int=int, float=float, bool=bool,
                                       null=null, list=list, obj=obj, empty_list=empty_list, empty_obj=empty_obj))
+    if params['num_keys']:
+        results['ansible_facts'].update(generate_facts(params))
+        results['changed'] = False
+        exit_streaming(module, results)
     module.exit_json(**results)
 
 main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    strategy: straggler
+    short_description: free strategy that learns per-host task times and hands forks to the slowest work first
+    description:
+        - Runs like the free strategy, but tasks are not sent to workers in inventory order. They wait
+          in a queue and whenever a fork frees up it goes to the host with the most estimated remaining
+          work, that is its remaining task count times its average task duration so far.
+        - Hosts whose average task takes more than STRAGGLER_SLOW_FACTOR times the median host's are
+          stragglers. Together they may hold at most STRAGGLER_MAX_SLOW_SHARE of the forks while
+          other hosts have work waiting, so one slow host cannot keep workers away from the rest.
+        - Prints fork utilization and the slowest hosts when the play ends.
+'''
+
+import heapq
+import itertools
+import os
+import time
+
+from ansible.plugins.strategy.free import StrategyModule as FreeStrategyModule
+from ansible.utils.display import Display
+
+display = Display()
+
+
+class StrategyModule(FreeStrategyModule):
+
+    def __init__(self, tqm):
+        super(StrategyModule, self).__init__(tqm)
+        self._slow_factor = float(os.environ.get('STRAGGLER_SLOW_FACTOR', 2.0))
+        self._max_slow_share = float(os.environ.get('STRAGGLER_MAX_SLOW_SHARE', 0.5))
+        self._deferred = []
+        self._sequence = itertools.count()
+        self._running = {}
+        self._host_times = {}
+        self._busy_time = 0.0
+        self._finished_tasks = 0
+        self._play_tasks = None
+
+    def _count_tasks(self, blocks):
+        count = 0
+        for block in blocks:
+            for attr in ('block', 'rescue', 'always'):
+                for item in getattr(block, attr, None) or []:
+                    count += self._count_tasks([item]) if hasattr(item, 'block') else 1
+        return count
+
+    def _average(self, host_name):
+        total, count = self._host_times.get(host_name, (0.0, 0))
+        if count:
+            return total / count
+        # hosts without a finished task yet are assumed to be average
+        return self._busy_time / self._finished_tasks if self._finished_tasks else 1.0
+
+    def _slow_threshold(self):
+        averages = sorted(total / count for total, count in self._host_times.values())
+        if len(averages) < 2:
+            return None
+        return self._slow_factor * averages[len(averages) // 2]
+
+    def _is_slow(self, host_name, threshold):
+        return threshold is not None and host_name in self._host_times and self._average(host_name) > threshold
+
+    def _remaining_work(self, host_name):
+        done = self._host_times.get(host_name, (0.0, 0))[1]
+        return max(1, (self._play_tasks or 1) - done) * self._average(host_name)
+
+    def _idle_workers(self):
+        return sum(1 for worker in self._workers if worker is None or not worker.is_alive())
+
+    def _queue_task(self, host, task, task_vars, play_context):
+        # Counted as pending right away so every wait loop keeps calling _process_pending_results,
+        # which is where deferred tasks are handed to workers.
+        heapq.heappush(self._deferred, (-self._remaining_work(host.get_name()), next(self._sequence),
+                                        (host, task, task_vars, play_context)))
+        self._pending_results += 1
+        self._dispatch()
+
+    def _dispatch(self):
+        idle = self._idle_workers()
+        if not idle or not self._deferred:
+            return
+        threshold = self._slow_threshold()
+        slow_cap = max(1, int(len(self._workers) * self._max_slow_share))
+        slow_running = sum(1 for host_name, _ in self._running if self._is_slow(host_name, threshold))
+        skipped = []
+        while idle and self._deferred:
+            entry = heapq.heappop(self._deferred)
+            host, task, task_vars, play_context = entry[2]
+            if self._is_slow(host.get_name(), threshold):
+                if slow_running >= slow_cap:
+                    skipped.append(entry)
+                    continue
+                slow_running += 1
+            self._start(host, task, task_vars, play_context)
+            idle -= 1
+        # stragglers over their share only wait while someone else could use the fork
+        for entry in skipped:
+            if idle:
+                self._start(*entry[2])
+                idle -= 1
+            else:
+                heapq.heappush(self._deferred, entry)
+
+    def _start(self, host, task, task_vars, play_context):
+        self._pending_results -= 1
+        self._running[(host.get_name(), task._uuid)] = time.time()
+        super(StrategyModule, self)._queue_task(host, task, task_vars, play_context)
+
+    def _process_pending_results(self, iterator, *args, **kwargs):
+        if self._play_tasks is None:
+            self._play_tasks = self._count_tasks(iterator._blocks)
+        results = super(StrategyModule, self)._process_pending_results(iterator, *args, **kwargs)
+        now = time.time()
+        for result in results:
+            host_name = result._host.get_name()
+            started = self._running.pop((host_name, result._task._uuid), None)
+            if started is not None:
+                total, count = self._host_times.get(host_name, (0.0, 0))
+                self._host_times[host_name] = (total + now - started, count + 1)
+                self._busy_time += now - started
+                self._finished_tasks += 1
+        self._dispatch()
+        return results
+
+    def run(self, iterator, play_context):
+        start = time.time()
+        try:
+            return super(StrategyModule, self).run(iterator, play_context)
+        finally:
+            self._report(time.time() - start)
+
+    def _report(self, elapsed):
+        forks = len(self._workers)
+        if not elapsed or not forks:
+            return
+        display.display('STRAGGLER: {0:.1f}s wall clock, {1:.1f} fork-seconds busy of {2:.1f}, '
+                        'fork utilization {3:.0%}'.format(elapsed, self._busy_time, forks * elapsed,
+                                                          self._busy_time / (forks * elapsed)))
+        threshold = self._slow_threshold()
+        slowest = sorted(self._host_times.items(), key=lambda item: -item[1][0])[:5]
+        for host_name, (total, count) in slowest:
+            display.display('STRAGGLER:   {0}: {1} tasks, {2:.2f}s total, {3:.2f}s average{4}'.format(
+                host_name, count, total, total / count, ' (straggler)' if self._is_slow(host_name, threshold) else ''))
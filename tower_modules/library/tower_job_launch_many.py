@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+module: tower_job_launch_many
+short_description: Launch many Tower jobs at once and wait on all of them.
+description:
+    - Launches each of C(job_template) C(count) times at the same time, over a pool of
+      C(connections) keep-alive connections, to load Tower's job queue the way M(tower_job_launch)
+      in a loop cannot, as it opens a connection and waits for each job by itself.
+    - Waits on all the launched jobs with one polling loop that fetches up to 200 jobs per
+      request, backing off from C(min_interval) to C(max_interval) while nothing changes.
+    - Reports the percentiles of the launch request latency, the queue latency (created to
+      started) and run latency (started to finished) from Tower's own timestamps, and launch to
+      finish as observed by the polling.
+    - Run C(utils/mock_tower.py) for a local stand-in of the Tower API.
+    - The lookup of the same name does the same from the controller.
+version_added: "2.9"
+options:
+    job_template:
+        description:
+            - Names or ids of the job templates to launch.
+        required: true
+        type: list
+    count:
+        description:
+            - Number of jobs launched from each template.
+        default: 1
+        type: int
+    extra_vars:
+        description:
+            - Extra vars passed to every launch.
+        type: dict
+    wait:
+        description:
+            - Wait for the jobs to finish. Otherwise only launch latencies are reported.
+        default: true
+        type: bool
+    timeout:
+        description:
+            - Seconds to wait for all jobs, 0 waits forever. Jobs still running then are listed in C(unfinished).
+        default: 0
+        type: int
+    min_interval:
+        description:
+            - Seconds between polls while jobs change status.
+        default: 1.0
+        type: float
+    max_interval:
+        description:
+            - Longest seconds between polls when nothing changes.
+        default: 30.0
+        type: float
+    connections:
+        description:
+            - Size of the connection pool, and the number of requests in flight at once.
+        default: 10
+        type: int
+    tower_host:
+        description:
+            - URL of the Tower instance, defaults to C(TOWER_HOST).
+    tower_username:
+        description:
+            - Username for basic auth, defaults to C(TOWER_USERNAME).
+    tower_password:
+        description:
+            - Password for basic auth, defaults to C(TOWER_PASSWORD).
+    tower_oauthtoken:
+        description:
+            - OAuth token used instead of the username and password, defaults to C(TOWER_OAUTH_TOKEN).
+    validate_certs:
+        description:
+            - Verify the Tower certificate, defaults to C(TOWER_VERIFY_SSL).
+        type: bool
+        default: true
+        aliases: [tower_verify_ssl]
+requirements: []
+'''
+
+EXAMPLES = '''
+- tower_job_launch_many:
+    job_template: Demo Job Template
+    count: 100
+    connections: 20
+    timeout: 600
+  register: load
+
+- debug:
+    var: load.latency.queue
+'''
+
+RETURN = '''
+statuses:
+    description: Number of jobs in each final status, C(launch failed) for launches Tower refused.
+    returned: always
+    type: dict
+    sample: {"successful": 99, "failed": 1}
+latency:
+    description: Percentiles in seconds of the C(launch), C(queue), C(run) and C(total) latency of all jobs.
+    returned: always
+    type: dict
+    sample: {"queue": {"count": 100, "min": 0.05, "mean": 4.2, "p50": 4.4, "p90": 8.1, "p95": 8.6,
+             "p99": 9.0, "max": 9.1}}
+jobs:
+    description: Every launched job, in launch order, with its id, status and latencies.
+    returned: always
+    type: list
+unfinished:
+    description: Ids of jobs that had not finished at the timeout.
+    returned: always
+    type: list
+requests:
+    description: HTTP requests made.
+    returned: always
+    type: int
+connections:
+    description: HTTP connections opened.
+    returned: always
+    type: int
+'''
+
+from ansible.module_utils.basic import AnsibleModule, env_fallback
+from ansible.module_utils.tower_load import ConnectionPool, TowerAPIError, launch_and_wait
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            job_template=dict(type='list', required=True),
+            count=dict(type='int', default=1),
+            extra_vars=dict(type='dict'),
+            wait=dict(type='bool', default=True),
+            timeout=dict(type='int', default=0),
+            min_interval=dict(type='float', default=1.0),
+            max_interval=dict(type='float', default=30.0),
+            connections=dict(type='int', default=10),
+            tower_host=dict(fallback=(env_fallback, ['TOWER_HOST'])),
+            tower_username=dict(fallback=(env_fallback, ['TOWER_USERNAME'])),
+            tower_password=dict(no_log=True, fallback=(env_fallback, ['TOWER_PASSWORD'])),
+            tower_oauthtoken=dict(no_log=True, fallback=(env_fallback, ['TOWER_OAUTH_TOKEN'])),
+            validate_certs=dict(type='bool', default=True, aliases=['tower_verify_ssl'],
+                                fallback=(env_fallback, ['TOWER_VERIFY_SSL']))))
+
+    params = module.params
+    if not params['tower_host']:
+        module.fail_json(msg='tower_host or TOWER_HOST is required')
+    if params['count'] < 1 or params['connections'] < 1:
+        module.fail_json(msg='count and connections must be at least 1')
+
+    pool = ConnectionPool(params['tower_host'], size=params['connections'], username=params['tower_username'],
+                          password=params['tower_password'], oauth_token=params['tower_oauthtoken'],
+                          validate_certs=params['validate_certs'])
+    try:
+        result = launch_and_wait(pool, params['job_template'], params['count'], threads=params['connections'],
+                                 extra_vars=params['extra_vars'], wait=params['wait'],
+                                 timeout=params['timeout'], min_interval=params['min_interval'],
+                                 max_interval=params['max_interval'])
+    except TowerAPIError as e:
+        module.fail_json(msg='Unable to launch jobs: {0}'.format(e))
+    finally:
+        pool.close()
+
+    module.exit_json(changed=True, **result)
+
+
+if __name__ == '__main__':
+    main()
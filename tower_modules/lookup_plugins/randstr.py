@@ -6,15 +6,46 @@ DOCUMENTATION = """
     lookup: randstr
     author: Chris Meyers <cmeyers@redhat.com>
     version_added: "0.1"
-    short_description: generate random string
+    short_description: generate random strings
     description:
-        - This lookup returns a random string.
+        - This lookup returns random strings, by default a single 12 character lowercase one.
+        - All strings are cut from one bulk buffer of random bytes, so asking for thousands in
+          one call is much cheaper than calling the lookup once per item.
+    options:
+      count:
+        description: Number of strings to return.
+        default: 1
+      length:
+        description: Length of each string.
+        default: 12
+      charset:
+        description:
+          - Characters to draw from, either literal ASCII characters or the name of a
+            python C(string) constant such as C(ascii_letters) or C(digits).
+        default: ascii_lowercase
+      unique:
+        description: Guarantee that no string is returned twice in the same call.
+        default: True
+      seed:
+        description: Seed for reproducible output. Without it the strings come from os.urandom.
 """
+
+EXAMPLES = """
+- debug:
+    msg: "{{ lookup('randstr') }}"
+
+- set_fact:
+    org_names: "{{ query('randstr', count=1000, length=16, seed=42) }}"
+"""
+
 from ansible.errors import AnsibleError, AnsibleParserError
+from ansible.module_utils.parsing.convert_bool import boolean
 from ansible.plugins.lookup import LookupBase
 
-import string
+import binascii
+import os
 import random
+import string
 
 try:
     from __main__ import display
@@ -22,8 +53,68 @@ except ImportError:
     from ansible.utils.display import Display
     display = Display()
 
+CHARSETS = ('ascii_letters', 'ascii_lowercase', 'ascii_uppercase', 'digits', 'hexdigits', 'octdigits')
+
+
+def resolve_charset(charset):
+    if charset in CHARSETS:
+        charset = getattr(string, charset)
+    if not charset or len(set(charset)) != len(charset) or any(ord(c) > 127 for c in charset):
+        raise AnsibleParserError('randstr charset must be unique ASCII characters, got {!r}'.format(charset))
+    return charset
+
+
+def entropy(size, rng=None):
+    if rng is None:
+        return os.urandom(size)
+    return binascii.unhexlify('%0*x' % (size * 2, rng.getrandbits(size * 8)))
+
+
+def random_strings(count, length, charset, unique=True, seed=None):
+    '''
+    Returns count strings of length characters from charset.
+
+    Random bytes are mapped onto charset with one bytes.translate() call; bytes at or above
+    the largest multiple of len(charset) are dropped so every character is equally likely.
+    '''
+    if unique and len(charset) ** length < count:
+        raise AnsibleError('randstr cannot make {} unique strings of length {} from {} characters'.format(
+            count, length, len(charset)))
+    rng = None if seed is None else random.Random(seed)
+    usable = 256 - 256 % len(charset)
+    table = bytes(bytearray(ord(charset[b % len(charset)]) for b in range(256)))
+    rejected = bytes(bytearray(range(usable, 256)))
+
+    results = []
+    seen = set()
+    while len(results) < count:
+        needed = (count - len(results)) * length
+        # oversample by the rejection rate plus a little, so one pass is almost always enough
+        chars = b''
+        while len(chars) < needed:
+            size = (needed - len(chars)) * 256 // usable + 64
+            chars += entropy(size, rng).translate(table, rejected)
+        chars = chars[:needed].decode('ascii')
+        for start in range(0, needed, length):
+            value = chars[start:start + length]
+            if unique:
+                if value in seen:
+                    continue
+                seen.add(value)
+            results.append(value)
+    return results
+
 
 class LookupModule(LookupBase):
 
     def run(self, terms, variables=None, **kwargs):
-        return [''.join(random.choice(string.ascii_lowercase) for i in range(12))]
+        try:
+            count = int(kwargs.get('count', 1))
+            length = int(kwargs.get('length', 12))
+        except ValueError as e:
+            raise AnsibleParserError('randstr count and length must be integers: {}'.format(e))
+        if count < 0 or length < 1:
+            raise AnsibleParserError('randstr needs count >= 0 and length >= 1')
+        charset = resolve_charset(kwargs.get('charset', 'ascii_lowercase'))
+        unique = boolean(kwargs.get('unique', True), strict=False)
+        return random_strings(count, length, charset, unique=unique, seed=kwargs.get('seed'))
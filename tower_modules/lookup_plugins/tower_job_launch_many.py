@@ -0,0 +1,108 @@
+# python 3 headers, required if submitting to Ansible
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = """
+    lookup: tower_job_launch_many
+    version_added: "2.9"
+    short_description: launch many Tower jobs at once from the controller and wait on all of them
+    description:
+        - Does what the tower_job_launch_many module does, launching every job template in the
+          terms I(count) times over one pool of keep-alive connections and polling all the jobs
+          in batches, but in the controller process, so no module is shipped anywhere.
+        - Returns one result, with the job statuses, latency percentiles and every job.
+    options:
+      _terms:
+        description: Names or ids of the job templates to launch.
+        required: True
+      count:
+        description: Number of jobs launched from each template.
+        default: 1
+      extra_vars:
+        description: Extra vars passed to every launch.
+      wait:
+        description: Wait for the jobs to finish.
+        default: True
+      timeout:
+        description: Seconds to wait for all jobs, 0 waits forever.
+        default: 0
+      min_interval:
+        description: Seconds between polls while jobs change status.
+        default: 1.0
+      max_interval:
+        description: Longest seconds between polls when nothing changes.
+        default: 30.0
+      connections:
+        description: Size of the connection pool.
+        default: 10
+      tower_host:
+        description: URL of the Tower instance.
+        env:
+          - name: TOWER_HOST
+      tower_username:
+        description: Username for basic auth.
+        env:
+          - name: TOWER_USERNAME
+      tower_password:
+        description: Password for basic auth.
+        env:
+          - name: TOWER_PASSWORD
+      tower_oauthtoken:
+        description: OAuth token used instead of the username and password.
+        env:
+          - name: TOWER_OAUTH_TOKEN
+      validate_certs:
+        description: Verify the Tower certificate.
+        default: True
+        env:
+          - name: TOWER_VERIFY_SSL
+"""
+
+EXAMPLES = """
+- debug:
+    msg: "{{ lookup('tower_job_launch_many', 'Demo Job Template', count=50, timeout=300).latency }}"
+"""
+
+from ansible.errors import AnsibleError
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.lookup import LookupBase
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'module_utils'))
+from tower_load import ConnectionPool, TowerAPIError, launch_and_wait  # noqa: E402
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+        if not terms:
+            raise AnsibleError('tower_job_launch_many needs at least one job template')
+        host = self.get_option('tower_host')
+        if not host:
+            raise AnsibleError('tower_job_launch_many needs tower_host or TOWER_HOST')
+        try:
+            count = int(self.get_option('count'))
+            connections = int(self.get_option('connections'))
+            timeout = int(self.get_option('timeout'))
+            min_interval = float(self.get_option('min_interval'))
+            max_interval = float(self.get_option('max_interval'))
+        except ValueError as e:
+            raise AnsibleError('tower_job_launch_many count, connections, timeout and intervals must be numbers: '
+                               '{0}'.format(e))
+
+        pool = ConnectionPool(host, size=connections, username=self.get_option('tower_username'),
+                              password=self.get_option('tower_password'),
+                              oauth_token=self.get_option('tower_oauthtoken'),
+                              validate_certs=boolean(self.get_option('validate_certs'), strict=False))
+        try:
+            return [launch_and_wait(pool, terms, count, threads=connections,
+                                    extra_vars=self.get_option('extra_vars'),
+                                    wait=boolean(self.get_option('wait'), strict=False), timeout=timeout,
+                                    min_interval=min_interval, max_interval=max_interval)]
+        except TowerAPIError as e:
+            raise AnsibleError('Unable to launch jobs: {0}'.format(e))
+        finally:
+            pool.close()
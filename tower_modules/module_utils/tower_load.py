@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+# Launches many Tower jobs at once over a pool of keep-alive connections and waits on all of
+# them with one polling loop. Shared by the tower_job_launch_many module and lookup.
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import base64
+import calendar
+import errno
+import json
+import socket
+import ssl
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from ansible.module_utils._text import to_bytes, to_native, to_text
+from ansible.module_utils.six import integer_types
+from ansible.module_utils.six.moves import http_client, queue
+from ansible.module_utils.six.moves.urllib.parse import urlencode, urlparse
+
+FINISHED = frozenset(['successful', 'failed', 'error', 'canceled'])
+# Tower's max_page_size, the most jobs one list request can return
+PAGE_SIZE = 200
+
+
+class TowerAPIError(Exception):
+    pass
+
+
+def stale(error):
+    ''' whether a request failed because the server had closed the kept-alive connection, before any reply '''
+    if isinstance(error, socket.timeout):
+        return False
+    if isinstance(error, http_client.BadStatusLine):
+        # RemoteDisconnected on python 3, both leave an empty status line
+        return not error.line.strip("'")
+    return isinstance(error, socket.error) and error.errno in (errno.ECONNRESET, errno.EPIPE)
+
+
+class ConnectionPool(object):
+    ''' up to size keep-alive connections to one Tower, shared by threads '''
+
+    def __init__(self, host, size=10, username=None, password=None, oauth_token=None, validate_certs=True,
+                 timeout=30):
+        url = urlparse(host if '://' in host else 'https://' + host)
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self.context = None
+        if self.scheme == 'https':
+            self.context = ssl.create_default_context() if validate_certs else ssl._create_unverified_context()
+        self.headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if oauth_token:
+            self.headers['Authorization'] = 'Bearer {0}'.format(oauth_token)
+        elif username:
+            credentials = to_bytes(u'{0}:{1}'.format(username, password or u''))
+            self.headers['Authorization'] = 'Basic {0}'.format(to_native(base64.b64encode(credentials)))
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.requests = 0
+
+    def _connect(self):
+        with self.lock:
+            self.opened += 1
+        if self.scheme == 'https':
+            return http_client.HTTPSConnection(self.netloc, timeout=self.timeout, context=self.context)
+        return http_client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def _send(self, method, url, body):
+        try:
+            conn, reused = self.idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._connect(), False
+        response = None
+        try:
+            conn.request(method, url, body=body, headers=self.headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (http_client.HTTPException, socket.error) as e:
+            conn.close()
+            # the server may have dropped the idle connection. Anything but a GET is only sent again when
+            # the reply had not begun, a launch that merely answered slowly must not start a second job
+            if reused and (method == 'GET' or (response is None and stale(e))):
+                return self._send(method, url, body)
+            raise
+        if response.getheader('connection', '').lower() == 'close':
+            conn.close()
+        else:
+            self.idle.put(conn)
+        return response.status, payload
+
+    def request(self, method, path, data=None):
+        body = None if data is None else to_bytes(json.dumps(data))
+        try:
+            with self.slots:
+                status, payload = self._send(method, self.prefix + path, body)
+        except (http_client.HTTPException, socket.error, ssl.SSLError) as e:
+            raise TowerAPIError('{0} {1} failed: {2}'.format(method, path, to_native(e)))
+        with self.lock:
+            self.requests += 1
+        try:
+            result = json.loads(to_text(payload)) if payload else {}
+        except ValueError:
+            result = {'detail': to_text(payload)[:200]}
+        if status >= 400:
+            raise TowerAPIError('{0} {1} returned {2}: {3}'.format(method, path, status,
+                                                                 result.get('detail', result)))
+        return result
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def parse_time(value):
+    ''' seconds since the epoch of a Tower timestamp like 2019-08-20T15:02:15.373475Z '''
+    if not value:
+        return None
+    seconds, _, fraction = value.rstrip('Z').partition('.')
+    return calendar.timegm(time.strptime(seconds, '%Y-%m-%dT%H:%M:%S')) + float('0.' + (fraction or '0'))
+
+
+def percentiles(values):
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return {}
+
+    def rank(fraction):
+        return round(values[min(len(values) - 1, int(fraction * len(values)))], 3)
+    return dict(count=len(values), min=round(values[0], 3), mean=round(sum(values) / len(values), 3),
+                p50=rank(0.5), p90=rank(0.9), p95=rank(0.95), p99=rank(0.99), max=round(values[-1], 3))
+
+
+def template_id(pool, job_template):
+    if isinstance(job_template, integer_types) or to_text(job_template).isdigit():
+        return int(job_template)
+    found = pool.request('GET', '/api/v2/job_templates/?' + urlencode({'name': job_template}))
+    if not found.get('results'):
+        raise TowerAPIError('job_template/{0} was not found'.format(job_template))
+    return found['results'][0]['id']
+
+
+def launch_jobs(pool, threads, job_templates, count, extra_vars=None):
+    ''' launches every template count times at once, returns one record per job in launch order '''
+    ids = dict((name, template_id(pool, name)) for name in job_templates)
+    data = {'extra_vars': extra_vars} if extra_vars else {}
+
+    def launch(name):
+        start = time.time()
+        try:
+            job = pool.request('POST', '/api/v2/job_templates/{0}/launch/'.format(ids[name]), data)
+        except TowerAPIError as e:
+            return dict(job_template=name, id=None, status='launch failed', msg=to_native(e),
+                        launch_latency=time.time() - start)
+        return dict(job_template=name, id=job.get('job', job.get('id')), status=job.get('status', 'pending'),
+                    launch_latency=time.time() - start, launched=start)
+
+    workers = ThreadPool(threads)
+    try:
+        return workers.map(launch, [name for name in job_templates for _ in range(count)])
+    finally:
+        workers.close()
+        workers.join()
+
+
+def wait_jobs(pool, threads, jobs, timeout=None, min_interval=1.0, max_interval=30.0):
+    '''
+    Polls every launched job until all are finished, with one list request per PAGE_SIZE jobs
+    a round instead of one request per job. The interval doubles, up to max_interval, after
+    each round in which no job changed status, and drops back to min_interval when one did.
+    Returns the ids still unfinished at the timeout.
+    '''
+    by_id = dict((job['id'], job) for job in jobs if job['id'] is not None)
+    pending = set(job_id for job_id, job in by_id.items() if job['status'] not in FINISHED)
+    deadline = time.time() + timeout if timeout else None
+    interval = min_interval
+    workers = ThreadPool(threads)
+
+    def poll(batch):
+        query = urlencode({'id__in': ','.join(str(job_id) for job_id in batch), 'page_size': PAGE_SIZE})
+        return pool.request('GET', '/api/v2/jobs/?' + query).get('results', [])
+
+    try:
+        while pending:
+            ordered = sorted(pending)
+            batches = [ordered[i:i + PAGE_SIZE] for i in range(0, len(ordered), PAGE_SIZE)]
+            seen = time.time()
+            changed = False
+            for results in workers.map(poll, batches):
+                for result in results:
+                    job = by_id.get(result['id'])
+                    if job is None or job['status'] == result['status']:
+                        continue
+                    changed = True
+                    job.update(status=result['status'], created=result.get('created'),
+                               started=result.get('started'), finished=result.get('finished'))
+                    if result['status'] in FINISHED:
+                        job['finished_seen'] = seen
+                        pending.discard(job['id'])
+            if not pending:
+                break
+            interval = min_interval if changed else min(max_interval, interval * 2)
+            if deadline and time.time() + interval > deadline:
+                break
+            time.sleep(interval)
+    finally:
+        workers.close()
+        workers.join()
+    return sorted(pending)
+
+
+def summarize(jobs):
+    '''
+    Adds queue_latency (created to started) and run_latency (started to finished) from
+    Tower's own timestamps to every job, and returns their percentiles with those of the
+    launch requests and of launch to observed finish.
+    '''
+    for job in jobs:
+        created, started, finished = (parse_time(job.get(key)) for key in ('created', 'started', 'finished'))
+        job['queue_latency'] = started - created if created and started else None
+        job['run_latency'] = finished - started if started and finished else None
+        job['total_latency'] = job['finished_seen'] - job['launched'] if 'finished_seen' in job else None
+    statuses = {}
+    for job in jobs:
+        statuses[job['status']] = statuses.get(job['status'], 0) + 1
+    return dict(statuses=statuses,
+                latency=dict((name, percentiles(job[name + '_latency'] for job in jobs))
+                             for name in ('launch', 'queue', 'run', 'total')))
+
+
+def launch_and_wait(pool, job_templates, count, threads=10, extra_vars=None, wait=True, timeout=None,
+                    min_interval=1.0, max_interval=30.0):
+    start = time.time()
+    jobs = launch_jobs(pool, threads, job_templates, count, extra_vars)
+    unfinished = wait_jobs(pool, threads, jobs, timeout, min_interval, max_interval) if wait else []
+    result = summarize(jobs)
+    result.update(jobs=[dict((key, value) for key, value in job.items() if key not in ('launched', 'finished_seen'))
+                        for job in jobs],
+                  unfinished=unfinished, elapsed=round(time.time() - start, 3),
+                  requests=pool.requests, connections=pool.opened)
+    return result
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# Bytes of stdout and CPU time of chatty_tasks.yml and debug-50.yml with the default stdout
+# callback against the coalesce callback.  The controller's CPU time, which is where a stdout
+# callback runs, is recorded by utils/callback_plugins/bench_events.py and told apart from that
+# of the workers.  Exits non-zero when a run fails.  Needs ansible-playbook on the PATH.
+#
+#   python utils/bench_callbacks.py [--hosts 50] [--forks 10] [--callback default --callback coalesce]
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_playbooks import ROOT, write_inventory
+
+PLAYBOOKS = ('chatty_tasks.yml', 'debug-50.yml')
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=50)
+    parser.add_argument('--forks', type=int, default=10)
+    parser.add_argument('--callback', dest='callbacks', action='append',
+                        help='Stdout callbacks to compare (default: default and coalesce)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_callbacks')
+    inventory = os.path.join(workdir, 'hosts.ini')
+    write_inventory(inventory, args.hosts)
+    events_path = os.path.join(workdir, 'events.json')
+    failed = False
+    try:
+        print('{0:<18} {1:<10} {2:>12} {3:>9} {4:>16} {5:>12}  {6}'.format(
+            'playbook', 'callback', 'stdout bytes', 'wall s', 'controller cpu s', 'worker cpu s', 'rc'))
+        for playbook in PLAYBOOKS:
+            for callback in args.callbacks or ['default', 'coalesce']:
+                if os.path.exists(events_path):
+                    os.unlink(events_path)
+                env = dict(os.environ, ANSIBLE_STDOUT_CALLBACK=callback, BENCH_EVENTS_FILE=events_path,
+                           ANSIBLE_CALLBACK_PLUGINS=os.pathsep.join([os.path.join(ROOT, 'callback_plugins'),
+                                                                     os.path.join(ROOT, 'utils', 'callback_plugins')]),
+                           ANSIBLE_CALLBACK_WHITELIST='bench_events', ANSIBLE_CALLBACKS_ENABLED='bench_events')
+                stdout_path = os.path.join(workdir, 'stdout.log')
+                with open(stdout_path, 'wb') as stdout:
+                    start = time.time()
+                    process = subprocess.Popen(['ansible-playbook', '-i', inventory, '-f', str(args.forks),
+                                                os.path.join(ROOT, playbook)], stdout=stdout, env=env)
+                    # wait4 covers the whole tree, the controller's own share comes from bench_events
+                    _, status, usage = os.wait4(process.pid, 0)
+                    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+                    wall_time = time.time() - start
+                try:
+                    with open(events_path) as f:
+                        counts = json.load(f)
+                    controller = counts['controller_cpu_user'] + counts['controller_cpu_sys']
+                except (EnvironmentError, ValueError, KeyError):
+                    controller = None
+                failed = failed or process.returncode != 0 or controller is None
+                tree = usage.ru_utime + usage.ru_stime
+                print('{0:<18} {1:<10} {2:>12} {3:>9.2f} {4:>16} {5:>12}  rc={6}'.format(
+                    playbook, callback, os.path.getsize(stdout_path), wall_time,
+                    'n/a' if controller is None else '{0:.2f}'.format(controller),
+                    'n/a' if controller is None else '{0:.2f}'.format(tree - controller), process.returncode))
+    finally:
+        shutil.rmtree(workdir)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Fact cache benchmark: the jsonfile cache against cache_plugins/sqlite.py for many hosts with
+# large facts generated by library/test_scan_facts.py.  Times writing every host, reading one
+# fact per host from a fresh cache (like use_facts.yml), adding a cacheable fact to every
+# host (like gather_facts_set_stats.yml), listing the hosts and clearing the cache.  Then runs
+# gather_facts.yml with a cacheable set_fact twice through ansible-playbook against each cache,
+# the second run updating the cached facts, and reads the fact back; the exit status is 1 if
+# that fails.  Needs ansible importable and ansible-playbook on the PATH.
+#
+#   python utils/bench_fact_cache.py [--hosts 10000] [--num-keys 20] [--depth 2] [--string-size 32]
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from ansible.plugins.loader import cache_loader
+
+from bench_playbooks import ROOT, write_inventory
+
+
+def scan_facts(workdir, args):
+    args_path = os.path.join(workdir, 'args.json')
+    with open(args_path, 'w') as f:
+        json.dump(dict(ANSIBLE_MODULE_ARGS=dict(num_keys=args.num_keys, depth=args.depth, list_width=args.list_width,
+                                                string_size=args.string_size, unicode_ratio=0.1, seed=1)), f)
+    output = subprocess.check_output([sys.executable, os.path.join(ROOT, 'library', 'test_scan_facts.py'), args_path])
+    return json.loads(output.decode('utf-8'))['ansible_facts']
+
+
+def timed(results, name, hosts, step):
+    start = time.time()
+    step()
+    elapsed = time.time() - start
+    results.append((name, elapsed, hosts / elapsed if elapsed else 0))
+
+
+def run(plugin, uri, hosts, facts):
+    results = []
+    names = ['bench_host_{0}'.format(i) for i in range(hosts)]
+    cache = cache_loader.get(plugin, _uri=uri, _prefix='', _timeout=0)
+
+    def write():
+        for name in names:
+            cache.set(name, dict(facts, inventory_hostname=name))
+        # the sqlite cache batches writes, make sure they are on disk before timing stops
+        getattr(cache, '_commit', lambda: None)()
+    timed(results, 'set', hosts, write)
+
+    cache = cache_loader.get(plugin, _uri=uri, _prefix='', _timeout=0)
+    timed(results, 'get one fact', hosts, lambda: [cache.get(name)['inventory_hostname'] for name in names])
+
+    cache = cache_loader.get(plugin, _uri=uri, _prefix='', _timeout=0)
+
+    def update():
+        for name in names:
+            host_facts = cache.get(name)
+            host_facts.update(foo='bar')
+            cache.set(name, host_facts)
+        getattr(cache, '_commit', lambda: None)()
+    timed(results, 'update', hosts, update)
+
+    timed(results, 'keys', hosts, cache.keys)
+    timed(results, 'flush', hosts, cache.flush)
+    return results
+
+
+def run_playbooks(plugin, uri, inventory):
+    ''' runs gather_facts.yml with a cacheable set_fact twice, returns the seconds taken and whether it worked '''
+    env = dict(os.environ, ANSIBLE_CACHE_PLUGINS=os.path.join(ROOT, 'cache_plugins'), ANSIBLE_CACHE_PLUGIN=plugin,
+               ANSIBLE_CACHE_PLUGIN_CONNECTION=uri, ANSIBLE_CACHE_PLUGIN_TIMEOUT='0')
+    start = time.time()
+    with open(os.devnull, 'wb') as devnull:
+        for _ in range(2):
+            if subprocess.call(['ansible-playbook', '-i', inventory, os.path.join(ROOT, 'gather_facts.yml'),
+                                '-e', 'set_fact_cacheable=true'], stdout=devnull, env=env):
+                return time.time() - start, False
+    elapsed = time.time() - start
+    process = subprocess.Popen(['ansible', '-i', inventory, 'all', '-m', 'debug', '-a', 'var=bar.a.b'],
+                               stdout=subprocess.PIPE, env=env)
+    output = process.communicate()[0].decode('utf-8')
+    return elapsed, process.returncode == 0 and '"c"' in output
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=10000)
+    parser.add_argument('--num-keys', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--list-width', type=int, default=10)
+    parser.add_argument('--string-size', type=int, default=32)
+    parser.add_argument('--playbook-hosts', type=int, default=5, help='Hosts of the ansible-playbook runs')
+    parser.add_argument('--plugin', dest='plugins', action='append',
+                        help='Cache plugins to compare (default: jsonfile and sqlite)')
+    args = parser.parse_args()
+
+    cache_loader.add_directory(os.path.join(ROOT, 'cache_plugins'))
+    workdir = tempfile.mkdtemp(prefix='bench_fact_cache')
+    try:
+        facts = scan_facts(workdir, args)
+        print('{0} hosts, {1:,} bytes of facts each'.format(args.hosts, len(json.dumps(facts))))
+        inventory = os.path.join(workdir, 'hosts.ini')
+        write_inventory(inventory, args.playbook_hosts)
+        failed = False
+        for plugin in args.plugins or ['jsonfile', 'sqlite']:
+            uri = os.path.join(workdir, plugin)
+            os.makedirs(uri)
+            for name, elapsed, rate in run(plugin, uri, args.hosts, facts):
+                print('{0:<10} {1:<14} {2:>9.2f}s {3:>12,.0f} hosts/sec'.format(plugin, name, elapsed, rate))
+            elapsed, ok = run_playbooks(plugin, uri, inventory)
+            failed = failed or not ok
+            print('{0:<10} {1:<14} {2:>9.2f}s {3:>12}'.format(plugin, 'set_fact x2', elapsed, 'ok' if ok else 'FAILED'))
+            shutil.rmtree(uri)
+    finally:
+        shutil.rmtree(workdir)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Inventory parse time of the herd plugin without the inventory cache, on a cache miss (which
+# generates the hosts and writes the cache) and on a cache hit.  Each parse runs in a fresh
+# process, and every miss starts from an empty cache.  Reports the time in the plugin (parsing
+# and updating the cache) and the inventory load as a whole, which on ansible 2.10 and later
+# also runs the vars plugins for every host.  Needs ansible importable.
+#
+#   python utils/bench_herd.py [--hosts 100000] [--groups 20] [--repeat 3] [--cache-plugin jsonfile]
+from __future__ import print_function
+
+from argparse import SUPPRESS, ArgumentParser
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_playbooks import ROOT
+
+PLUGINS = os.path.join(ROOT, 'inventories', 'user_plugins', 'inventory_plugins')
+CASES = (('no cache', False, True), ('cache miss', True, True), ('cache hit', True, False))
+
+
+def parse(path):
+    ''' runs in the child process, prints the seconds spent in the plugin and in the whole load, and the host count '''
+    from ansible.inventory.manager import InventoryManager
+    from ansible.parsing.dataloader import DataLoader
+    from ansible.plugins.loader import inventory_loader
+    plugin = inventory_loader.get('herd', class_only=True)
+    spent = [0.0]
+
+    def timed(method):
+        def run(*args, **kwargs):
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                spent[0] += time.time() - start
+        return run
+    plugin.parse = timed(plugin.parse)
+    plugin.update_cache_if_changed = timed(plugin.update_cache_if_changed)
+    start = time.time()
+    inventory = InventoryManager(loader=DataLoader(), sources=[path])
+    print(spent[0], time.time() - start, len(inventory.hosts))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=100000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3, help='Parses per case, the fastest is kept')
+    parser.add_argument('--cache-plugin', default='jsonfile')
+    parser.add_argument('--parse', help=SUPPRESS)
+    args = parser.parse_args()
+    if args.parse:
+        return parse(args.parse)
+
+    workdir = tempfile.mkdtemp(prefix='bench_herd')
+    try:
+        cache_dir = os.path.join(workdir, 'cache')
+        env = dict(os.environ, ANSIBLE_INVENTORY_PLUGINS=PLUGINS, ANSIBLE_INVENTORY_ENABLED='herd',
+                   ANSIBLE_INVENTORY_UNPARSED_FAILED='True')
+        baseline = None
+        for name, cache, clear in CASES:
+            path = os.path.join(workdir, '{0}.herd.yaml'.format(name.replace(' ', '_')))
+            with open(path, 'w') as f:
+                f.write('plugin: herd\nhost_count: {0}\ngroup_count: {1}\ncache: {2}\ncache_plugin: {3}\n'
+                        'cache_connection: {4}\ncache_timeout: 0\n'.format(args.hosts, args.groups, cache,
+                                                                          args.cache_plugin, cache_dir))
+            if not clear:
+                # the hit reads what a miss on the same file wrote
+                subprocess.check_output([sys.executable, os.path.realpath(__file__), '--parse', path], env=env)
+            runs = []
+            for _ in range(args.repeat):
+                if clear:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                output = subprocess.check_output([sys.executable, os.path.realpath(__file__), '--parse', path],
+                                                 env=env)
+                in_plugin, total, hosts = output.decode('utf-8').split()[-3:]
+                runs.append((float(in_plugin), float(total)))
+            in_plugin, total = min(runs)
+            baseline = baseline or in_plugin
+            print('{0:<12} plugin {1:>7.2f}s {2:>6.2f}x  total {3:>7.2f}s  {4} hosts'.format(
+                name, in_plugin, baseline / in_plugin, total, hosts))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
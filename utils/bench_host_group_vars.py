@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# Inventory load time with many host_vars/group_vars files: the builtin host_group_vars plugin
+# against vars_plugins/indexed_host_group_vars.py building its index (cold), reading it (warm)
+# and rebuilding it after a host_vars file was added.  Each run's inventory must match the
+# builtin's, and the exit status is 1 if one does not.  --inventory compares an existing
+# inventory instead of a generated one.  Needs ansible-inventory on the PATH.
+#
+#   python utils/bench_host_group_vars.py [--hosts 20000] [--groups 100] [--vars 10]
+#   python utils/bench_host_group_vars.py --inventory inventories/inventory.ini
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_playbooks import ROOT
+
+
+def write_tree(directory, hosts, groups, variables):
+    os.makedirs(os.path.join(directory, 'host_vars'))
+    os.makedirs(os.path.join(directory, 'group_vars'))
+    with open(os.path.join(directory, 'hosts.ini'), 'w') as f:
+        for group in range(groups):
+            f.write('[bench_group_{0}]\n'.format(group))
+            for host in range(group, hosts, groups):
+                f.write('bench_host_{0}\n'.format(host))
+    for group in range(groups):
+        with open(os.path.join(directory, 'group_vars', 'bench_group_{0}.yml'.format(group)), 'w') as f:
+            f.write(''.join('group_var_{0}: group {1} value {0}\n'.format(i, group) for i in range(variables)))
+    for host in range(hosts):
+        with open(os.path.join(directory, 'host_vars', 'bench_host_{0}.yml'.format(host)), 'w') as f:
+            f.write(''.join('host_var_{0}:\n  name: host {1}\n  values: [{0}, {1}]\n'.format(i, host)
+                            for i in range(variables)))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--vars', type=int, default=10)
+    parser.add_argument('--inventory', help='Existing inventory to compare instead of a generated one')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_host_group_vars')
+    try:
+        if args.inventory:
+            inventory = os.path.realpath(args.inventory)
+        else:
+            write_tree(workdir, args.hosts, args.groups, args.vars)
+            inventory = os.path.join(workdir, 'hosts.ini')
+        index_dir = os.path.join(workdir, 'index')
+        version = subprocess.check_output(['ansible-inventory', '--version']).decode('utf-8')
+        legacy = tuple(int(part) for part in re.search(r'(\d+)\.(\d+)', version).groups()) < (2, 10)
+        baseline = expected = None
+        mismatches = 0
+        for name, enabled in (('builtin', False), ('index cold', True), ('index warm', True), ('index added', True)):
+            # ansible 2.9 enables the plugin through the environment, later versions with vars_plugins_enabled
+            env = dict(os.environ, INDEXED_HOST_GROUP_VARS_DIR=index_dir,
+                       ANSIBLE_VARS_PLUGINS=os.path.join(ROOT, 'vars_plugins'),
+                       ANSIBLE_VARS_ENABLED='indexed_host_group_vars' if enabled else 'host_group_vars')
+            env.pop('INDEXED_HOST_GROUP_VARS', None)
+            if legacy:
+                env['INDEXED_HOST_GROUP_VARS'] = str(enabled)
+            if name == 'index added':
+                if args.inventory:
+                    continue
+                # only forces a rebuild, no host of the inventory is called that
+                with open(os.path.join(workdir, 'host_vars', 'bench_host_added.yml'), 'w') as f:
+                    f.write('added: true\n')
+            start = time.time()
+            process = subprocess.Popen(['ansible-inventory', '-i', inventory, '--list', '--playbook-dir', ROOT],
+                                       stdout=subprocess.PIPE, env=env)
+            output = process.communicate()[0]
+            elapsed = time.time() - start
+            result = json.loads(output.decode('utf-8')) if process.returncode == 0 else None
+            expected = expected or result
+            same = result is not None and result == expected
+            mismatches += not same
+            baseline = baseline or elapsed
+            print('{0:<12} {1:>8.2f}s {2:>7.1f}x  rc={3} {4}'.format(
+                name, elapsed, baseline / elapsed, process.returncode, 'same' if same else 'DIFFERS'))
+    finally:
+        shutil.rmtree(workdir)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# Compares repeated dyn_inventory.py syncs rendered in-process (cold start) against the
+# same syncs answered by inventory_backend.py --serve.
+#
+#   python utils/bench_inventory_backend.py --runs 50 [-- --hosts 10000]
+#
+# Arguments after -- are passed through to every inventory script.
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from inventory_backend import DEFAULT_SOURCES
+
+
+def parse_args():
+    parser = ArgumentParser()
+    parser.add_argument('--runs', type=int, default=30, help='Syncs per script and mode (default: %(default)s)')
+    parser.add_argument('--source', dest='sources', action='append',
+                        help='Inventory script to benchmark (default: all dyn_inventory.py scripts)')
+    parser.add_argument('script_args', nargs='*', help='Arguments passed to each inventory script')
+    return parser.parse_args()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def time_syncs(source, script_args, runs, socket_path):
+    env = dict(os.environ, DYN_INVENTORY_SOCKET=socket_path)
+    samples = []
+    with open(os.devnull, 'wb') as devnull:
+        for _ in range(runs):
+            start = time.time()
+            subprocess.check_call([sys.executable, source] + script_args, stdout=devnull, env=env)
+            samples.append(time.time() - start)
+    return samples
+
+
+def wait_for_socket(path, server, timeout=10):
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if server.poll() is not None or time.time() > deadline:
+            raise RuntimeError('inventory server did not start')
+        time.sleep(0.05)
+
+
+def main():
+    args = parse_args()
+    sources = [os.path.realpath(source) for source in args.sources or DEFAULT_SOURCES]
+    socket_dir = tempfile.mkdtemp(prefix='dyn_inventory_bench')
+    socket_path = os.path.join(socket_dir, 'server.sock')
+    backend = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'inventory_backend.py')
+    server = subprocess.Popen([sys.executable, backend, '--serve', '--socket', socket_path]
+                              + ['--source={}'.format(source) for source in sources])
+    try:
+        wait_for_socket(socket_path, server)
+        print('{:<60} {:>8} {:>10} {:>10} {:>10}'.format('script', 'mode', 'mean ms', 'p50 ms', 'p95 ms'))
+        totals = {'cold': 0.0, 'server': 0.0}
+        for source in sources:
+            name = os.path.relpath(source)
+            for mode, path in (('cold', ''), ('server', socket_path)):
+                samples = time_syncs(source, args.script_args, args.runs, path)
+                totals[mode] += sum(samples)
+                print('{:<60} {:>8} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                    name, mode, 1000 * sum(samples) / len(samples),
+                    1000 * percentile(samples, 0.5), 1000 * percentile(samples, 0.95)))
+        print('total cold {:.2f}s, server {:.2f}s, speedup {:.2f}x'.format(
+            totals['cold'], totals['server'], totals['cold'] / totals['server']))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(socket_dir)
+
+
+if __name__ == '__main__':
+    main()
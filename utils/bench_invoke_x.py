@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# Invocations per second of running a module by name through invoke_x_template.j2, the way
+# invoke_x.yml did (template a playbook to /tmp, include it, delete it) against the invoke_x
+# action plugin, looping over the same module with different arguments.  Needs ansible-playbook
+# on the PATH.
+#
+#   python utils/bench_invoke_x.py [--count 200] [--module debug] [--module ping]
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from bench_playbooks import ROOT, write_inventory
+
+# invoke_x.yml before it used the invoke_x action, once per loop item
+INCLUDE_PLAYBOOK = '''
+- hosts: all
+  gather_facts: false
+  tasks:
+    - include_tasks: invoke_x_include.yml
+      loop: "{{{{ range({count}) | list }}}}"
+'''
+INCLUDE_TASKS = '''
+- set_fact:
+    playbook_name: "/tmp/invoke_x_include_{{ 9999999999999999999999 | random | to_uuid }}.yml"
+    module_name: {module}
+    module_args: {args}
+    check_mode: no
+
+- block:
+    - template:
+        src: invoke_x_template.j2
+        dest: "{{ playbook_name }}"
+
+    - include: "{{ playbook_name }}"
+
+  always:
+    - file:
+        path: "{{ playbook_name }}"
+        state: absent
+'''
+ACTION_PLAYBOOK = '''
+- hosts: all
+  gather_facts: false
+  tasks:
+    - invoke_x:
+        module_name: {module}
+        module_args: {args}
+        check_mode: no
+      loop: "{{{{ range({count}) | list }}}}"
+'''
+MODULE_ARGS = {
+    'debug': '{msg: "invocation {{ item }}"}',
+    'ping': '{data: "pong {{ item }}"}',
+}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--module', action='append', choices=sorted(MODULE_ARGS))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_invoke_x')
+    try:
+        inventory = os.path.join(workdir, 'hosts.ini')
+        write_inventory(inventory, 1)
+        shutil.copy(os.path.join(ROOT, 'invoke_x_template.j2'), workdir)
+        env = dict(os.environ, ANSIBLE_ACTION_PLUGINS=os.path.join(ROOT, 'action_plugins'),
+                   ANSIBLE_LIBRARY=os.path.join(ROOT, 'library'))
+
+        print('{0:<8} {1:<16} {2:>9} {3:>14}  {4}'.format('module', 'case', 'wall s', 'invocations/s', 'rc'))
+        for module in args.module or ['debug']:
+            cases = [('template+include', INCLUDE_PLAYBOOK, INCLUDE_TASKS), ('invoke_x', ACTION_PLAYBOOK, None)]
+            for name, playbook, tasks in cases:
+                fields = dict(count=args.count, module=module, args=MODULE_ARGS[module])
+                path = os.path.join(workdir, 'bench.yml')
+                with open(path, 'w') as f:
+                    f.write(playbook.format(**fields))
+                if tasks:
+                    with open(os.path.join(workdir, 'invoke_x_include.yml'), 'w') as f:
+                        f.write(tasks.replace('{module}', module).replace('{args}', MODULE_ARGS[module]))
+                with open(os.devnull, 'wb') as devnull:
+                    start = time.time()
+                    rc = subprocess.call(['ansible-playbook', '-i', inventory, path], stdout=devnull, env=env)
+                    wall_time = time.time() - start
+                print('{0:<8} {1:<16} {2:>9.2f} {3:>14.1f}  {4}'.format(
+                    module, name, wall_time, args.count / wall_time, rc))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# Runs the throughput playbooks over a matrix of inventory sizes and fork counts against
+# generated local-connection inventories, and compares the results to a recorded baseline.
+#
+#   python utils/bench_playbooks.py --record                 # write utils/bench_baseline.json
+#   python utils/bench_playbooks.py --threshold 0.15         # fail on >15% regressions
+#   python utils/bench_playbooks.py --playbook ping-20.yml --hosts 1 --hosts 50 --forks 5 --forks 25
+#
+# Each run records wall time, tasks/sec, events/sec (host and loop item results), the peak
+# RSS of the largest process in the ansible-playbook tree and the user/system CPU time of the
+# controller process and of the workers (everything else in the tree, including the modules
+# they run).  Tasks, events and the controller's CPU time are recorded by
+# utils/callback_plugins/bench_events.py.  Runs
+# that exit non-zero or leave no counts are reported as failures, left out of the comparison
+# and fail the gate.
+# Needs ansible-playbook on the PATH.
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+BASELINE_VERSION = 2
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'bench_baseline.json')
+PLAYBOOKS = ('file_benchmark.yml', 'chatty_tasks.yml', 'debug-50.yml', 'setfact_50.yml', 'ping-20.yml',
+             'serial.yml', 'free_waiter.yml')
+# lower is better for these, higher is better for the rest
+LOWER_IS_BETTER = ('wall_time', 'peak_rss_kb', 'tree_cpu_user', 'tree_cpu_sys', 'controller_cpu_user',
+                   'controller_cpu_sys', 'worker_cpu_user', 'worker_cpu_sys')
+COMPARED = ('wall_time', 'tasks_per_sec', 'events_per_sec', 'peak_rss_kb')
+
+
+def write_inventory(path, hosts):
+    with open(path, 'w') as f:
+        f.write('bench_host_[1:{0}] ansible_connection=local '
+                'ansible_python_interpreter="{{{{ ansible_playbook_python }}}}"\n'.format(hosts))
+
+
+def run_playbook(playbook, inventory, forks, workdir, extra_args):
+    events_path = os.path.join(workdir, 'events.json')
+    if os.path.exists(events_path):
+        os.unlink(events_path)
+    callback_plugins = [os.path.join(os.path.dirname(os.path.realpath(__file__)), 'callback_plugins')]
+    enabled = ['bench_events']
+    for name in ('ANSIBLE_CALLBACK_PLUGINS', 'ANSIBLE_CALLBACK_WHITELIST', 'ANSIBLE_CALLBACKS_ENABLED'):
+        if os.environ.get(name):
+            (callback_plugins if name == 'ANSIBLE_CALLBACK_PLUGINS' else enabled).append(os.environ[name])
+    env = dict(os.environ, ANSIBLE_HOST_KEY_CHECKING='False', BENCH_EVENTS_FILE=events_path,
+               ANSIBLE_CALLBACK_PLUGINS=os.pathsep.join(callback_plugins),
+               ANSIBLE_CALLBACK_WHITELIST=','.join(enabled), ANSIBLE_CALLBACKS_ENABLED=','.join(enabled))
+    with open(os.path.join(workdir, 'stdout.log'), 'wb') as stdout, \
+            open(os.path.join(workdir, 'stderr.log'), 'wb') as stderr:
+        start = time.time()
+        process = subprocess.Popen(['ansible-playbook', '-i', inventory, '-f', str(forks)] + extra_args
+                                   + [os.path.join(ROOT, playbook)], stdout=stdout, stderr=stderr, env=env)
+        # wait4 reports this run's resource use alone, covering the workers ansible-playbook reaped
+        _, status, usage = os.wait4(process.pid, 0)
+        wall_time = time.time() - start
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+
+    try:
+        with open(events_path) as f:
+            counts = json.load(f)
+        tasks, events, error = counts['tasks'], counts['events'], None
+        controller = (counts['controller_cpu_user'], counts['controller_cpu_sys'])
+    except (EnvironmentError, ValueError, KeyError) as e:
+        tasks = events = 0
+        controller = (None, None)
+        error = 'no task counts: {0}'.format(e)
+    return dict(rc=process.returncode,
+                error=error,
+                wall_time=round(wall_time, 3),
+                tasks=tasks,
+                events=events,
+                tasks_per_sec=round(tasks / wall_time, 3),
+                events_per_sec=round(events / wall_time, 3),
+                peak_rss_kb=usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss,
+                tree_cpu_user=round(usage.ru_utime, 3),
+                tree_cpu_sys=round(usage.ru_stime, 3),
+                # the controller's time after the playbook ended is small and counted as the workers'
+                controller_cpu_user=None if controller[0] is None else round(controller[0], 3),
+                controller_cpu_sys=None if controller[1] is None else round(controller[1], 3),
+                worker_cpu_user=None if controller[0] is None else round(usage.ru_utime - controller[0], 3),
+                worker_cpu_sys=None if controller[1] is None else round(usage.ru_stime - controller[1], 3))
+
+
+def failed(run):
+    return run.get('rc') or run.get('error')
+
+
+def regressions(results, baseline, threshold):
+    found = []
+    for key, result in sorted(results.items()):
+        previous = baseline.get('results', {}).get(key)
+        # a run that failed stopped early, its timings say nothing
+        if not previous or failed(previous) or failed(result):
+            continue
+        for metric in COMPARED:
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / float(old)
+            if metric not in LOWER_IS_BETTER:
+                change = -change
+            if change > threshold:
+                found.append('{0} {1}: {2} -> {3} ({4:+.0%})'.format(key, metric, old, new, change))
+    return found
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--playbook', dest='playbooks', action='append',
+                        help='Playbook to run, may be repeated (default: all throughput playbooks)')
+    parser.add_argument('--hosts', dest='host_counts', action='append', type=int,
+                        help='Inventory size, may be repeated (default: 1 and 10)')
+    parser.add_argument('--forks', dest='fork_counts', action='append', type=int,
+                        help='Fork count, may be repeated (default: 5)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per combination, the fastest is kept')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file (default: %(default)s)')
+    parser.add_argument('--record', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed regression as a fraction of the baseline (default: %(default)s)')
+    parser.add_argument('extra_args', nargs='*', help='Extra arguments for ansible-playbook, after --')
+    args = parser.parse_args()
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='bench_playbooks')
+    try:
+        for hosts in args.host_counts or [1, 10]:
+            inventory = os.path.join(workdir, 'hosts_{0}.ini'.format(hosts))
+            write_inventory(inventory, hosts)
+            for forks in args.fork_counts or [5]:
+                for playbook in args.playbooks or PLAYBOOKS:
+                    key = '{0}|hosts={1}|forks={2}'.format(playbook, hosts, forks)
+                    runs = [run_playbook(playbook, inventory, forks, workdir, args.extra_args)
+                            for _ in range(args.repeat)]
+                    failures = [run for run in runs if failed(run)]
+                    result = results[key] = failures[0] if failures else min(runs, key=lambda run: run['wall_time'])
+                    print('{0:<40} {1:>8.2f}s {2:>9.1f} tasks/s {3:>9.1f} events/s {4:>8} KB rss  '
+                          'controller cpu {5:.2f}u/{6:.2f}s  worker cpu {7:.2f}u/{8:.2f}s  rc={9}'.format(
+                              key, result['wall_time'], result['tasks_per_sec'], result['events_per_sec'],
+                              result['peak_rss_kb'], result['controller_cpu_user'] or 0,
+                              result['controller_cpu_sys'] or 0, result['worker_cpu_user'] or 0,
+                              result['worker_cpu_sys'] or 0, result['rc']))
+    finally:
+        shutil.rmtree(workdir)
+
+    failures = sorted(key for key, result in results.items() if failed(result))
+    for key in failures:
+        print('FAILED: {0} exited with rc={1}{2}'.format(
+            key, results[key]['rc'], ', {0}'.format(results[key]['error']) if results[key].get('error') else ''))
+
+    if args.record:
+        if failures:
+            sys.exit('not recording a baseline with failed runs')
+        try:
+            ansible_version = subprocess.check_output(['ansible-playbook', '--version']).decode('utf-8').splitlines()[0]
+        except (OSError, subprocess.CalledProcessError):
+            ansible_version = None
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(version=BASELINE_VERSION, recorded=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                           ansible=ansible_version, python=platform.python_version(), machine=platform.node(),
+                           results=results), f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('baseline written to {0}'.format(args.baseline))
+        return
+
+    if not os.path.exists(args.baseline):
+        print('no baseline at {0}, run with --record first'.format(args.baseline))
+        sys.exit(1 if failures else 0)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        sys.exit('baseline {0} is version {1}, expected {2}'.format(args.baseline, baseline.get('version'),
+                                                                     BASELINE_VERSION))
+    found = regressions(results, baseline, args.threshold)
+    for line in found:
+        print('REGRESSION: {0}'.format(line))
+    if not found and not failures:
+        print('no regressions beyond {0:.0%}'.format(args.threshold))
+    if found or failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
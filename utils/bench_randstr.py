@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# Micro-benchmark of the randstr lookup: strings/sec of the batched generator against the
+# original one-random.choice()-per-character implementation.  Needs ansible importable.
+#
+#   python utils/bench_randstr.py [--count 100000] [--length 12]
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'tower_modules', 'lookup_plugins'))
+from randstr import random_strings  # noqa: E402
+
+
+def per_character(count, length):
+    return [''.join(random.choice(string.ascii_lowercase) for i in range(length)) for _ in range(count)]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--length', type=int, default=12)
+    args = parser.parse_args()
+
+    cases = [('random.choice per character', lambda: per_character(args.count, args.length)),
+             ('batched', lambda: random_strings(args.count, args.length, string.ascii_lowercase)),
+             ('batched, seeded', lambda: random_strings(args.count, args.length, string.ascii_lowercase, seed=1))]
+    baseline = None
+    for name, generate in cases:
+        start = time.time()
+        strings = generate()
+        elapsed = time.time() - start
+        rate = len(strings) / elapsed
+        baseline = baseline or rate
+        print('{:<30} {:>12,.0f} strings/sec {:>7.1f}x'.format(name, rate, rate / baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# Inventory parse time of the ranges plugin against the same host patterns in an INI file.
+# Hosts are split into shard groups under region groups under one world group, and every
+# other host of a shard is also in a half group.  Each source is parsed in a fresh process.
+# Needs ansible importable.
+#
+#   python utils/bench_ranges.py [--hosts 200000] [--shards 20] [--repeat 3]
+from __future__ import print_function
+
+from argparse import SUPPRESS, ArgumentParser
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_playbooks import ROOT
+
+PLUGINS = os.path.join(ROOT, 'inventories', 'user_plugins', 'inventory_plugins')
+REGIONS = 4
+
+
+def shards(hosts, count):
+    size = hosts // count
+    width = len(str(hosts))
+    for shard in range(count):
+        yield shard, '[{0:0{2}d}:{1:0{2}d}]'.format(shard * size, (shard + 1) * size - 1, width)
+
+
+def write_sources(directory, hosts, count):
+    with open(os.path.join(directory, 'bench.ranges.yaml'), 'w') as f:
+        f.write('plugin: ranges\ngroups:\n  world:\n    children: [{0}]\n'.format(
+            ', '.join('region_{0}'.format(region) for region in range(REGIONS))))
+        for region in range(REGIONS):
+            f.write('  region_{0}:\n    children: [{1}]\n'.format(region, ', '.join(
+                'shard_{0}'.format(shard) for shard in range(region, count, REGIONS))))
+        for shard, span in shards(hosts, count):
+            f.write('  shard_{0}:\n    hosts:\n      - host_{1}\n'.format(shard, span))
+            f.write('  half_{0}:\n    hosts:\n      - host_{1}\n'.format(shard, span[:-1] + ':2]'))
+    with open(os.path.join(directory, 'bench.ini'), 'w') as f:
+        f.write('[world:children]\n{0}\n'.format('\n'.join('region_{0}'.format(r) for r in range(REGIONS))))
+        for region in range(REGIONS):
+            f.write('[region_{0}:children]\n{1}\n'.format(region, '\n'.join(
+                'shard_{0}'.format(shard) for shard in range(region, count, REGIONS))))
+        for shard, span in shards(hosts, count):
+            f.write('[shard_{0}]\nhost_{1}\n[half_{0}]\nhost_{2}\n'.format(shard, span, span[:-1] + ':2]'))
+
+
+def parse(path):
+    ''' runs in the child process, prints the seconds the inventory took to load and its host count '''
+    from ansible.inventory.manager import InventoryManager
+    from ansible.parsing.dataloader import DataLoader
+    start = time.time()
+    inventory = InventoryManager(loader=DataLoader(), sources=[path])
+    print(time.time() - start, len(inventory.hosts))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=200000)
+    parser.add_argument('--shards', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3, help='Parses per source, the fastest is kept')
+    parser.add_argument('--parse', help=SUPPRESS)
+    args = parser.parse_args()
+    if args.parse:
+        return parse(args.parse)
+
+    workdir = tempfile.mkdtemp(prefix='bench_ranges')
+    try:
+        write_sources(workdir, args.hosts, args.shards)
+        env = dict(os.environ, ANSIBLE_INVENTORY_PLUGINS=PLUGINS, ANSIBLE_INVENTORY_ENABLED='ranges,ini',
+                   ANSIBLE_INVENTORY_UNPARSED_FAILED='True')
+        baseline = None
+        for name in ('bench.ini', 'bench.ranges.yaml'):
+            runs = []
+            for _ in range(args.repeat):
+                output = subprocess.check_output([sys.executable, os.path.realpath(__file__), '--parse',
+                                                  os.path.join(workdir, name)], env=env)
+                seconds, hosts = output.decode('utf-8').split()[-2:]
+                runs.append(float(seconds))
+            baseline = baseline or min(runs)
+            print('{0:<18} {1:>8.2f}s {2:>7.2f}x  {3} hosts'.format(name, min(runs), baseline / min(runs), hosts))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# Peak RSS and wall time of reading one large file into a registered result with cat_file.yml,
+# which uses the read_file module: whole, whole without stdout_lines and as a 1 MiB tail without
+# stdout_lines.  The same read through `command: cat`, which cat_file.yml used before, is run
+# for comparison.  Needs ansible-playbook on the PATH.
+#
+#   python utils/bench_read_file.py [--mib 200] [--hosts 1]
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_playbooks import ROOT, write_inventory
+
+CAT_PLAYBOOK = '''
+- hosts: all
+  tasks:
+    - command: 'cat {{ file_to_cat }}'
+      register: cat
+    - debug:
+       var: cat
+'''
+
+def write_file(path, mib):
+    line = b'2019-08-20 15:02:15,373 INFO some.logger.name: a log line of about one hundred bytes ....\n'
+    block = line * (1024 * 1024 // len(line))
+    with open(path, 'wb') as f:
+        for _ in range(mib):
+            f.write(block)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--mib', type=int, default=200)
+    parser.add_argument('--hosts', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_read_file')
+    try:
+        inventory = os.path.join(workdir, 'hosts.ini')
+        write_inventory(inventory, args.hosts)
+        data = os.path.join(workdir, 'data.log')
+        write_file(data, args.mib)
+        playbook = os.path.join(ROOT, 'cat_file.yml')
+        cat_playbook = os.path.join(workdir, 'command_cat.yml')
+        with open(cat_playbook, 'w') as f:
+            f.write(CAT_PLAYBOOK)
+        cases = [('command: cat', cat_playbook, []),
+                 ('read_file', playbook, []),
+                 ('read_file no lines', playbook, ['-e', 'cat_lines=false']),
+                 ('read_file 1MiB tail', playbook, ['-e', 'cat_offset=-1048576', '-e', 'cat_lines=false'])]
+        env = dict(os.environ, ANSIBLE_LIBRARY=os.path.join(ROOT, 'library'))
+        print('{0:<22} {1:>9} {2:>14}  {3}'.format('case', 'wall s', 'peak rss MiB', 'rc'))
+        for name, case_playbook, extra_args in cases:
+            with open(os.devnull, 'wb') as devnull:
+                start = time.time()
+                process = subprocess.Popen(['ansible-playbook', '-i', inventory, '-e', 'file_to_cat=' + data]
+                                           + extra_args + [case_playbook], stdout=devnull, env=env)
+                _, status, usage = os.wait4(process.pid, 0)
+                wall_time = time.time() - start
+            peak_kb = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+            print('{0:<22} {1:>9.2f} {2:>14.1f}  {3}'.format(
+                name, wall_time, peak_kb / 1024.0, os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# Wall-clock comparison of strategies on free_waiter.yml and serial.yml against a
+# generated inventory of local hosts.  Needs ansible-playbook on the PATH.
+#
+#   python utils/bench_strategy.py [--hosts 20] [--forks 5] [--strategy free --strategy straggler]
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from bench_playbooks import ROOT, write_inventory
+
+PLAYBOOKS = ('free_waiter.yml', 'serial.yml')
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=20)
+    parser.add_argument('--forks', type=int, default=5)
+    parser.add_argument('--strategy', dest='strategies', action='append',
+                        help='Strategies to compare (default: free and straggler)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_strategy')
+    inventory = os.path.join(workdir, 'hosts.ini')
+    write_inventory(inventory, args.hosts)
+    try:
+        for playbook in PLAYBOOKS:
+            for strategy in args.strategies or ['free', 'straggler']:
+                env = dict(os.environ, ANSIBLE_STRATEGY=strategy,
+                           ANSIBLE_STRATEGY_PLUGINS=os.path.join(ROOT, 'strategy_plugins'))
+                start = time.time()
+                with open(os.path.join(workdir, 'output.log'), 'wb') as log:
+                    rc = subprocess.call(['ansible-playbook', '-i', inventory, '-f', str(args.forks),
+                                          '-e', 'waiter_strategy={0}'.format(strategy),
+                                          os.path.join(ROOT, playbook)], stdout=log, stderr=subprocess.STDOUT, env=env)
+                print('{0:<16} {1:<10} {2:>8.1f}s  rc={3}'.format(playbook, strategy, time.time() - start, rc))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
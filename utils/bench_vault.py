@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# Runs playbooks over thousands of !vault vars under several vault ids on many hosts, like
+# multivault.yml at scale, with plain vault decryption and with vars_plugins/vault_cache.py
+# enabled.  In the 'referenced' case the tasks template --referenced of the vars, in the
+# 'unreferenced' case none of them.  Vault decryption is lazy, so vaulted vars no task uses
+# should cost the same with and without the cache; decrypting them ahead of time shows up as
+# vault_cache being slower in the unreferenced case.  Needs ansible importable, to encrypt the
+# vars, and ansible-playbook on the PATH.
+#
+#   python utils/bench_vault.py [--vars 2000] [--referenced 20] [--hosts 20] [--tasks 3] [--vault-ids 3]
+#                               [--forks 5]
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from ansible.parsing.vault import VaultLib, VaultSecret
+
+from bench_playbooks import ROOT, write_inventory
+
+PLAYBOOK = '''
+- hosts: all
+  gather_facts: false
+  vars_files:
+    - vaulted_vars.yml
+  tasks:
+{tasks}
+'''
+TASK = '''
+    - debug:
+        msg: "{template}"
+'''
+
+
+def write_vars(directory, count, vault_ids):
+    ''' writes the vaulted vars and a password file per vault id, returns the --vault-id arguments '''
+    args = []
+    secrets = []
+    for i in range(vault_ids):
+        path = os.path.join(directory, 'secret{0}'.format(i))
+        with open(path, 'w') as f:
+            f.write('secret{0}\n'.format(i))
+        args.append('--vault-id=bench{0}@{1}'.format(i, path))
+        secrets.append((u'bench{0}'.format(i), VaultSecret(u'secret{0}'.format(i).encode('utf-8'))))
+    vault = VaultLib(secrets)
+    with open(os.path.join(directory, 'vaulted_vars.yml'), 'w') as f:
+        for i in range(count):
+            vault_id, secret = secrets[i % vault_ids]
+            vaulttext = vault.encrypt(u'value {0}'.format(i), secret, vault_id=vault_id).decode('utf-8')
+            f.write('vaulted_{0}: !vault |\n  {1}\n'.format(i, vaulttext.replace('\n', '\n  ')))
+    return args
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--vars', type=int, default=2000, help='Vaulted vars defined')
+    parser.add_argument('--referenced', type=int, default=20, help='Vaulted vars the tasks template')
+    parser.add_argument('--hosts', type=int, default=20)
+    parser.add_argument('--tasks', type=int, default=3, help='Tasks templating every referenced var')
+    parser.add_argument('--vault-ids', type=int, default=3)
+    parser.add_argument('--forks', type=int, default=5)
+    args = parser.parse_args()
+    args.referenced = min(args.referenced, args.vars)
+
+    workdir = tempfile.mkdtemp(prefix='bench_vault')
+    try:
+        vault_args = write_vars(workdir, args.vars, args.vault_ids)
+        inventory = os.path.join(workdir, 'hosts.ini')
+        write_inventory(inventory, args.hosts)
+        # the referenced vars are spread over the vault ids like the rest
+        step = max(args.vars // max(args.referenced, 1), 1)
+        templates = (('referenced', u' '.join(u'{{{{ vaulted_{0} }}}}'.format(i * step)
+                                              for i in range(args.referenced))),
+                     ('unreferenced', u'no vaulted vars'))
+
+        failed = False
+        for case, template in templates:
+            playbook = os.path.join(workdir, '{0}.yml'.format(case))
+            with open(playbook, 'w') as f:
+                f.write(PLAYBOOK.format(tasks=''.join(TASK.format(template=template) for _ in range(args.tasks))))
+            uses = (args.referenced if case == 'referenced' else 0) * args.hosts * args.tasks
+            baseline = None
+            for name, enabled in (('plain', False), ('vault_cache', True)):
+                env = dict(os.environ, VAULT_CACHE_ENABLED=str(enabled),
+                           ANSIBLE_VARS_PLUGINS=os.path.join(ROOT, 'vars_plugins'))
+                start = time.time()
+                with open(os.devnull, 'wb') as devnull:
+                    rc = subprocess.call(['ansible-playbook', '-i', inventory, '-f', str(args.forks), playbook] +
+                                         vault_args, stdout=devnull, env=env)
+                elapsed = time.time() - start
+                failed = failed or rc != 0
+                baseline = baseline or elapsed
+                print('{0:<12} {1:<12} {2:>8.2f}s {3:>10,.0f} vaulted values/sec {4:>7.1f}x  rc={5}'.format(
+                    case, name, elapsed, uses / elapsed, baseline / elapsed, rc))
+    finally:
+        shutil.rmtree(workdir)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
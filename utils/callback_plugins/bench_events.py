@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    callback: bench_events
+    type: aggregate
+    short_description: counts tasks and results for utils/bench_playbooks.py
+    description:
+        - Counts the tasks started and the host and loop item results, and writes them as JSON to
+          the file named by C(BENCH_EVENTS_FILE) when the playbook ends, away from the output of
+          the stdout callback and of modules such as C(pause).
+        - Also writes the CPU time the controller process itself has used by then, which
+          utils/bench_playbooks.py tells apart from that of the workers.
+    requirements:
+        - whitelist in configuration, e.g. C(callback_whitelist = bench_events)
+'''
+
+import json
+import os
+import resource
+
+from ansible.plugins.callback import CallbackBase
+
+
+class CallbackModule(CallbackBase):
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'bench_events'
+    CALLBACK_NEEDS_WHITELIST = True
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.tasks = 0
+        self.events = 0
+
+    def _count(self, result):
+        items = result._result.get('results')
+        self.events += 1 + (len(items) if isinstance(items, list) else 0)
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self.tasks += 1
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.tasks += 1
+
+    def v2_runner_on_ok(self, result):
+        self._count(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._count(result)
+
+    def v2_runner_on_skipped(self, result):
+        self._count(result)
+
+    def v2_runner_on_unreachable(self, result):
+        self._count(result)
+
+    def v2_playbook_on_stats(self, stats):
+        with open(os.environ['BENCH_EVENTS_FILE'], 'w') as f:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            json.dump(dict(tasks=self.tasks, events=self.events, controller_cpu_user=usage.ru_utime,
+                           controller_cpu_sys=usage.ru_stime), f)
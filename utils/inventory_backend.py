@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# Shared backend for the dyn_inventory.py scripts.
+#
+# Each script calls run(__file__, render).  If an inventory server is listening on
+# DYN_INVENTORY_SOCKET the request is answered by it, otherwise render() runs in-process.
+# Start the server with:
+#
+#   python utils/inventory_backend.py --serve [--socket PATH] [--source SCRIPT ...]
+#
+# Only the standard library modules imported here are loaded on the client path.
+import os
+import socket
+import struct
+import sys
+
+ENV_PREFIX = 'DYN_INVENTORY_'
+FRAME = struct.Struct('>I')
+END_OF_REPLY = 0
+REPLY_ERROR = 0xFFFFFFFF
+CACHE_LIMIT = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+INVENTORIES = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'inventories')
+DEFAULT_SOURCES = [os.path.join(INVENTORIES, 'dyn_inventory.py'),
+                   os.path.join(INVENTORIES, 'more_inventories', 'dyn_inventory.py'),
+                   os.path.join(INVENTORIES, 'more_inventories', 'even_more_inventories', 'dyn_inventory.py')]
+
+
+def socket_path():
+    # tempfile.gettempdir() is not used because importing tempfile costs more than the reply.
+    default = os.path.join(os.environ.get('TMPDIR') or '/tmp', 'dyn_inventory-{}.sock'.format(os.getuid()))
+    return os.environ.get(ENV_PREFIX + 'SOCKET', default)
+
+
+def request_environ(environ):
+    return dict((k, v) for k, v in environ.items() if k.startswith(ENV_PREFIX) and k != ENV_PREFIX + 'SOCKET')
+
+
+def encode_request(source, argv, environ):
+    # NUL separated: source, argument count, arguments, then KEY=VALUE pairs.
+    fields = [source, str(len(argv))] + list(argv) + ['{}={}'.format(k, v) for k, v in sorted(environ.items())]
+    data = '\0'.join(fields).encode('utf-8')
+    return FRAME.pack(len(data)) + data
+
+
+def decode_request(data):
+    fields = data.decode('utf-8').split('\0')
+    argc = int(fields[1])
+    argv = fields[2:2 + argc]
+    environ = dict(field.split('=', 1) for field in fields[2 + argc:])
+    return fields[0], argv, environ
+
+
+def recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError('inventory server closed the connection')
+        data += chunk
+    return data
+
+
+def query_server(source, argv, out):
+    '''Returns True if the server answered, False if the caller should render in-process.'''
+    path = socket_path()
+    if not path:
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(path)
+        except socket.error:
+            return False
+        sock.sendall(encode_request(os.path.realpath(source), argv, request_environ(os.environ)))
+        written = False
+        while True:
+            length, = FRAME.unpack(recv_exact(sock, FRAME.size))
+            if length == END_OF_REPLY:
+                out.flush()
+                return True
+            if length == REPLY_ERROR:
+                if written:
+                    raise RuntimeError('inventory server failed part way through the reply')
+                return False
+            out.write(recv_exact(sock, length))
+            written = True
+    finally:
+        sock.close()
+
+
+def run(source, render):
+    '''Entry point for the dyn_inventory.py scripts.'''
+    out = getattr(sys.stdout, 'buffer', sys.stdout)
+    if not query_server(source, sys.argv[1:], out):
+        render(sys.argv[1:], os.environ, sys.stdout)
+
+
+def load_source(name, path):
+    try:
+        from importlib.util import spec_from_file_location, module_from_spec
+    except ImportError:
+        import imp
+        return imp.load_source(name, path)
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ReplyWriter(object):
+    '''Text stream handed to render(); keeps small replies for the cache and streams large ones.'''
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.buffered = []
+        self.size = 0
+        self.streaming = False
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.buffered.append(data)
+        self.size += len(data)
+        if self.size > (CHUNK_SIZE if self.streaming else CACHE_LIMIT):
+            self.send_buffered()
+            self.streaming = True
+
+    def flush(self):
+        pass
+
+    def send_buffered(self):
+        data = b''.join(self.buffered)
+        for start in range(0, len(data), CHUNK_SIZE):
+            chunk = data[start:start + CHUNK_SIZE]
+            self.conn.sendall(FRAME.pack(len(chunk)) + chunk)
+        self.buffered = []
+        self.size = 0
+
+
+class InventoryServer(object):
+
+    def __init__(self, path, sources):
+        self.path = path
+        self.sources = dict((os.path.realpath(source), None) for source in sources)
+        self.replies = {}
+        self.loads = 0
+
+    def load(self, source):
+        mtime = os.stat(source).st_mtime
+        loaded = self.sources[source]
+        if loaded is None or loaded[0] != mtime:
+            self.loads += 1
+            module = load_source('dyn_inventory_{}'.format(self.loads), source)
+            loaded = self.sources[source] = (mtime, module.render)
+            self.replies = dict((k, v) for k, v in self.replies.items() if k[0] != source)
+        return loaded[1]
+
+    def handle(self, conn):
+        import io
+        length, = FRAME.unpack(recv_exact(conn, FRAME.size))
+        source, argv, environ = decode_request(recv_exact(conn, length))
+        if source not in self.sources:
+            conn.sendall(FRAME.pack(REPLY_ERROR))
+            return
+
+        key = (source, tuple(argv), tuple(sorted(environ.items())))
+        reply = self.replies.get(key)
+        if reply is None:
+            # Usage errors are left for the client to reproduce when it renders in-process.
+            writer = ReplyWriter(conn)
+            stderr, sys.stderr = sys.stderr, io.StringIO()
+            try:
+                self.load(source)(argv, environ, writer)
+            except (Exception, SystemExit):
+                conn.sendall(FRAME.pack(REPLY_ERROR))
+                return
+            finally:
+                sys.stderr = stderr
+            if writer.streaming:
+                writer.send_buffered()
+            else:
+                reply = self.replies[key] = b''.join(writer.buffered)
+        if reply is not None:
+            for start in range(0, len(reply), CHUNK_SIZE):
+                chunk = reply[start:start + CHUNK_SIZE]
+                conn.sendall(FRAME.pack(len(chunk)) + chunk)
+        conn.sendall(FRAME.pack(END_OF_REPLY))
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen(128)
+        try:
+            while True:
+                conn, _ = server.accept()
+                try:
+                    self.handle(conn)
+                except (socket.error, EOFError, ValueError, IndexError) as e:
+                    sys.stderr.write('inventory server: {}\n'.format(e))
+                finally:
+                    conn.close()
+        finally:
+            server.close()
+            os.unlink(self.path)
+
+
+def parse_args():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument('--serve', action='store_true', help='Answer dyn_inventory.py requests on a unix socket')
+    parser.add_argument('--socket', default=socket_path(),
+                        help='Socket path (env: DYN_INVENTORY_SOCKET, default: %(default)s)')
+    parser.add_argument('--source', dest='sources', action='append',
+                        help='Inventory script the server may answer for (default: the dyn_inventory.py scripts)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if not args.serve:
+        sys.exit('nothing to do, pass --serve')
+    import signal
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        InventoryServer(args.socket, args.sources or DEFAULT_SOURCES).serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# Stand-in for the parts of the Tower API used to launch and wait on jobs, so the
+# tower_job_launch_many module and lookup can run offline.  Launched jobs queue for one of
+# --capacity slots and then run for about --job-seconds, like jobs on a Tower instance with
+# that many forks of capacity.  Keeps connections alive (HTTP/1.1).
+#
+#   python utils/mock_tower.py [--port 8013] [--capacity 10] [--job-seconds 1.0]
+#                              [--job-template NAME ...] [--failure-rate 0.0] [--seed 0] [--lifetime 0]
+#
+# GET /api/v2/mock/stats/ returns the requests and connections it served.
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import base64
+import heapq
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+
+PAGE_SIZE = 200
+
+
+def timestamp(seconds):
+    if seconds is None:
+        return None
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds)) + '.{0:06d}Z'.format(int(seconds % 1 * 1e6))
+
+
+class Tower(object):
+
+    def __init__(self, templates, capacity, job_seconds, dispatch_seconds, failure_rate, seed):
+        self.templates = dict((i + 7, name) for i, name in enumerate(templates))
+        self.job_seconds = job_seconds
+        self.dispatch_seconds = dispatch_seconds
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.slots = [0.0] * capacity
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def launch(self, template_id, extra_vars):
+        now = time.time()
+        with self.lock:
+            job_id = len(self.jobs) + 1
+            started = max(now + self.dispatch_seconds, heapq.heappop(self.slots))
+            finished = started + self.rng.uniform(0.5, 1.5) * self.job_seconds
+            heapq.heappush(self.slots, finished)
+            self.jobs[job_id] = dict(id=job_id, type='job', name=self.templates[template_id],
+                                     job_template=template_id, extra_vars=json.dumps(extra_vars or {}),
+                                     created=now, started=started, finished=finished,
+                                     failed=self.rng.random() < self.failure_rate)
+        return self.job(job_id, now)
+
+    def job(self, job_id, now=None):
+        job = dict(self.jobs[job_id])
+        now = now or time.time()
+        if now < job['started']:
+            job.update(status='waiting' if now >= job['started'] - self.dispatch_seconds else 'pending',
+                       started=None, finished=None)
+        elif now < job['finished']:
+            job.update(status='running', finished=None)
+        else:
+            job['status'] = 'failed' if job['failed'] else 'successful'
+        if job['status'] not in ('successful', 'failed'):
+            job['failed'] = False
+        job['elapsed'] = round((job['finished'] or now) - job['started'], 3) if job['started'] else 0
+        for key in ('created', 'started', 'finished'):
+            job[key] = timestamp(job[key])
+        return job
+
+
+def page(results, query):
+    page_size = min(int(query.get('page_size', [25])[0]), PAGE_SIZE)
+    number = int(query.get('page', [1])[0])
+    return dict(count=len(results), previous=None, next=None,
+                results=results[(number - 1) * page_size:number * page_size])
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.tower.lock:
+            self.server.tower.connections += 1
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self):
+        if not self.server.credentials:
+            return True
+        header = self.headers.get('Authorization', '')
+        return header == 'Basic ' + base64.b64encode(self.server.credentials.encode('utf-8')).decode('ascii')
+
+    def route(self, method):
+        tower = self.server.tower
+        with tower.lock:
+            tower.requests += 1
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length).decode('utf-8') or '{}') if length else {}
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if not self.authorized():
+            return self.reply(401, {'detail': 'Authentication credentials were not provided.'})
+
+        if method == 'GET' and url.path == '/api/v2/ping/':
+            return self.reply(200, {'version': 'mock', 'ha': False, 'active_node': 'localhost'})
+        if method == 'GET' and url.path == '/api/v2/mock/stats/':
+            return self.reply(200, {'requests': tower.requests, 'connections': tower.connections,
+                                    'jobs': len(tower.jobs)})
+        if method == 'GET' and url.path == '/api/v2/job_templates/':
+            names = query.get('name')
+            return self.reply(200, page([dict(id=i, type='job_template', name=name)
+                                         for i, name in sorted(tower.templates.items())
+                                         if not names or name in names], query))
+        match = re.match(r'^/api/v2/job_templates/(\d+)/launch/$', url.path)
+        if method == 'POST' and match:
+            if int(match.group(1)) not in tower.templates:
+                return self.reply(404, {'detail': 'Not found.'})
+            job = tower.launch(int(match.group(1)), body.get('extra_vars'))
+            job['job'] = job['id']
+            return self.reply(201, job)
+        if method == 'GET' and url.path == '/api/v2/jobs/':
+            ids = [int(i) for i in ','.join(query.get('id__in', [])).split(',') if i]
+            ids = [i for i in ids if i in tower.jobs] if ids else sorted(tower.jobs)
+            now = time.time()
+            return self.reply(200, page([tower.job(i, now) for i in sorted(ids)], query))
+        match = re.match(r'^/api/v2/jobs/(\d+)/$', url.path)
+        if method == 'GET' and match and int(match.group(1)) in tower.jobs:
+            return self.reply(200, tower.job(int(match.group(1))))
+        return self.reply(404, {'detail': 'Not found.'})
+
+    def do_GET(self):
+        self.route('GET')
+
+    def do_POST(self):
+        self.route('POST')
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8013)
+    parser.add_argument('--capacity', type=int, default=10, help='Jobs running at once (default: %(default)s)')
+    parser.add_argument('--job-seconds', type=float, default=1.0,
+                        help='Mean run time of a job, drawn from 0.5 to 1.5 times it (default: %(default)s)')
+    parser.add_argument('--dispatch-seconds', type=float, default=0.05,
+                        help='Least time between launch and start (default: %(default)s)')
+    parser.add_argument('--job-template', action='append', dest='templates',
+                        help='Name of a job template, ids start at 7 (default: Demo Job Template)')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--username', help='Require basic auth with this user and --password')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--lifetime', type=float, default=0,
+                        help='Exit after this many seconds, 0 serves forever (default: %(default)s)')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = Server((args.host, args.port), Handler)
+    server.tower = Tower(args.templates or ['Demo Job Template'], args.capacity, args.job_seconds,
+                         args.dispatch_seconds, args.failure_rate, args.seed)
+    server.credentials = '{0}:{1}'.format(args.username, args.password) if args.username else None
+    server.verbose = args.verbose
+    print('mock Tower listening on http://{0}:{1}'.format(*server.server_address))
+    sys.stdout.flush()
+    if args.lifetime:
+        timer = threading.Timer(args.lifetime, server.shutdown)
+        timer.daemon = True
+        timer.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+# Syntax checks every playbook, task file and role and parses every inventory source in the
+# repo.  Checks that share a plugin context run one after another in a process forked from
+# one that has ansible imported already, several such batches at a time.  A result is reused
+# while the file, the files it references, the plugins and ansible.cfg are unchanged.
+# Deliberately broken files must fail.  The tower_modules need the awx.awx collection, and on
+# ansible 2.10 and later the cloud_modules need the amazon.aws, azure.azcollection, google.cloud,
+# openstack.cloud, ovirt.ovirt and community.vmware collections (or the ansible package).  Files
+# using a module of those that is not installed, or a keyword this ansible has removed, are
+# reported as skipped with what they need, so the exit status does not depend on what happens
+# to be installed.  Any other module that cannot be resolved is a failure.  Prints the time each file took and the slowest ones
+# at the end.
+#
+#   python utils/syntax_check.py [-j 8] [--timeout 300] [--slowest 10] [--no-cache] [path ...]
+from __future__ import print_function
+
+from argparse import ArgumentParser
+from collections import OrderedDict, namedtuple
+import itertools
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_playbooks import ROOT
+
+ROOT = os.path.realpath(ROOT)
+os.environ['ANSIBLE_CONFIG'] = os.path.join(ROOT, 'ansible.cfg')
+os.environ['ANSIBLE_INVENTORY_UNPARSED_FAILED'] = 'True'
+os.environ['ANSIBLE_RETRY_FILES_ENABLED'] = 'False'
+
+from ansible import __version__ as ansible_version  # noqa: E402
+from ansible.cli.playbook import PlaybookCLI  # noqa: E402
+from ansible.errors import AnsibleError  # noqa: E402
+from ansible.inventory.manager import InventoryManager  # noqa: E402
+from ansible.module_utils._text import to_bytes, to_native  # noqa: E402
+from ansible.module_utils.six import string_types  # noqa: E402
+from ansible.module_utils.six.moves import queue  # noqa: E402
+from ansible.parsing.dataloader import DataLoader  # noqa: E402
+from ansible.plugins.loader import add_all_plugin_dirs  # noqa: E402
+from ansible.utils.context_objects import GlobalCLIArgs  # noqa: E402
+
+CACHE_VERSION = 2
+DEFAULT_CACHE = os.path.expanduser('~/.ansible/tmp/syntax_check_cache.json')
+
+EXPECTED_FAILURES = {
+    'valid_yaml_invalid_ansible.yml': 'valid YAML, but not a valid play',
+    'inventories/invalid_inventory.ini': 'not a valid ini inventory',
+    'inventories/invalid_dyn_inventory.py': 'prints a python dict instead of JSON',
+    'inventories/user_plugins/fox.yaml': 'the fox plugin raises on purpose',
+}
+# the optional collections named above, by collection and by the short names of their modules
+OPTIONAL_MODULES = re.compile(r'^(?:(?:awx\.awx|ansible\.tower|amazon\.aws|community\.aws|azure\.azcollection|'
+                              r'google\.cloud|openstack\.cloud|ovirt\.ovirt|community\.vmware)\.\w+|'
+                              r'(?:tower|ec2|azure_rm|gcp|os|ovirt|vmware)_\w+)$')
+# failures that say the tree needs something this ansible does not have, what that is, and
+# which names it may be about
+UNAVAILABLE = (
+    (re.compile(r"couldn't resolve module/action '([^']+)'"), 'needs module {0}, not installed', OPTIONAL_MODULES),
+    (re.compile(r"'(include)' is not a valid attribute for a Play"), 'play level {0}, removed in this ansible', None),
+)
+SKIPPED = {
+    'inventories/aws_ec2.yml': 'needs AWS credentials',
+    'inventories/azure_rm.yml': 'needs Azure credentials',
+    'inventories/gcp_compute.yml': 'needs GCP credentials',
+    'inventories/linode.yml': 'needs a Linode token',
+    'inventories/openstack.yml': 'needs OpenStack credentials',
+    'inventories/vmware.yml': 'needs a vCenter',
+    'inventories/user_plugins/herd.yaml': 'generates 10000 hosts and writes its cache to /tmp, see utils/bench_herd.py',
+}
+# never searched for playbooks; vars, files and plugins are hashed where they are used instead
+SKIP_DIRS = ('.git', 'group_vars', 'host_vars', 'vars', 'files', 'templates', 'inventory_plugins', '__pycache__')
+PLAY_KEYS = frozenset(['hosts', 'import_playbook', 'include'])
+PATH_LIKE = re.compile(r'^[^\n:]+\.(?:ya?ml|j2|json|ini|cfg)$')
+TEMPLATED = re.compile(r'{{.*?}}|{%.*?%}')
+
+Check = namedtuple('Check', 'kind path context')
+
+loader = DataLoader()
+parsed = {}
+
+
+def load(path):
+    if path not in parsed:
+        try:
+            parsed[path] = loader.load_from_file(path)
+        except AnsibleError:
+            parsed[path] = None
+    return parsed[path]
+
+
+def yaml_kind(path):
+    data = load(path)
+    if not isinstance(data, list) or not data or not all(isinstance(item, dict) for item in data):
+        return None
+    if all(PLAY_KEYS & set(item) for item in data):
+        return 'playbook'
+    return 'tasks'
+
+
+def is_inventory_source(path):
+    name = os.path.basename(path)
+    if name.endswith(('.ini', '.yml', '.yaml')):
+        return True
+    return name.endswith('.py') and os.access(path, os.X_OK)
+
+
+def discover():
+    checks = []
+    playbook_dirs = set()
+    for dirpath, dirnames, filenames in os.walk(ROOT):
+        relative = os.path.relpath(dirpath, ROOT)
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.'))
+        if relative == 'roles':
+            checks.extend(Check('role', os.path.join(relative, d), '.') for d in dirnames)
+            dirnames[:] = []
+            continue
+        for name in sorted(filenames):
+            path = os.path.normpath(os.path.join(relative, name))
+            if path.split(os.sep)[0] == 'inventories':
+                if is_inventory_source(os.path.join(ROOT, path)):
+                    checks.append(Check('inventory', path, os.path.dirname(path)))
+            elif name.endswith(('.yml', '.yaml')):
+                kind = yaml_kind(os.path.join(ROOT, path))
+                if kind == 'playbook':
+                    playbook_dirs.add(os.path.dirname(path))
+                if kind:
+                    checks.append(Check(kind, path, os.path.dirname(path)))
+
+    def context(path):
+        # a task file runs with the plugins and collections of the nearest playbook above it
+        directory = os.path.dirname(path)
+        while directory and directory not in playbook_dirs:
+            directory = os.path.dirname(directory)
+        return directory
+    return [check._replace(context=context(check.path)) if check.kind == 'tasks' else check for check in checks]
+
+
+def scalars(data):
+    if isinstance(data, dict):
+        for value in data.values():
+            for scalar in scalars(value):
+                yield scalar
+    elif isinstance(data, list):
+        for value in data:
+            for scalar in scalars(value):
+                yield scalar
+    elif isinstance(data, string_types):
+        yield data
+
+
+def tree_files(path):
+    if os.path.isfile(path):
+        return [path]
+    return [os.path.join(dirpath, name) for dirpath, dirnames, filenames in os.walk(path)
+            if '__pycache__' not in dirpath for name in filenames]
+
+
+def references(path, search_dirs, roles, found):
+    '''
+    Adds to found every existing file a YAML file names, directly or through the files it
+    names, and every file of the roles it names. A templated part of a name matches anything.
+    '''
+    for value in scalars(load(path)):
+        if value in roles and roles[value] not in found:
+            found.update(tree_files(roles[value]))
+            found.add(roles[value])
+        if not PATH_LIKE.match(value):
+            continue
+        pattern = TEMPLATED.sub('*', value)
+        for base in search_dirs:
+            for match in glob.glob(os.path.join(base, pattern)):
+                match = os.path.realpath(match)
+                if os.path.isfile(match) and match not in found:
+                    found.add(match)
+                    if match.endswith(('.yml', '.yaml')):
+                        references(match, search_dirs, roles, found)
+
+
+def check_files(check, roles):
+    path = os.path.join(ROOT, check.path)
+    if check.kind == 'role':
+        return set(tree_files(path))
+    if check.kind == 'inventory':
+        directory = os.path.dirname(path)
+        found = set([path])
+        for name in ('group_vars', 'host_vars', 'inventory_plugins'):
+            found.update(tree_files(os.path.join(directory, name)))
+        if path.endswith('.py'):
+            found.update(glob.glob(os.path.join(directory, '*.py')))
+        return found
+    found = set([path])
+    references(path, [os.path.dirname(path), os.path.join(ROOT, check.context), ROOT], roles, found)
+    return found
+
+
+def global_digest():
+    ''' what every result depends on: ansible, this script, ansible.cfg and the repo's plugins '''
+    digest = hashlib.sha256(to_bytes(u'{0}\0{1}\0'.format(ansible_version, sys.version)))
+    paths = [os.path.realpath(__file__), os.path.join(ROOT, 'ansible.cfg')]
+    for dirpath, dirnames, filenames in os.walk(ROOT):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.') and d != '__pycache__')
+        name = os.path.basename(dirpath)
+        if name in ('library', 'module_utils') or name.endswith('_plugins'):
+            paths.extend(os.path.join(dirpath, filename) for filename in filenames)
+    update_digest(digest, paths)
+    return digest.hexdigest()
+
+
+def update_digest(digest, paths):
+    for path in sorted(paths):
+        digest.update(to_bytes(os.path.relpath(path, ROOT)) + b'\0')
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+
+
+def cache_key(check, roles, base):
+    digest = hashlib.sha256(to_bytes(u'{0}\0{1}\0{2}\0'.format(base, check.kind, check.path)))
+    update_digest(digest, check_files(check, roles))
+    return digest.hexdigest()
+
+
+def write_wrapper(check, workdir):
+    ''' a playbook that imports a task file or role, so ansible-playbook --syntax-check loads it '''
+    play = dict(hosts='localhost', gather_facts=False)
+    if check.kind == 'role':
+        play['roles'] = [os.path.join(ROOT, check.path)]
+    else:
+        play['tasks'] = [{'import_tasks': os.path.join(ROOT, check.path)}]
+        collections = set()
+        for playbook in glob.glob(os.path.join(ROOT, check.context, '*.yml')):
+            for item in load(playbook) if isinstance(load(playbook), list) else []:
+                if isinstance(item, dict):
+                    collections.update(c for c in item.get('collections') or [] if not TEMPLATED.search(c))
+        if collections:
+            play['collections'] = sorted(collections)
+    path = os.path.join(workdir, hashlib.sha1(to_bytes(check.path)).hexdigest() + '.yml')
+    with open(path, 'w') as f:
+        json.dump([play], f)
+    return path
+
+
+def log_path(workdir, check):
+    return os.path.join(workdir, hashlib.sha1(to_bytes(check.path)).hexdigest() + '.log')
+
+
+def run_check(check, target):
+    ''' returns the exit code, parsing inventories without listing every host's variables '''
+    if check.kind != 'inventory':
+        # the CLI arguments are a singleton, which would keep the first check's playbook
+        GlobalCLIArgs._Singleton__instance = None
+        return PlaybookCLI(['ansible-playbook', '--syntax-check', '-i', 'localhost,', target]).run()
+    loader = DataLoader()
+    InventoryManager(loader=loader, sources=[target])
+    for name in ('group_vars', 'host_vars'):
+        for path in tree_files(os.path.join(os.path.dirname(target), name)):
+            loader.load_from_file(path)
+    return 0
+
+
+def run_batch(batch_id, checks, targets, workdir, results):
+    ''' runs in a forked process, the checks one after another, each with stdout and stderr going to its log '''
+    add_all_plugin_dirs(os.path.join(ROOT, checks[0].context))
+    for check in checks:
+        fd = os.open(log_path(workdir, check), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+        os.close(fd)
+        results.put((batch_id, check, None))
+        start = time.time()
+        error = None
+        try:
+            rc = run_check(check, targets[check])
+        except SystemExit as e:
+            rc = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            rc, error = 1, u'{0}: {1}'.format(type(e).__name__, to_native(e))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        results.put((batch_id, check, dict(rc=rc or 0, error=error, seconds=round(time.time() - start, 3))))
+
+
+def run_all(batches, targets, jobs, timeout, workdir):
+    '''
+    yields (check, result) as the checks finish, at most jobs batches running at once. A check
+    that times out or takes its process down is reported, and the rest of its batch goes on
+    in a new process.
+    '''
+    results = multiprocessing.Queue()
+    pending = list(batches)
+    running = {}
+    ids = itertools.count()
+    while pending or running:
+        while pending and len(running) < jobs:
+            batch, batch_id = pending.pop(0), next(ids)
+            process = multiprocessing.Process(target=run_batch, args=(batch_id, batch, targets, workdir, results))
+            process.start()
+            running[batch_id] = dict(process=process, remaining=list(batch), started=time.time())
+        try:
+            batch_id, check, result = results.get(timeout=0.05)
+        except queue.Empty:
+            for batch_id, batch in list(running.items()):
+                process, remaining = batch['process'], batch['remaining']
+                if process.is_alive() and time.time() - batch['started'] > timeout:
+                    process.terminate()
+                    result = dict(rc=-1, error='timed out after {0}s'.format(timeout), seconds=timeout)
+                elif not process.is_alive() and process.exitcode:
+                    result = dict(rc=process.exitcode, error='exited with {0}'.format(process.exitcode),
+                                  seconds=round(time.time() - batch['started'], 3))
+                else:
+                    continue
+                process.join()
+                del running[batch_id]
+                if remaining:
+                    yield remaining[0], dict(result, output=tail(log_path(workdir, remaining[0])))
+                    if remaining[1:]:
+                        pending.insert(0, remaining[1:])
+            continue
+        batch = running[batch_id]
+        batch['started'] = time.time()
+        if result is None:
+            continue
+        batch['remaining'].remove(check)
+        if not batch['remaining']:
+            batch['process'].join()
+            del running[batch_id]
+        yield check, dict(result, output=tail(log_path(workdir, check)))
+
+
+def make_batches(checks, jobs, seconds):
+    '''
+    groups the checks by the plugin context they run in, split so that there are about jobs
+    batches, longest first by the time their checks took last run
+    '''
+    groups = OrderedDict()
+    for check in checks:
+        groups.setdefault((check.kind == 'inventory', check.context), []).append(check)
+    batches = []
+    for group in groups.values():
+        group.sort(key=lambda check: -seconds(check))
+        count = max(1, min(len(group), int(round(jobs * len(group) / float(len(checks))))))
+        batches.extend(group[i::count] for i in range(count))
+    return sorted(batches, key=lambda batch: -sum(seconds(check) for check in batch))
+
+
+def tail(path, lines=15):
+    try:
+        with open(path, 'rb') as f:
+            text = to_native(f.read(), errors='surrogate_or_replace')
+    except EnvironmentError:
+        return []
+    # the inventory listing is not interesting, warnings and errors are
+    return [line for line in text.splitlines() if line.strip() and not line.startswith((' ', '{', '}'))][-lines:]
+
+
+def unavailable(result):
+    ''' returns what a failed check needs that this ansible does not have, if that is why it failed '''
+    if result['rc'] in (0, -1) and not result.get('error'):
+        return None
+    text = u'\n'.join([result.get('error') or u''] + result.get('output', []))
+    for pattern, reason, names in UNAVAILABLE:
+        match = pattern.search(text)
+        if match and (names is None or names.match(match.group(1))):
+            return reason.format(*match.groups())
+    return None
+
+
+def status(check, result):
+    ''' returns the status and whether it is what is expected '''
+    failed = result['rc'] != 0 or result.get('error')
+    if check.path in EXPECTED_FAILURES:
+        return ('expected fail', True) if failed else ('UNEXPECTED PASS', False)
+    if result['rc'] == -1:
+        return 'TIMEOUT', False
+    if failed and unavailable(result):
+        return 'skipped', True
+    return ('FAILED', False) if failed else ('ok', True)
+
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (EnvironmentError, ValueError):
+        return {}
+    return data.get('results', {}) if data.get('version') == CACHE_VERSION else {}
+
+
+def save_cache(path, results):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.syntax_check_cache')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(dict(version=CACHE_VERSION, results=results), f)
+    os.rename(tmp_path, path)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('paths', nargs='*', help='Only check these files (default: everything)')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--timeout', type=int, default=300, help='Seconds per file (default: %(default)s)')
+    parser.add_argument('--slowest', type=int, default=10, help='Slowest files listed at the end (default: %(default)s)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='Results cache (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help='Check everything, and do not update the cache')
+    args = parser.parse_args()
+
+    start = time.time()
+    checks = discover()
+    if args.paths:
+        wanted = set(os.path.relpath(os.path.realpath(path), ROOT) for path in args.paths)
+        checks = [check for check in checks if check.path in wanted]
+    roles = dict((os.path.basename(check.path), os.path.join(ROOT, check.path)) for check in checks
+                 if check.kind == 'role')
+    base = global_digest()
+    cache = {} if args.no_cache else load_cache(args.cache)
+
+    reported = []
+    to_run = []
+    for check in checks:
+        if check.path in SKIPPED:
+            print('{0:<15} {1:>8} {2:<9} {3}  ({4})'.format('skipped', '', check.kind, check.path, SKIPPED[check.path]))
+            continue
+        key = cache_key(check, roles, base)
+        cached = cache.get(check.path)
+        if cached and cached['key'] == key:
+            reported.append((check, cached, True))
+        else:
+            to_run.append((check, key))
+
+    workdir = tempfile.mkdtemp(prefix='syntax_check')
+    unexpected = 0
+    try:
+        def report(check, result, cached):
+            name, expected = status(check, result)
+            notes = (['cached'] if cached else []) + ([unavailable(result)] if name == 'skipped' else [])
+            print('{0:<15} {1:>7.2f}s {2:<9} {3}{4}'.format(name, result['seconds'], check.kind, check.path,
+                                                          '  ({0})'.format(', '.join(notes)) if notes else ''))
+            if not expected:
+                for line in ([result['error']] if result.get('error') else []) + result.get('output', []):
+                    print('    ' + line)
+            sys.stdout.flush()
+            return 0 if expected else 1
+
+        for check, result, cached in reported:
+            unexpected += report(check, result, True)
+        keys = dict(to_run)
+        targets = dict((check, write_wrapper(check, workdir) if check.kind in ('tasks', 'role')
+                        else os.path.join(ROOT, check.path)) for check, key in to_run)
+        # longest first, by the time they took last run, so no slow batch starts last
+        batches = make_batches([check for check, key in to_run], max(1, args.jobs),
+                               lambda check: cache.get(check.path, {}).get('seconds', 0))
+        for check, result in run_all(batches, targets, max(1, args.jobs), args.timeout, workdir):
+            unexpected += report(check, result, False)
+            reported.append((check, result, False))
+            # installed modules and collections are not part of the key, check these again next run
+            if result['rc'] != -1 and not unavailable(result):
+                cache[check.path] = dict(result, key=keys[check])
+    finally:
+        shutil.rmtree(workdir)
+        if not args.no_cache:
+            save_cache(args.cache, cache)
+
+    ran = [result['seconds'] for check, result, cached in reported if not cached]
+    unavailable_count = sum(1 for check, result, cached in reported if status(check, result)[0] == 'skipped')
+    print('\n{0} files, {1} checked in {2:.2f}s ({3:.2f}s of checks), {4} cached, {5} skipped, {6} needing what is '
+          'not installed, {7} unexpected'.format(len(checks), len(ran), time.time() - start, sum(ran),
+                                                 len(reported) - len(ran), len(checks) - len(reported),
+                                                 unavailable_count, unexpected))
+    if args.slowest:
+        print('slowest:')
+        for check, result, cached in sorted(reported, key=lambda item: -item[1]['seconds'])[:args.slowest]:
+            print('  {0:>7.2f}s {1}'.format(result['seconds'], check.path))
+    sys.exit(1 if unexpected else 0)
+
+
+if __name__ == '__main__':
+    main()
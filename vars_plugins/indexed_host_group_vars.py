@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    vars: indexed_host_group_vars
+    short_description: host_vars and group_vars served from a precompiled, memory mapped index
+    description:
+        - Replacement for the builtin host_group_vars plugin that loads the same files in the same
+          order. It does nothing unless enabled.
+        - With ansible 2.10 and later, enable it in place of the builtin with
+          C(vars_plugins_enabled = indexed_host_group_vars).
+        - Older ansible runs every vars plugin it finds and cannot turn the builtin off. There it is
+          enabled by setting C(INDEXED_HOST_GROUP_VARS=true) in the environment, which also empties
+          the builtin plugin so the files are not read twice.
+        - The first run over a host_vars or group_vars directory parses every file in it and writes
+          one index file with an entry per host or group name, holding the parsed variables and the
+          mtime and size of each file they came from. Later runs memory map that index and only
+          decode the entries of the hosts and groups they ask about, with no directory walk and no
+          YAML parsing.
+        - The index is rebuilt when the directory itself changed (files added, removed or renamed)
+          or when a file behind a requested entry has a different mtime or size. Entries whose files
+          are unchanged are copied from the previous index, only the rest are parsed again.
+        - Whole-file vaulted files, and files with values JSON cannot hold as they are, are listed
+          in the index but parsed as usual, so no plaintext is written to disk.
+        - C(INDEXED_HOST_GROUP_VARS_DIR) sets where index files are kept (default
+          C(~/.ansible/tmp/host_group_vars_index)). An empty value loads everything as the builtin
+          plugin does.
+'''
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from ansible import constants as C
+from ansible.errors import AnsibleParserError
+from ansible.inventory.group import Group
+from ansible.inventory.host import Host
+from ansible.module_utils._text import to_bytes, to_native, to_text
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils.six import integer_types, string_types
+from ansible.parsing.yaml.objects import AnsibleVaultEncryptedUnicode
+from ansible.plugins.vars import BaseVarsPlugin, host_group_vars
+from ansible.utils.vars import combine_vars
+
+# Layout: header | hash table of (name hash, offset, length) slots | entries of name\0json
+INDEX_MAGIC = b'HGVIDX01'
+INDEX_HEADER = struct.Struct('<8s32sQQ')
+INDEX_SLOT = struct.Struct('<QQQ')
+
+FOUND = {}
+INDEXES = {}
+
+# ansible 2.10 and later only run vars plugins listed in vars_plugins_enabled
+SELECTABLE = hasattr(C, 'VARIABLE_PLUGINS_ENABLED')
+ENABLED = SELECTABLE or boolean(os.environ.get('INDEXED_HOST_GROUP_VARS', False), strict=False)
+
+
+def index_dir():
+    return os.path.expanduser(os.environ.get('INDEXED_HOST_GROUP_VARS_DIR', '~/.ansible/tmp/host_group_vars_index'))
+
+
+def name_hash(name):
+    # Zero marks an empty slot, so real keys are forced non-zero.
+    return struct.unpack('<Q', hashlib.sha1(to_bytes(name)).digest()[:8])[0] or 1
+
+
+def mtime_ns(st):
+    return getattr(st, 'st_mtime_ns', None) or int(st.st_mtime * 1e9)
+
+
+def directory_digest(opath):
+    st = os.stat(opath)
+    stamp = u'{0}\0{1}\0{2}\0{3}'.format(opath, mtime_ns(st), st.st_size, u','.join(C.YAML_FILENAME_EXTENSIONS))
+    return hashlib.sha256(INDEX_MAGIC + to_bytes(stamp)).digest()
+
+
+def portable(value):
+    ''' whether value survives a JSON round trip unchanged '''
+    if isinstance(value, (AnsibleVaultEncryptedUnicode, string_types, float, bool, type(None)) + integer_types):
+        return True
+    if isinstance(value, dict):
+        return all(isinstance(k, string_types) and portable(v) for k, v in value.items())
+    if isinstance(value, list):
+        return all(portable(v) for v in value)
+    return False
+
+
+def encode(value):
+    if isinstance(value, AnsibleVaultEncryptedUnicode):
+        return {'__ansible_vault': to_text(value._ciphertext)}
+    raise TypeError('{0!r} is not JSON serializable'.format(value))
+
+
+class VarsIndex(object):
+
+    def __init__(self, opath, data):
+        self.opath = opath
+        self.data = data
+        self.slot_count = INDEX_HEADER.unpack_from(data)[3]
+        self.decoded = {}
+
+    @classmethod
+    def open(cls, opath, path, digest=None):
+        ''' maps the index at path, None if there is none or it is not for digest '''
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < INDEX_HEADER.size:
+                return None
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_digest = INDEX_HEADER.unpack_from(data)[:2]
+        if magic != INDEX_MAGIC or digest is not None and index_digest != digest:
+            data.close()
+            return None
+        return cls(opath, data)
+
+    @staticmethod
+    def candidate_names(opath):
+        names = set()
+        for entry in os.listdir(opath):
+            names.add(entry)
+            base, ext = os.path.splitext(entry)
+            if ext in C.YAML_FILENAME_EXTENSIONS:
+                names.add(base)
+        return names
+
+    @classmethod
+    def build(cls, loader, opath, path, digest, previous=None):
+        entries = []
+        parsed = {}
+        for name in sorted(cls.candidate_names(opath)):
+            found = loader.find_vars_files(opath, name)
+            if not found:
+                continue
+            files = []
+            for b_found in found:
+                st = os.stat(b_found)
+                files.append([to_text(b_found), mtime_ns(st), st.st_size])
+            dirs = []
+            b_name_path = to_bytes(os.path.join(opath, name))
+            if os.path.isdir(b_name_path):
+                for b_root, b_dirs, b_files in os.walk(b_name_path):
+                    dirs.append([to_text(b_root), mtime_ns(os.stat(b_root))])
+            blob = previous and previous.blob(name)
+            if blob:
+                old = json.loads(to_text(blob[len(to_bytes(name)) + 1:]))
+                if old['files'] == files and old['dirs'] == dirs:
+                    entries.append((blob, name_hash(name)))
+                    continue
+            values = []
+            for b_found in found:
+                # a file is found both as name.yml and as name, parse it once
+                if b_found not in parsed:
+                    with open(b_found, 'rb') as f:
+                        b_data = f.read()
+                    if b_data.startswith(b'$ANSIBLE_VAULT'):
+                        parsed[b_found] = None
+                    else:
+                        new_data = loader.load(to_text(b_data), file_name=to_text(b_found), show_content=True)
+                        parsed[b_found] = new_data if portable(new_data) else None
+                if parsed[b_found] is None:
+                    values = None
+                    break
+                values.append(parsed[b_found])
+            blob = to_bytes(name) + b'\0' + to_bytes(json.dumps(dict(files=files, dirs=dirs, vars=values),
+                                                                default=encode, separators=(',', ':')))
+            entries.append((blob, name_hash(name)))
+
+        slot_count = max(8, len(entries) * 2)
+        offset = INDEX_HEADER.size + slot_count * INDEX_SLOT.size
+        slots = [(0, 0, 0)] * slot_count
+        for blob, hashed in entries:
+            slot = hashed % slot_count
+            while slots[slot][0]:
+                slot = (slot + 1) % slot_count
+            slots[slot] = (hashed, offset, len(blob))
+            offset += len(blob)
+
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.host_group_vars')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, digest, INDEX_HEADER.size, slot_count))
+                for slot in slots:
+                    f.write(INDEX_SLOT.pack(*slot))
+                for blob, _ in entries:
+                    f.write(blob)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def blob(self, name):
+        ''' returns the stored name\0json of name, or None '''
+        b_name = to_bytes(name) + b'\0'
+        hashed = name_hash(name)
+        slot = hashed % self.slot_count
+        while True:
+            slot_hash, offset, length = INDEX_SLOT.unpack_from(self.data, INDEX_HEADER.size + slot * INDEX_SLOT.size)
+            if not slot_hash:
+                return None
+            if slot_hash == hashed and self.data[offset:offset + len(b_name)] == b_name:
+                return self.data[offset:offset + length]
+            slot = (slot + 1) % self.slot_count
+
+    def entry(self, loader, name):
+        ''' returns the entry of name, None if it has none, or False if its files changed '''
+        if name in self.decoded:
+            return self.decoded[name]
+        blob = self.blob(name)
+        if blob is None:
+            self.decoded[name] = None
+            return None
+
+        def object_hook(pairs):
+            if '__ansible_vault' in pairs:
+                value = AnsibleVaultEncryptedUnicode(pairs['__ansible_vault'])
+                value.vault = loader._vault
+                return value
+            return pairs
+        entry = json.loads(to_text(blob[len(to_bytes(name)) + 1:]), object_hook=object_hook)
+        for path, mtime, size in entry['files']:
+            st = os.stat(to_bytes(path))
+            if mtime_ns(st) != mtime or st.st_size != size:
+                return False
+        for path, mtime in entry['dirs']:
+            if mtime_ns(os.stat(to_bytes(path))) != mtime:
+                return False
+        self.decoded[name] = entry
+        return entry
+
+
+class VarsModule(BaseVarsPlugin):
+
+    # names for the vars_plugins_enabled check of ansible 2.10 and of later versions
+    REQUIRES_WHITELIST = True
+    REQUIRES_ENABLED = True
+
+    def _index(self, loader, opath, rebuild=False):
+        if rebuild or opath not in INDEXES:
+            path = os.path.join(index_dir(), hashlib.sha1(to_bytes(opath)).hexdigest() + '.idx')
+            digest = directory_digest(opath)
+            index = None if rebuild else VarsIndex.open(opath, path, digest)
+            if index is None:
+                previous = INDEXES.get(opath) or VarsIndex.open(opath, path)
+                VarsIndex.build(loader, opath, path, digest, previous)
+                index = VarsIndex.open(opath, path, digest)
+            INDEXES[opath] = index
+        return INDEXES[opath]
+
+    def _load_indexed(self, loader, opath, name):
+        ''' returns the parsed data of each file of name, or None if the index cannot be used '''
+        try:
+            index = self._index(loader, opath)
+            entry = index and index.entry(loader, name)
+            if entry is False:
+                index = self._index(loader, opath, rebuild=True)
+                entry = index and index.entry(loader, name)
+        except (EnvironmentError, ValueError, struct.error):
+            return None
+        if index is None or entry is False:
+            return None
+        if entry is None:
+            return []
+        if entry['vars'] is None:
+            return [loader.load_from_file(to_bytes(path), cache=True, unsafe=True)
+                    for path, mtime, size in entry['files']]
+        return entry['vars']
+
+    def get_vars(self, loader, path, entities, cache=True):
+        ''' parses the inventory file '''
+
+        if not ENABLED:
+            return {}
+
+        if not isinstance(entities, list):
+            entities = [entities]
+
+        super(VarsModule, self).get_vars(loader, path, entities)
+
+        data = {}
+        for entity in entities:
+            if isinstance(entity, Host):
+                subdir = 'host_vars'
+            elif isinstance(entity, Group):
+                subdir = 'group_vars'
+            else:
+                raise AnsibleParserError("Supplied entity must be Host or Group, got %s instead" % (type(entity)))
+
+            # avoid 'chroot' type inventory hostnames /path/to/chroot
+            if entity.name.startswith(os.path.sep):
+                continue
+            try:
+                b_opath = os.path.realpath(to_bytes(os.path.join(self._basedir, subdir)))
+                opath = to_text(b_opath)
+                if not os.path.exists(b_opath):
+                    continue
+                if not os.path.isdir(b_opath):
+                    self._display.warning("Found %s that is not a directory, skipping: %s" % (subdir, opath))
+                    continue
+
+                loaded = self._load_indexed(loader, opath, entity.name) if index_dir() else None
+                if loaded is None:
+                    key = '%s.%s' % (entity.name, opath)
+                    if not cache or key not in FOUND:
+                        FOUND[key] = loader.find_vars_files(opath, entity.name)
+                    loaded = [loader.load_from_file(found, cache=True, unsafe=True) for found in FOUND[key]]
+
+                for new_data in loaded:
+                    if new_data:  # ignore empty files
+                        data = combine_vars(data, new_data)
+
+            except Exception as e:
+                raise AnsibleParserError(to_native(e))
+        return data
+
+
+if ENABLED and not SELECTABLE:
+    # this plugin does the builtin's work, which would otherwise read every file a second time
+    host_group_vars.VarsModule.get_vars = lambda self, loader, path, entities, cache=True: {}
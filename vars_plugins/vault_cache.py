@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    vars: vault_cache
+    short_description: remembers decrypted vault values for the rest of the run
+    description:
+        - Adds no variables. When I(enabled), loading it makes vault decryption memoized, so a
+          C(!vault) value or vaulted file that is templated for many hosts and tasks pays the key
+          derivation and AES decryption once instead of on every use. Otherwise it changes nothing.
+        - Nothing is decrypted ahead of time. A value is decrypted the first time templating asks
+          for it, so vaulted variables no task references cost nothing.
+        - Tasks are templated in worker processes forked for each task and host, which exit when
+          the task is done. So plaintexts are kept in an anonymous shared memory region mapped in
+          the controller before any worker is forked. A plaintext decrypted in one worker is found
+          there by every worker forked after it, and by the controller.
+        - Plaintexts are keyed by the SHA-256 of the vaulttext, its vault id and the available
+          secrets. Entries are only ever added. Once the region is full, new plaintexts are
+          decrypted on every use as without the cache. The region is zeroed at exit.
+        - Adding an entry takes a lock shared by the controller and its workers, looking one up does
+          not. If the lock cannot be had within a second, for example because a worker was killed
+          while holding it, the plaintext is not kept and is decrypted again on its next use.
+    options:
+      enabled:
+        description: Memoize vault decryption for the rest of the run.
+        default: False
+        type: bool
+        env:
+          - name: VAULT_CACHE_ENABLED
+        ini:
+          - section: vars_vault_cache
+            key: enabled
+      max_bytes:
+        description: Size of the shared region for plaintexts, 0 disables the cache.
+        default: 16777216
+        type: int
+        env:
+          - name: VAULT_CACHE_MAX_BYTES
+        ini:
+          - section: vars_vault_cache
+            key: max_bytes
+'''
+
+import atexit
+import hashlib
+import mmap
+import os
+import struct
+
+from ansible.module_utils._text import to_bytes
+from ansible.parsing.vault import VaultLib
+from ansible.plugins.vars import BaseVarsPlugin
+
+try:
+    from ansible.utils.multiprocessing import context as multiprocessing_context
+except ImportError:
+    import multiprocessing as multiprocessing_context
+
+
+class SharedPlaintexts(object):
+    ''' an append only table of plaintexts in anonymous shared memory, inherited by forked workers
+
+    The region starts with the number of bytes used, followed by entries of a 32 byte key, the
+    lengths of the vault id and the plaintext, then both.  Every process indexes the entries it
+    has seen, and reads the ones appended since when a key is not in its index.  Writers take the
+    lock, readers only trust entries below the used count, which is stored after the entry is.
+    '''
+
+    USED = struct.Struct('<Q')
+    ENTRY = struct.Struct('<32sII')
+    LOCK_TIMEOUT = 1.0
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.region = mmap.mmap(-1, self.USED.size + max_size) if max_size else None
+        self.lock = multiprocessing_context.Lock()
+        self.pid = os.getpid()
+        self.index = {}
+        self.scanned = self.USED.size
+
+    def _used(self):
+        return min(self.USED.unpack_from(self.region, 0)[0] or self.USED.size, len(self.region))
+
+    def _scan(self):
+        used = self._used()
+        while self.scanned + self.ENTRY.size <= used:
+            key, id_size, size = self.ENTRY.unpack_from(self.region, self.scanned)
+            end = self.scanned + self.ENTRY.size + id_size + size
+            if end > used:
+                break
+            self.index[key] = self.scanned
+            self.scanned = end
+
+    def get(self, key):
+        if key not in self.index:
+            self._scan()
+        offset = self.index.get(key)
+        if offset is None:
+            return None
+        key, id_size, size = self.ENTRY.unpack_from(self.region, offset)
+        offset += self.ENTRY.size
+        return self.region[offset + id_size:offset + id_size + size], self.region[offset:offset + id_size]
+
+    def put(self, key, b_plaintext, b_vault_id):
+        if not self.lock.acquire(True, self.LOCK_TIMEOUT):
+            return
+        try:
+            self._scan()
+            offset = self._used()
+            end = offset + self.ENTRY.size + len(b_vault_id) + len(b_plaintext)
+            if key in self.index or end > len(self.region):
+                return
+            self.ENTRY.pack_into(self.region, offset, key, len(b_vault_id), len(b_plaintext))
+            self.region[offset + self.ENTRY.size:end] = b_vault_id + b_plaintext
+            # entries become visible to other processes only once they are complete
+            self.USED.pack_into(self.region, 0, end)
+            self.index[key] = offset
+            self.scanned = end
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        # workers leave the region to the controller that mapped it, which clears it at exit
+        # when no worker is left to hold the lock
+        if self.region is not None and os.getpid() == self.pid:
+            self.region[:] = b'\0' * len(self.region)
+        self.index.clear()
+        self.scanned = self.USED.size
+
+
+plaintexts = None
+
+_original_decrypt = VaultLib.decrypt_and_get_vault_id
+
+
+def _secrets_digest(secrets):
+    digest = hashlib.sha256()
+    for vault_id, secret in secrets or []:
+        digest.update(to_bytes(vault_id) + b'\0' + (secret.bytes or b'') + b'\0')
+    return digest.digest()
+
+
+def _secret(secrets, vault_id):
+    for secret_vault_id, secret in secrets or []:
+        if secret_vault_id == vault_id:
+            return secret
+    return None
+
+
+def decrypt_and_get_vault_id(self, vaulttext, *args, **kwargs):
+    if plaintexts is None or not plaintexts.max_size:
+        return _original_decrypt(self, vaulttext, *args, **kwargs)
+    b_vaulttext = to_bytes(vaulttext, errors='surrogate_or_strict').strip()
+    header = b_vaulttext.split(b'\n', 1)[0].split(b';')
+    key = hashlib.sha256(hashlib.sha256(b_vaulttext).digest() + b'\0' +
+                         (header[3].strip() if len(header) > 3 else b'') + b'\0' +
+                         _secrets_digest(self.secrets)).digest()
+    cached = plaintexts.get(key)
+    if cached is not None:
+        b_plaintext, b_vault_id = cached
+        vault_id = b_vault_id.decode('utf-8')
+        return b_plaintext, vault_id, _secret(self.secrets, vault_id)
+    b_plaintext, vault_id, secret = _original_decrypt(self, vaulttext, *args, **kwargs)
+    plaintexts.put(key, b_plaintext, to_bytes(vault_id or u''))
+    return b_plaintext, vault_id, secret
+
+
+def install(max_bytes=16 * 1024 * 1024):
+    ''' must run in the controller before workers are forked, for them to share the plaintexts '''
+    global plaintexts
+    if plaintexts is None:
+        plaintexts = SharedPlaintexts(max_bytes)
+    VaultLib.decrypt_and_get_vault_id = decrypt_and_get_vault_id
+
+
+def uninstall():
+    VaultLib.decrypt_and_get_vault_id = _original_decrypt
+    evict()
+
+
+def evict():
+    ''' drops every remembered plaintext '''
+    if plaintexts is not None:
+        plaintexts.clear()
+
+
+atexit.register(evict)
+
+
+class VarsModule(BaseVarsPlugin):
+
+    def get_vars(self, loader, path, entities, cache=True):
+        # the controller asks for variables while reading the inventory or queueing the first
+        # task, before any worker is forked
+        if plaintexts is None and self.get_option('enabled'):
+            install(self.get_option('max_bytes'))
+        return {}